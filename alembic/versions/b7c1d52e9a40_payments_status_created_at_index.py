@@ -0,0 +1,28 @@
+"""payments (status, created_at) index
+
+Revision ID: b7c1d52e9a40
+Revises: 4aead418881e
+Create Date: 2026-10-19 12:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7c1d52e9a40'
+down_revision: Union[str, Sequence[str], None] = '4aead418881e'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('ix_payments_status_created_at', 'payments', ['status', 'created_at'], if_not_exists=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_payments_status_created_at', table_name='payments', if_exists=True)
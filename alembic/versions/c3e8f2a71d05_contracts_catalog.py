@@ -0,0 +1,72 @@
+"""contracts catalog
+
+Revision ID: c3e8f2a71d05
+Revises: b7c1d52e9a40
+Create Date: 2026-10-19 18:10:00.000000
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e8f2a71d05'
+down_revision: Union[str, Sequence[str], None] = 'b7c1d52e9a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FORMATS = ["txt", "docx", "pdf", "xlsx"]
+
+# Договоры из прежнего CONTRACTS_DB (app/main.py)
+SEED = [
+    (1, "ДОГ-2025-001", "Разработка веб-портала", "ООО \"ТехноПром\"", date(2025, 1, 15), 450000),
+    (2, "ДОГ-2025-042", "Мобильное приложение", "ИП Иванов А.А.", date(2025, 2, 10), 780000),
+    (3, "ДОГ-2024-128", "Автоматизация отчетности", "АО \"СтройИнвест\"", date(2024, 11, 5), 320000),
+    (4, "ДОГ-2025-089", "SEO-оптимизация", "ООО \"МедиаГрупп\"", date(2025, 3, 1), 180000),
+    (5, "ДОГ-2024-256", "Разработка LMS", "ЧУ ДПО \"Образование+\"", date(2024, 9, 20), 950000),
+    (6, "ДОГ-2025-103", "Система управления складом", "ООО \"ЛогистикПро\"", date(2025, 3, 15), 1250000),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    contracts = op.create_table(
+        'contracts',
+        sa.Column('id', sa.Integer(), primary_key=True),
+        sa.Column('number', sa.String(length=50), nullable=False, unique=True),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('client', sa.String(), nullable=False),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=True),
+        sa.Column('project_id', sa.Integer(), sa.ForeignKey('projects.id'), nullable=True),
+        sa.Column('date', sa.Date(), nullable=False),
+        sa.Column('amount', sa.BigInteger(), nullable=False),
+        sa.Column('original_file', sa.String(), nullable=False),
+        sa.Column('available_formats', sa.JSON(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+    )
+    op.create_index('ix_contracts_id', 'contracts', ['id'])
+    op.create_index('ix_contracts_user_id', 'contracts', ['user_id'])
+    op.create_index('ix_contracts_project_id', 'contracts', ['project_id'])
+    op.create_index('ix_contracts_date', 'contracts', ['date'])
+    op.create_index('ix_contracts_amount', 'contracts', ['amount'])
+    op.create_index('ix_contracts_client_date', 'contracts', ['client', 'date'])
+
+    op.bulk_insert(contracts, [
+        {
+            "id": id, "number": number, "name": name, "client": client, "date": day, "amount": amount,
+            "original_file": f"{number}.txt", "available_formats": FORMATS,
+        }
+        for id, number, name, client, day, amount in SEED
+    ])
+    # PostgreSQL: продолжить последовательность после явно заданных id
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute("SELECT setval(pg_get_serial_sequence('contracts', 'id'), (SELECT MAX(id) FROM contracts))")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('contracts')
@@ -0,0 +1,129 @@
+"""Смена статусов платежей.
+
+Один путь для вебхука, тестового подтверждения и сверки: переход в
+succeeded выполняется ровно один раз и создаёт ровно одну completed-
+транзакцию и одну запись в журнале баланса (app/ledger.py), сколько бы
+раз ни пришло одно и то же событие.
+
+Повтор отсекается условным UPDATE ... WHERE status <> 'succeeded': он же
+берёт блокировку строки платежа до commit, поэтому два обработчика
+одного платежа (в разных потоках или процессах) не пройдут оба.
+
+Пакетные варианты (*_bulk) для сверки меняют статусы одним UPDATE по
+списку id; счётчики и уведомления для них обновляются вручную — ORM-хуки
+пакетный UPDATE не видят.
+"""
+from datetime import datetime
+from typing import List, Optional
+
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app import counters, ledger, payment_events
+from app.models import Payment, Transaction
+
+SUCCEEDED = "succeeded"
+
+# Статусы, из которых платёж уже не меняется событиями провайдера
+FINAL_STATUSES = {SUCCEEDED, "refunded"}
+
+
+def _claim(db: Session, condition, allowed_from=None) -> Optional[Payment]:
+    """Условно «тронуть» строку платежа; None — платёж не найден или уже в конечном статусе"""
+    stmt = update(Payment).where(condition, Payment.status.notin_(FINAL_STATUSES))
+    if allowed_from is not None:
+        stmt = stmt.where(Payment.status.in_(allowed_from))
+    result = db.execute(
+        stmt.values(updated_at=datetime.utcnow()).execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        return None
+    # Статус меняем через ORM, чтобы его увидели счётчики (app/counters.py)
+    return db.query(Payment).filter(condition).populate_existing().one()
+
+
+def mark_payment_succeeded(db: Session, condition) -> Optional[Transaction]:
+    """Перевести платёж в succeeded, создать транзакцию и зачислить сумму
+    на баланс (в текущей транзакции БД).
+
+    condition — условие выбора платежа, например Payment.id == 5.
+    Возвращает созданную транзакцию или None, если платёж не найден или
+    уже был обработан. commit — на вызывающей стороне.
+    """
+    payment = _claim(db, condition)
+    if payment is None:
+        return None
+
+    payment.status = SUCCEEDED
+    payment.updated_at = datetime.utcnow()
+    transaction = Transaction(
+        user_id=payment.user_id,
+        amount=payment.amount,
+        status="completed",
+        currency=payment.currency
+    )
+    db.add(transaction)
+    db.flush()
+    ledger.post_entry(
+        db, payment.user_id, payment.amount, "payment",
+        payment_id=payment.id, transaction_id=transaction.id
+    )
+    return transaction
+
+
+def mark_payment_canceled(db: Session, condition) -> bool:
+    """Отменить платёж, если он ещё не завершён"""
+    payment = _claim(db, condition, allowed_from=["pending"])
+    if payment is None:
+        return False
+    payment.status = "canceled"
+    payment.updated_at = datetime.utcnow()
+    db.flush()
+    return True
+
+
+def _update_pending(db: Session, payment_ids: List[int], status: str) -> list:
+    """UPDATE pending-платежей из списка; возвращает изменённые строки"""
+    if not payment_ids:
+        return []
+    rows = db.execute(
+        update(Payment)
+        .where(Payment.id.in_(payment_ids), Payment.status == "pending")
+        .values(status=status, updated_at=datetime.utcnow())
+        .returning(Payment.id, Payment.user_id, Payment.amount, Payment.currency)
+        .execution_options(synchronize_session=False)
+    ).all()
+    if rows:
+        deltas = {"payments_status:pending": -len(rows), f"payments_status:{status}": len(rows)}
+        if status == SUCCEEDED:
+            deltas["payments_amount:succeeded"] = sum(row.amount or 0 for row in rows)
+        counters.increment(db.connection(), deltas)
+        for row in rows:
+            payment_events.queue_event(db, row.id, row.user_id, status, "pending", row.amount, row.currency)
+    return rows
+
+
+def mark_payments_succeeded_bulk(db: Session, payment_ids: List[int]) -> List[int]:
+    """Пакетный mark_payment_succeeded для pending-платежей.
+    Возвращает id платежей, которые действительно перешли в succeeded."""
+    rows = _update_pending(db, payment_ids, SUCCEEDED)
+    if not rows:
+        return []
+
+    transactions = [
+        Transaction(user_id=row.user_id, amount=row.amount, status="completed", currency=row.currency)
+        for row in rows
+    ]
+    db.add_all(transactions)
+    db.flush()
+    ledger.post_entries(db, [
+        dict(user_id=row.user_id, amount=row.amount, kind="payment",
+             payment_id=row.id, transaction_id=transaction.id)
+        for row, transaction in zip(rows, transactions)
+    ])
+    return [row.id for row in rows]
+
+
+def mark_payments_canceled_bulk(db: Session, payment_ids: List[int]) -> List[int]:
+    """Пакетная отмена pending-платежей; возвращает id отменённых"""
+    return [row.id for row in _update_pending(db, payment_ids, "canceled")]
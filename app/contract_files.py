@@ -0,0 +1,280 @@
+"""Индекс файлов договоров и отдача с кэш-валидацией и Range.
+
+Индекс (contract_id, формат) -> путь, размер, mtime, сильный ETag (sha256
+содержимого) строится при старте. Запись перепроверяется одним os.stat не
+чаще раза в CONTRACT_INDEX_CHECK_INTERVAL секунд: при смене mtime/размера
+ETag пересчитывается, пропавший файл ищется заново, появившийся — находится
+при следующей проверке.
+
+send_file() отвечает 304 на If-None-Match / If-Modified-Since и 206 на
+Range: bytes=... (одиночный диапазон; If-Range учитывается).
+"""
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import urllib.parse
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+CONTRACT_DIRS = [
+    os.path.join("app", "static", "contracts"),
+    os.path.join("static", "contracts"),
+]
+
+CONTRACT_INDEX_CHECK_INTERVAL = float(os.getenv("CONTRACT_INDEX_CHECK_INTERVAL", "2"))
+
+# Родные MIME-типы: файлы открываются в Word, PDF-просмотрщике, Excel
+# (charset=utf-8 к text/* Starlette добавляет сам)
+MEDIA_TYPES = {
+    ".txt": "text/plain",
+    ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+    ".pdf": "application/pdf",
+    ".xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+# Договоры меняются редко, но не неизменяемы — клиент перепроверяет по ETag
+CACHE_CONTROL = "private, max-age=0, must-revalidate"
+
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ContractFile:
+    path: str
+    filename: str
+    size: int
+    mtime_ns: int
+    etag: str
+    media_type: str
+    checked_at: float
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime_ns / 1e9, usegmt=True)
+
+
+def _file_etag(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return f'"{digest.hexdigest()[:32]}"'
+
+
+def _inside(directory: str, path: str) -> bool:
+    """path после раскрытия симлинков и .. лежит внутри directory"""
+    root = os.path.realpath(directory)
+    return os.path.commonpath([root, os.path.realpath(path)]) == root and os.path.realpath(path) != root
+
+
+def file_names(contract: dict) -> Dict[Optional[str], str]:
+    """{формат: имя файла} для файлов на диске; None — оригинал.
+    На диске лежит только .txt-оригинал, остальные форматы собирает
+    app/contract_formats.py"""
+    original = contract["original_file"]
+    names: Dict[Optional[str], str] = {None: original}
+    if "txt" in contract["available_formats"]:
+        names["txt"] = original
+    return names
+
+
+def download_name(contract: dict, format: Optional[str]) -> str:
+    """Имя файла договора в формате format (None — оригинал)"""
+    original = contract["original_file"]
+    if format is None:
+        return original
+    return f"{os.path.splitext(original)[0]}.{format}"
+
+
+class ContractFileIndex:
+    def __init__(self, directories: List[str] = None, check_interval: float = CONTRACT_INDEX_CHECK_INTERVAL):
+        self.directories = directories or CONTRACT_DIRS
+        self.check_interval = check_interval
+        self._names: Dict[Tuple[int, Optional[str]], str] = {}
+        self._entries: Dict[Tuple[int, Optional[str]], Optional[ContractFile]] = {}
+        self._missing_checked: Dict[Tuple[int, Optional[str]], float] = {}
+        self._lock = threading.Lock()
+
+    def _resolve(self, filename: str, previous: Optional[ContractFile] = None) -> Optional[ContractFile]:
+        now = time.monotonic()
+        for directory in self.directories:
+            path = os.path.join(directory, filename)
+            if not _inside(directory, path):
+                # Имя из БД с ../ или абсолютным путём — файл вне каталога договоров не отдаём
+                print(f"⚠️ Файл договора вне каталога договоров: {filename!r}")
+                return None
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if previous and previous.path == path and previous.mtime_ns == stat.st_mtime_ns and previous.size == stat.st_size:
+                previous.checked_at = now
+                return previous
+            return ContractFile(
+                path=path,
+                filename=filename,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+                etag=_file_etag(path),
+                media_type=MEDIA_TYPES.get(os.path.splitext(filename)[1].lower(), "application/octet-stream"),
+                checked_at=now
+            )
+        return None
+
+    def build(self, contracts: Iterable[dict]):
+        """Пересобрать индекс для набора договоров"""
+        names = {}
+        for contract in contracts:
+            for format, filename in file_names(contract).items():
+                names[(contract["id"], format)] = filename
+        entries = {key: self._resolve(filename) for key, filename in names.items()}
+        with self._lock:
+            self._names = names
+            self._entries = entries
+            self._missing_checked = {key: time.monotonic() for key, entry in entries.items() if entry is None}
+        found = sum(1 for entry in entries.values() if entry)
+        print(f"📁 Индекс файлов договоров: {found} из {len(entries)} файлов найдено")
+
+    def forget(self, contract_id: int):
+        with self._lock:
+            for key in [key for key in self._names if key[0] == contract_id]:
+                self._names.pop(key, None)
+                self._entries.pop(key, None)
+                self._missing_checked.pop(key, None)
+
+    def add(self, contract: dict):
+        """Добавить или обновить договор в индексе"""
+        self.forget(contract["id"])
+        for format, filename in file_names(contract).items():
+            key = (contract["id"], format)
+            entry = self._resolve(filename)
+            with self._lock:
+                self._names[key] = filename
+                self._entries[key] = entry
+                if entry is None:
+                    self._missing_checked[key] = time.monotonic()
+
+    def contract_ids(self) -> List[int]:
+        """Договоры в индексе"""
+        return [key[0] for key in list(self._names) if key[1] is None]
+
+    def get(self, contract_id: int, format: Optional[str]) -> Optional[ContractFile]:
+        key = (contract_id, format)
+        filename = self._names.get(key)
+        if filename is None:
+            return None
+        entry = self._entries.get(key)
+        now = time.monotonic()
+        if entry is not None:
+            if now - entry.checked_at < self.check_interval:
+                return entry
+        elif now - self._missing_checked.get(key, 0) < self.check_interval:
+            return None
+
+        entry = self._resolve(filename, entry)
+        with self._lock:
+            self._entries[key] = entry
+            if entry is None:
+                self._missing_checked[key] = now
+        return entry
+
+
+contract_files = ContractFileIndex()
+
+
+# ---------- ответ с валидацией и Range ----------
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    # Сравнение для GET — слабое: W/"x" совпадает с "x"
+    candidates = [tag.strip() for tag in header.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def _not_modified(request: Request, entry: ContractFile) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, entry.etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(entry.mtime_ns // 1_000_000_000) <= since
+    return False
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """'bytes=0-99' -> (0, 99); None — не поддерживаемый или некорректный заголовок;
+    (-1, -1) — диапазон вне файла"""
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_text, _, end_text = spec.strip().partition("-")
+    try:
+        if start_text == "":
+            # Последние N байт
+            length = int(end_text)
+            if length <= 0:
+                return (-1, -1)
+            return (max(size - length, 0), size - 1)
+        start = int(start_text)
+        end = int(end_text) if end_text else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        return (-1, -1)
+    return (start, min(end, size - 1))
+
+
+def _iter_range(path: str, start: int, end: int) -> Iterator[bytes]:
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+def send_file(request: Request, entry: ContractFile, disposition: str = "inline") -> Response:
+    """FileResponse с ETag/Last-Modified, 304 и 206"""
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": entry.last_modified,
+        "Cache-Control": CACHE_CONTROL,
+        "Accept-Ranges": "bytes",
+    }
+
+    if _not_modified(request, entry):
+        return Response(status_code=304, headers=headers)
+
+    headers["Content-Disposition"] = f"{disposition}; filename*=UTF-8''{urllib.parse.quote(entry.filename)}"
+
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() in (entry.etag, entry.last_modified)):
+        byte_range = _parse_range(range_header, entry.size)
+        if byte_range == (-1, -1):
+            return Response(status_code=416, headers=dict(headers, **{"Content-Range": f"bytes */{entry.size}"}))
+        if byte_range is not None:
+            start, end = byte_range
+            headers["Content-Range"] = f"bytes {start}-{end}/{entry.size}"
+            headers["Content-Length"] = str(end - start + 1)
+            return StreamingResponse(
+                _iter_range(entry.path, start, end),
+                status_code=206,
+                media_type=entry.media_type,
+                headers=headers
+            )
+
+    return FileResponse(path=entry.path, media_type=entry.media_type, headers=headers)
@@ -0,0 +1,333 @@
+"""Генерация DOCX / PDF / XLSX договора из .txt-оригинала.
+
+Единственный источник — текстовый оригинал договора; остальные форматы
+собираются при первом запросе в пуле процессов (только стандартная
+библиотека: zipfile для DOCX/XLSX, самописный PDF со встроенным шрифтом
+из app/pdf_font.py) и кладутся в кэш на диске, адресуемый содержимым:
+
+    CONTRACT_CACHE_DIR/<ключ[:2]>/<ключ>.<формат>,
+    ключ = sha256(хэш оригинала, формат, GENERATOR_VERSION)
+
+Изменился оригинал — изменился ключ, старые артефакты просто перестают
+запрашиваться и со временем вытесняются: при превышении
+CONTRACT_CACHE_MAX_MB удаляются давно не использованные файлы (mtime
+обновляется при попадании). Одновременные запросы одного артефакта
+в процессе ждут одну сборку; между процессами запись атомарна
+(временный файл + os.replace), так что повторная сборка безвредна.
+
+Поменяли генератор — увеличьте GENERATOR_VERSION.
+"""
+import asyncio
+import hashlib
+import io
+import os
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from app.contract_files import ContractFile, MEDIA_TYPES, contract_files, download_name
+from app.pdf_font import PdfFont, load_font
+from app.xlsx_writer import stream_xlsx
+
+CONTRACT_CACHE_DIR = os.getenv("CONTRACT_CACHE_DIR", os.path.join("cache", "contracts"))
+CONTRACT_CACHE_MAX_MB = float(os.getenv("CONTRACT_CACHE_MAX_MB", "256"))
+CONTRACT_RENDER_WORKERS = int(os.getenv("CONTRACT_RENDER_WORKERS", "2"))
+
+GENERATOR_VERSION = "2"
+
+# Обновлять mtime артефакта при попадании не чаще раза в минуту
+TOUCH_INTERVAL = 60
+
+
+# ---------- генераторы (выполняются в процессах пула) ----------
+
+_DOCX_CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+</Types>"""
+
+_DOCX_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+_DOCX_HEAD = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>"""
+
+_DOCX_TAIL = """<w:sectPr><w:pgSz w:w="11906" w:h="16838"/><w:pgMar w:top="1134" w:right="850" w:bottom="1134" w:left="1701" w:header="708" w:footer="708" w:gutter="0"/></w:sectPr></w:body></w:document>"""
+
+
+def render_docx(lines: List[str]) -> bytes:
+    """Каждая строка — абзац; первая (заголовок) — жирным"""
+    paragraphs = []
+    for number, line in enumerate(lines):
+        if not line.strip():
+            paragraphs.append("<w:p/>")
+            continue
+        bold = "<w:rPr><w:b/></w:rPr>" if number == 0 else ""
+        paragraphs.append(f'<w:p><w:r>{bold}<w:t xml:space="preserve">{escape(line)}</w:t></w:r></w:p>')
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", _DOCX_CONTENT_TYPES)
+        archive.writestr("_rels/.rels", _DOCX_RELS)
+        archive.writestr("word/document.xml", _DOCX_HEAD + "".join(paragraphs) + _DOCX_TAIL)
+    return buffer.getvalue()
+
+
+def render_xlsx(lines: List[str]) -> bytes:
+    """Строки «Поле: значение» — в две колонки, остальные — в первую"""
+    rows = []
+    for line in lines:
+        field, separator, value = line.partition(":")
+        rows.append((field.strip(), value.strip()) if separator and value.strip() else (line.strip(), None))
+    return b"".join(stream_xlsx(["Поле", "Значение"], rows, sheet_name="Договор"))
+
+
+def _wrap(line: str, font, size: float, width: float) -> List[str]:
+    """Перенос по словам с учётом ширины глифов; слово длиннее строки режется"""
+    line = line.replace("\t", "    ").rstrip()
+    if not line:
+        return [""]
+    space = font.text_width(" ", size)
+    result, current, current_width = [], "", 0.0
+    for word in line.split(" "):
+        word_width = font.text_width(word, size)
+        if current and current_width + space + word_width <= width:
+            current, current_width = f"{current} {word}", current_width + space + word_width
+            continue
+        if current:
+            result.append(current)
+        current, current_width = "", 0.0
+        for char in word:
+            char_width = font.text_width(char, size)
+            if current and current_width + char_width > width:
+                result.append(current)
+                current, current_width = "", 0.0
+            current, current_width = current + char, current_width + char_width
+    result.append(current)
+    return result
+
+
+def render_pdf(lines: List[str], font_size: int = 11) -> bytes:
+    """A4, встроенный шрифт (app/pdf_font.py), перенос по ширине, разбивка на
+    страницы; заголовок — первая строка"""
+    font = PdfFont(load_font())
+    title = lines[0].strip() if lines else ""
+    leading = round(font_size * 1.35)
+    margin = 56
+    wrapped: List[str] = []
+    for line in lines:
+        wrapped.extend(_wrap(line, font.font, font_size, 595 - 2 * margin))
+    per_page = (842 - 2 * margin) // leading
+    pages = [wrapped[i:i + per_page] for i in range(0, len(wrapped), per_page)] or [[]]
+
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # заполняется ниже, когда известны номера /Pages и шрифта
+    pages_id = add(b"")
+    font_id = add(b"")
+    kids = []
+    for page_lines in pages:
+        stream = [f"BT /F1 {font_size} Tf {leading} TL {margin} {842 - margin} Td".encode("ascii")]
+        stream.extend(font.encode(line) + b" '" for line in page_lines)
+        stream.append(b"ET")
+        content = zlib.compress(b"\n".join(stream))
+        content_id = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(content) + content + b"\nendstream")
+        kids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] /Resources << /Font << /F1 %d 0 R >> >> "
+            b"/Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+    # Подмножество шрифта собирается, когда известны все глифы документа
+    objects[font_id - 1] = font.objects(add)
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    objects[pages_id - 1] = (
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % kid for kid in kids) + b"] /Count %d >>" % len(kids)
+    )
+    info = add(b"<< /Title <FEFF" + title.encode("utf-16-be").hex().upper().encode("ascii") + b"> /Producer (AI Developer Portal) >>")
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root %d 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1, catalog, info, xref
+    )
+    return bytes(output)
+
+
+RENDERERS = {
+    "docx": render_docx,
+    "xlsx": render_xlsx,
+    "pdf": render_pdf,
+}
+
+
+def build_artifact(source_path: str, format: str, target_path: str) -> int:
+    """Собрать артефакт в target_path (атомарно); возвращает размер"""
+    with open(source_path, encoding="utf-8-sig", errors="replace") as f:
+        lines = f.read().splitlines()
+    data = RENDERERS[format](lines)
+
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    temporary = f"{target_path}.{os.getpid()}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(data)
+    os.replace(temporary, target_path)
+    return len(data)
+
+
+# ---------- кэш и пул ----------
+
+class ContractFormatCache:
+    def __init__(self, directory: str = CONTRACT_CACHE_DIR, max_bytes: int = int(CONTRACT_CACHE_MAX_MB * 1024 * 1024),
+                 workers: int = CONTRACT_RENDER_WORKERS):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._size: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _key(self, source: ContractFile, format: str) -> str:
+        return hashlib.sha256(f"{source.etag}:{format}:{GENERATOR_VERSION}".encode()).hexdigest()
+
+    def _path(self, key: str, format: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.{format}")
+
+    def _entry(self, key: str, path: str, filename: str, format: str) -> Optional[ContractFile]:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        if time.time() - stat.st_mtime > TOUCH_INTERVAL:
+            try:
+                os.utime(path)
+                stat = os.stat(path)
+            except OSError:
+                pass
+        return ContractFile(
+            path=path,
+            filename=filename,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            etag=f'"{key[:32]}"',
+            media_type=MEDIA_TYPES.get(f".{format}", "application/octet-stream"),
+            checked_at=time.monotonic()
+        )
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+    async def get(self, source: ContractFile, format: str, filename: str) -> ContractFile:
+        """Артефакт формата format для оригинала source; собирается при первом запросе"""
+        if format not in RENDERERS:
+            raise ValueError(f"Неизвестный формат: {format}")
+        key = self._key(source, format)
+        path = self._path(key, format)
+        entry = self._entry(key, path, filename, format)
+        if entry is not None:
+            return entry
+
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().run_in_executor(
+                self._get_pool(), build_artifact, source.path, format, path
+            )
+            self._inflight[key] = future
+            future.add_done_callback(lambda done: self._built(key, path, done))
+        await asyncio.shield(future)
+
+        entry = self._entry(key, path, filename, format)
+        if entry is None:
+            # Вытеснили между сборкой и чтением — крайне маловероятно
+            raise FileNotFoundError(path)
+        return entry
+
+    def _built(self, key: str, path: str, future: asyncio.Future):
+        self._inflight.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan()[1]
+            else:
+                self._size += future.result()
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+
+    def _scan(self):
+        files = []
+        total = 0
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".tmp"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        return files, total
+
+    def _evict(self, keep: str):
+        """Удалять самые давно использованные, пока не останется 90% лимита"""
+        files, total = self._scan()
+        target = self.max_bytes * 0.9
+        removed = 0
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            if path == keep:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        self._size = total
+        if removed:
+            print(f"🧹 Кэш форматов договоров: удалено {removed} файлов, осталось {total // 1024} КБ")
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+contract_formats = ContractFormatCache()
+
+
+def can_render(contract: dict, format: Optional[str]) -> bool:
+    """Есть ли у договора файл в этом формате (оригинал на диске или генератор)"""
+    if contract_files.get(contract["id"], None) is None:
+        return False
+    return format is None or format == "txt" or format in RENDERERS
+
+
+async def contract_file(contract: dict, format: Optional[str]) -> Optional[ContractFile]:
+    """Файл договора: оригинал из индекса или собранный по нему артефакт; None — нет оригинала"""
+    entry = contract_files.get(contract["id"], format if format == "txt" else None)
+    if entry is None or format in (None, "txt"):
+        return entry
+    return await contract_formats.get(entry, format, download_name(contract, format))
@@ -0,0 +1,396 @@
+"""Полнотекстовый поиск по текстам договоров.
+
+Инвертированный индекс по .txt-оригиналам (app/contract_files.py):
+- токены — слова из кириллицы, латиницы и цифр, ё = е, без стоп-слов;
+- русские слова приводятся к основе стеммером Snowball (Портер для
+  русского), так что «договора», «договору», «договорами» — одно слово;
+- ранжирование BM25, сниппет — окно текста вокруг первого совпадения
+  с подсветкой <mark>.
+
+Постинги хранятся массивами (array) — 6 байт на пару (документ, частота),
+поэтому индекс на сотни тысяч договоров занимает десятки мегабайт.
+Изменённый договор добавляется заново под новым внутренним номером, старый
+помечается удалённым; когда удалённых больше COMPACT_RATIO, индекс
+уплотняется.
+
+Индекс обновляется по версиям файлов (ETag оригинала): при старте, при
+изменении договора через API и не чаще раза в
+CONTRACT_SEARCH_SYNC_INTERVAL секунд при поиске. Он сохраняется на диск
+(CONTRACT_SEARCH_INDEX), поэтому при старте перечитываются только
+изменившиеся файлы.
+
+Построение, поиск и переиндексация на синтетическом корпусе:
+
+    python -m benchmarks.contract_search --docs 100000
+"""
+import heapq
+import html
+import math
+import os
+import pickle
+import re
+import threading
+import time
+from array import array
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.contract_files import contract_files
+
+CONTRACT_SEARCH_INDEX = os.getenv("CONTRACT_SEARCH_INDEX", os.path.join("cache", "contract_search.pickle"))
+CONTRACT_SEARCH_SYNC_INTERVAL = float(os.getenv("CONTRACT_SEARCH_SYNC_INTERVAL", "60"))
+# Индексируется начало текста: договоры — килобайты, огромный файл не должен съесть память
+CONTRACT_SEARCH_MAX_CHARS = int(os.getenv("CONTRACT_SEARCH_MAX_CHARS", str(2 * 1024 * 1024)))
+
+# Меняется при смене токенизатора/стеммера/формата — старый файл индекса игнорируется
+INDEX_FORMAT = 1
+
+COMPACT_RATIO = 0.2
+BM25_K1 = 1.2
+BM25_B = 0.75
+SNIPPET_LENGTH = 200
+
+
+# ---------- стеммер Snowball для русского ----------
+
+_VOWELS = "аеиоуыэюя"
+
+_PERFECTIVE_GERUND = re.compile(r"((?<=[ая])(в|вши|вшись)|(ив|ивши|ившись|ыв|ывши|ывшись))$")
+_REFLEXIVE = re.compile(r"(ся|сь)$")
+_ADJECTIVAL = re.compile(
+    r"((?<=[ая])(ем|нн|вш|ющ|щ)|(ивш|ывш|ующ))?"
+    r"(ее|ие|ые|ое|ими|ыми|ей|ий|ый|ой|ем|им|ым|ом|его|ого|ему|ому|их|ых|ую|юю|ая|яя|ою|ею)$"
+)
+_VERB = re.compile(
+    r"((?<=[ая])(ла|на|ете|йте|ли|й|л|ем|н|ло|но|ет|ют|ны|ть|ешь|нно)"
+    r"|(ила|ыла|ена|ейте|уйте|ите|или|ыли|ей|уй|ил|ыл|им|ым|ен|ило|ыло|ено|ят|ует|уют|ит|ыт|ены|ить|ыть|ишь|ую|ю))$"
+)
+_NOUN = re.compile(
+    r"(а|ев|ов|ие|ье|е|иями|ями|ами|еи|ии|и|ией|ей|ой|ий|й|иям|ям|ием|ем|ам|ом|о|у|ах|иях|ях|ы|ь|ию|ью|ю|ия|ья|я)$"
+)
+_SUPERLATIVE = re.compile(r"(ейше|ейш)$")
+_DERIVATIONAL = re.compile(r"(ость|ост)$")
+
+
+def _region_after_consonant(word: str, start: int) -> int:
+    """Начало области после первой пары «гласная, согласная» начиная с start"""
+    for i in range(start + 1, len(word)):
+        if word[i] not in _VOWELS and word[i - 1] in _VOWELS:
+            return i + 1
+    return len(word)
+
+
+@lru_cache(maxsize=200000)
+def stem(word: str) -> str:
+    """Основа русского слова (word — в нижнем регистре, ё заменена на е)"""
+    rv_start = next((i + 1 for i, char in enumerate(word) if char in _VOWELS), None)
+    if rv_start is None:
+        return word
+    r2_start = _region_after_consonant(word, _region_after_consonant(word, 0))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # Шаг 1: деепричастие, иначе возвратность + прилагательное/глагол/существительное
+    stripped = _PERFECTIVE_GERUND.sub("", rv, 1)
+    if stripped == rv:
+        rv = _REFLEXIVE.sub("", rv, 1)
+        stripped = _ADJECTIVAL.sub("", rv, 1)
+        if stripped == rv:
+            stripped = _VERB.sub("", rv, 1)
+            if stripped == rv:
+                stripped = _NOUN.sub("", rv, 1)
+    rv = stripped
+
+    # Шаг 2: и
+    if rv.endswith("и"):
+        rv = rv[:-1]
+
+    # Шаг 3: словообразовательный суффикс — только в R2
+    match = _DERIVATIONAL.search(rv)
+    if match and rv_start + match.start() >= r2_start:
+        rv = rv[:match.start()]
+
+    # Шаг 4: превосходная степень, нн, ь
+    stripped = _SUPERLATIVE.sub("", rv, 1)
+    if stripped != rv:
+        rv = stripped
+        if rv.endswith("нн"):
+            rv = rv[:-1]
+    elif rv.endswith("нн"):
+        rv = rv[:-1]
+    elif rv.endswith("ь"):
+        rv = rv[:-1]
+
+    return prefix + rv
+
+
+# ---------- токенизация ----------
+
+_TOKEN = re.compile(r"[0-9a-zа-яё]+", re.IGNORECASE)
+_CYRILLIC = re.compile(r"[а-я]")
+
+STOP_WORDS = frozenset("""
+и в во не что он на я с со как а то все она так его но да ты к у же вы за бы по только ее мне было
+вот от меня еще нет о из ему теперь когда даже ну ли если уже или ни быть был него до вас нибудь
+опять уж вам ведь там потом себя ничего ей может они тут где есть надо ней для мы тебя их чем была
+сам чтоб без будто чего раз тоже себе под будет ж тогда кто этот того потому этого какой совсем ним
+здесь этом один почти мой тем чтобы нее сейчас были куда зачем всех никогда можно при наконец два об
+другой хоть после над больше тот через эти нас про всего них какая много разве три эту моя впрочем
+хорошо свою этой перед иногда лучше чуть том нельзя такой им более всегда конечно всю между
+""".split())
+
+
+def term(token: str) -> Optional[str]:
+    """Слово -> термин индекса; None — стоп-слово"""
+    token = token.lower().replace("ё", "е")
+    if token in STOP_WORDS:
+        return None
+    if _CYRILLIC.search(token):
+        return stem(token)
+    return token
+
+
+def terms(text: str) -> List[str]:
+    return [t for t in (term(token) for token in _TOKEN.findall(text)) if t]
+
+
+def make_snippet(text: str, query_terms: Iterable[str], length: int = SNIPPET_LENGTH) -> str:
+    """Окно текста вокруг первого совпадения; совпадения — в <mark>, остальное экранировано"""
+    wanted = set(query_terms)
+    tokens = list(_TOKEN.finditer(text))
+    matches = [m for m in tokens if term(m.group()) in wanted]
+    first = matches[0].start() if matches else 0
+    start = max(0, first - length // 4)
+    if start > 0:
+        # не резать слово
+        space = text.rfind(" ", 0, start)
+        start = space + 1 if space >= 0 else 0
+    end = min(len(text), start + length)
+    if end < len(text):
+        space = text.rfind(" ", start, end)
+        end = space if space > start else end
+
+    parts = ["…" if start > 0 else ""]
+    position = start
+    for m in matches:
+        if m.start() < start or m.end() > end:
+            continue
+        parts.append(html.escape(text[position:m.start()]))
+        parts.append(f"<mark>{html.escape(m.group())}</mark>")
+        position = m.end()
+    parts.append(html.escape(text[position:end]))
+    parts.append("…" if end < len(text) else "")
+    return " ".join("".join(parts).split())
+
+
+def read_text(path: str) -> str:
+    with open(path, encoding="utf-8-sig", errors="replace") as f:
+        return f.read(CONTRACT_SEARCH_MAX_CHARS)
+
+
+# ---------- индекс ----------
+
+class ContractSearchIndex:
+    def __init__(self, path: str = CONTRACT_SEARCH_INDEX, sync_interval: float = CONTRACT_SEARCH_SYNC_INTERVAL):
+        self.path = path
+        self.sync_interval = sync_interval
+        self._lock = threading.RLock()
+        self._synced_at = 0.0
+        self.dirty = False
+        self._clear()
+
+    def _clear(self):
+        # внутренний номер -> (ключ договора, версия, длина в терминах); None — удалён
+        self.docs: List[Optional[Tuple[int, str, int]]] = []
+        self.by_key: Dict[int, int] = {}
+        # термин -> (номера документов, частоты)
+        self.postings: Dict[str, Tuple[array, array]] = {}
+        self.total_length = 0
+        self.deleted = 0
+
+    @property
+    def size(self) -> int:
+        return len(self.by_key)
+
+    def version(self, key: int) -> Optional[str]:
+        doc = self.by_key.get(key)
+        return self.docs[doc][1] if doc is not None else None
+
+    def add(self, key: int, text: str, version: str):
+        """Проиндексировать (или переиндексировать) документ"""
+        counts: Dict[str, int] = {}
+        for t in terms(text):
+            counts[t] = counts.get(t, 0) + 1
+        length = sum(counts.values())
+        with self._lock:
+            self._remove(key)
+            doc = len(self.docs)
+            self.docs.append((key, version, length))
+            self.by_key[key] = doc
+            self.total_length += length
+            for t, count in counts.items():
+                entry = self.postings.get(t)
+                if entry is None:
+                    entry = self.postings[t] = (array("I"), array("H"))
+                entry[0].append(doc)
+                entry[1].append(min(count, 65535))
+            self.dirty = True
+
+    def remove(self, key: int):
+        with self._lock:
+            self._remove(key)
+            self._maybe_compact()
+
+    def _remove(self, key: int):
+        doc = self.by_key.pop(key, None)
+        if doc is None:
+            return
+        self.total_length -= self.docs[doc][2]
+        self.docs[doc] = None
+        self.deleted += 1
+        self.dirty = True
+
+    def _maybe_compact(self):
+        if self.deleted and self.deleted > COMPACT_RATIO * len(self.docs):
+            self.compact()
+
+    def compact(self):
+        """Выбросить удалённые документы и перенумеровать оставшиеся"""
+        with self._lock:
+            renumber = array("i", [-1]) * len(self.docs)
+            docs = []
+            for doc, value in enumerate(self.docs):
+                if value is not None:
+                    renumber[doc] = len(docs)
+                    docs.append(value)
+            postings = {}
+            for t, (doc_ids, tfs) in self.postings.items():
+                new_ids, new_tfs = array("I"), array("H")
+                for doc, tf in zip(doc_ids, tfs):
+                    if renumber[doc] >= 0:
+                        new_ids.append(renumber[doc])
+                        new_tfs.append(tf)
+                if new_ids:
+                    postings[t] = (new_ids, new_tfs)
+            self.docs = docs
+            self.by_key = {value[0]: doc for doc, value in enumerate(docs)}
+            self.postings = postings
+            self.deleted = 0
+            self.dirty = True
+
+    def search(self, query: str, limit: int = 20, offset: int = 0) -> Tuple[int, List[Tuple[int, float]], List[str]]:
+        """(всего найдено, [(ключ, оценка BM25)], термины запроса)"""
+        query_terms = list(dict.fromkeys(terms(query)))
+        scores: Dict[int, float] = {}
+        with self._lock:
+            docs = self.docs
+            count = len(self.by_key)
+            if not count or not query_terms:
+                return 0, [], query_terms
+            average_length = self.total_length / count
+            for t in query_terms:
+                entry = self.postings.get(t)
+                if entry is None:
+                    continue
+                doc_ids, tfs = entry
+                df = len(doc_ids)  # с удалёнными — приблизительно до уплотнения
+                idf = math.log(1 + (count - df + 0.5) / (df + 0.5))
+                for doc, tf in zip(doc_ids, tfs):
+                    value = docs[doc]
+                    if value is None:
+                        continue
+                    norm = tf + BM25_K1 * (1 - BM25_B + BM25_B * value[2] / average_length)
+                    scores[doc] = scores.get(doc, 0.0) + idf * tf * (BM25_K1 + 1) / norm
+            top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: item[1])[offset:]
+            return len(scores), [(docs[doc][0], score) for doc, score in top], query_terms
+
+    # ---------- синхронизация с файлами ----------
+
+    def sync(self) -> int:
+        """Переиндексировать изменившиеся и убрать исчезнувшие договоры; число изменений"""
+        changed = 0
+        seen = set()
+        for key in contract_files.contract_ids():
+            seen.add(key)
+            changed += self.sync_contract(key)
+        for key in [key for key in self.by_key if key not in seen]:
+            self.remove(key)
+            changed += 1
+        self._synced_at = time.monotonic()
+        if self.dirty:
+            self.save()
+        return changed
+
+    def sync_contract(self, key: int) -> int:
+        entry = contract_files.get(key, None)
+        if entry is None:
+            if key in self.by_key:
+                self.remove(key)
+                return 1
+            return 0
+        if self.version(key) == entry.etag:
+            return 0
+        try:
+            text = read_text(entry.path)
+        except OSError:
+            return 0
+        self.add(key, text, entry.etag)
+        return 1
+
+    def sync_due(self) -> bool:
+        return time.monotonic() - self._synced_at >= self.sync_interval
+
+    # ---------- сохранение ----------
+
+    def save(self):
+        with self._lock:
+            self._maybe_compact()
+            state = {
+                "format": INDEX_FORMAT,
+                "docs": self.docs,
+                "postings": self.postings,
+                "total_length": self.total_length,
+                "deleted": self.deleted,
+            }
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.path}.{os.getpid()}.tmp"
+            with open(temporary, "wb") as f:
+                pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporary, self.path)
+            self.dirty = False
+
+    def load(self) -> bool:
+        """Прочитать индекс с диска; False — файла нет или он другого формата"""
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except FileNotFoundError:
+            return False
+        except Exception as e:
+            print(f"⚠️ Индекс поиска по договорам не прочитан: {e}")
+            return False
+        if state.get("format") != INDEX_FORMAT:
+            return False
+        with self._lock:
+            self.docs = state["docs"]
+            self.postings = state["postings"]
+            self.total_length = state["total_length"]
+            self.deleted = state["deleted"]
+            self.by_key = {value[0]: doc for doc, value in enumerate(self.docs) if value is not None}
+            self.dirty = False
+        return True
+
+
+contract_search = ContractSearchIndex()
+
+
+def ensure_initialized():
+    """Старт: прочитать индекс с диска и доиндексировать изменившиеся договоры"""
+    started = time.perf_counter()
+    loaded = contract_search.load()
+    changed = contract_search.sync()
+    source = "загружен с диска" if loaded else "построен"
+    print(f"🔎 Индекс поиска по договорам {source}: {contract_search.size} договоров, "
+          f"обновлено {changed}, {time.perf_counter() - started:.2f} с")
+
@@ -0,0 +1,237 @@
+"""Загрузка файлов договоров: потоковый разбор multipart, SHA-256, дедупликация.
+
+Тело запроса разбирается по мере поступления (python-multipart,
+MultipartParser): содержимое файла сразу пишется во временный файл в
+хранилище и хэшируется, в памяти — только текущий кусок. Размер
+ограничен CONTRACT_UPLOAD_MAX_MB (проверяется и по Content-Length, и по
+факту), поля формы — CONTRACT_UPLOAD_MAX_FIELD_KB.
+
+Хранилище адресуется содержимым:
+
+    CONTRACT_STORE_DIR/<sha256[:2]>/<sha256>
+
+Одинаковое содержимое хранится один раз. Под человеческим именем
+(ДОГ-2025-001.txt) файл появляется в каталоге договоров жёсткой ссылкой на
+объект хранилища (если ссылки не поддерживаются — копией); замена имени
+атомарна (os.replace), а при ошибке записи в БД прежний файл
+восстанавливается (publish/rollback).
+
+Объекты, на которые больше не ссылается ни один договор, не удаляются.
+"""
+import hashlib
+import os
+import shutil
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from fastapi import Request
+from multipart.multipart import MultipartParser, parse_options_header
+from starlette.concurrency import run_in_threadpool
+
+from app.contract_files import CONTRACT_DIRS
+
+CONTRACT_STORE_DIR = os.getenv("CONTRACT_STORE_DIR", os.path.join("storage", "contracts"))
+CONTRACT_UPLOAD_MAX_MB = float(os.getenv("CONTRACT_UPLOAD_MAX_MB", "20"))
+CONTRACT_UPLOAD_MAX_FIELD_KB = int(os.getenv("CONTRACT_UPLOAD_MAX_FIELD_KB", "64"))
+
+# Оригиналы договоров — текст; остальные форматы собираются из него
+UPLOAD_EXTENSIONS = {".txt"}
+
+
+class UploadError(Exception):
+    """Некорректная загрузка; status_code — для HTTP-ответа"""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class StoredBlob:
+    sha256: str
+    size: int
+    path: str
+    deduplicated: bool  # такое содержимое уже было в хранилище
+
+
+class BlobWriter:
+    """Временный файл в хранилище + SHA-256 по мере записи"""
+
+    def __init__(self, max_bytes: int, directory: str = CONTRACT_STORE_DIR):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, "tmp"), exist_ok=True)
+        handle, self.temporary = tempfile.mkstemp(dir=os.path.join(directory, "tmp"))
+        self._file = os.fdopen(handle, "wb")
+        self._digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            raise UploadError(f"Файл больше {self.max_bytes // (1024 * 1024)} МБ", status_code=413)
+        self._digest.update(data)
+        self._file.write(data)
+
+    def commit(self) -> StoredBlob:
+        """Переместить в хранилище под именем-хэшем; если такой объект есть — выбросить копию"""
+        self._file.close()
+        sha256 = self._digest.hexdigest()
+        path = os.path.join(self.directory, sha256[:2], sha256)
+        if os.path.exists(path):
+            os.remove(self.temporary)
+            return StoredBlob(sha256, self.size, path, deduplicated=True)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.chmod(self.temporary, 0o644)  # mkstemp создаёт 0600, а файл раздаётся из static
+        os.replace(self.temporary, path)
+        return StoredBlob(sha256, self.size, path, deduplicated=False)
+
+    def abort(self):
+        self._file.close()
+        try:
+            os.remove(self.temporary)
+        except OSError:
+            pass
+
+
+async def receive_upload(request: Request, max_bytes: int = int(CONTRACT_UPLOAD_MAX_MB * 1024 * 1024)
+                         ) -> Tuple[Dict[str, str], Optional[StoredBlob], Optional[str]]:
+    """Разобрать multipart/form-data потоком: (текстовые поля, файл в хранилище, имя файла)"""
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    boundary = options.get(b"boundary")
+    if content_type != b"multipart/form-data" or not boundary:
+        raise UploadError("Ожидается multipart/form-data", status_code=415)
+    max_field = CONTRACT_UPLOAD_MAX_FIELD_KB * 1024
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_bytes + max_field * 16:
+        raise UploadError(f"Файл больше {max_bytes // (1024 * 1024)} МБ", status_code=413)
+
+    fields: Dict[str, str] = {}
+    state = {"header_field": b"", "header_value": b"", "headers": {}, "name": None, "value": bytearray()}
+    upload = {"writer": None, "filename": None, "blob": None}
+    pending = []  # куски файла, полученные из текущего куска тела
+
+    def on_part_begin():
+        state["headers"] = {}
+        state["name"] = None
+        state["value"] = bytearray()
+
+    def on_header_field(data, start, end):
+        state["header_field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["header_value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["header_field"].lower()] = state["header_value"]
+        state["header_field"] = b""
+        state["header_value"] = b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        state["name"] = disposition.get(b"name", b"").decode("utf-8", errors="replace")
+        if b"filename" in disposition:
+            if upload["writer"] is not None:
+                raise UploadError("Можно загрузить только один файл")
+            filename = os.path.basename(disposition[b"filename"].decode("utf-8", errors="replace").replace("\\", "/"))
+            if os.path.splitext(filename)[1].lower() not in UPLOAD_EXTENSIONS:
+                raise UploadError(f"Допустимые файлы: {', '.join(sorted(UPLOAD_EXTENSIONS))}", status_code=415)
+            upload["filename"] = filename
+            upload["writer"] = BlobWriter(max_bytes)
+            state["name"] = None  # дальше — данные файла
+
+    def on_part_data(data, start, end):
+        if state["name"] is None:
+            pending.append(data[start:end])
+        else:
+            state["value"] += data[start:end]
+            if len(state["value"]) > max_field:
+                raise UploadError(f"Поле {state['name']} длиннее {CONTRACT_UPLOAD_MAX_FIELD_KB} КБ", status_code=413)
+
+    def on_part_end():
+        if state["name"] is not None:
+            fields[state["name"]] = state["value"].decode("utf-8", errors="replace")
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+
+    def write_pending():
+        writer = upload["writer"]
+        for data in pending:
+            writer.write(data)
+        pending.clear()
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            if pending:
+                # Запись на диск — вне цикла событий
+                await run_in_threadpool(write_pending)
+        parser.finalize()
+        if upload["writer"] is not None:
+            upload["blob"] = await run_in_threadpool(upload["writer"].commit)
+    except BaseException:
+        if upload["writer"] is not None:
+            upload["writer"].abort()
+        raise
+
+    return fields, upload["blob"], upload["filename"]
+
+
+# ---------- публикация под именем договора ----------
+
+class Publication:
+    """Файл договора под человеческим именем; rollback() возвращает прежнее состояние"""
+
+    def __init__(self, path: str, backup: Optional[str]):
+        self.path = path
+        self._backup = backup
+
+    def commit(self):
+        if self._backup:
+            try:
+                os.remove(self._backup)
+            except OSError:
+                pass
+
+    def rollback(self):
+        if self._backup:
+            os.replace(self._backup, self.path)
+        else:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+def _link_or_copy(source: str, target: str):
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+def publish(blob: StoredBlob, filename: str, directory: str = CONTRACT_DIRS[0]) -> Publication:
+    """Атомарно поставить объект хранилища под именем filename в каталоге договоров"""
+    if os.path.basename(filename) != filename or filename.startswith("."):
+        raise UploadError("Недопустимое имя файла договора")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, filename)
+    token = uuid.uuid4().hex
+    backup = None
+    if os.path.exists(path):
+        backup = f"{path}.{token}.bak"
+        _link_or_copy(path, backup)
+    staged = f"{path}.{token}.tmp"
+    _link_or_copy(blob.path, staged)
+    os.replace(staged, path)
+    return Publication(path, backup)
@@ -0,0 +1,179 @@
+"""Каталог договоров в таблице contracts.
+
+Раньше договоры были словарём CONTRACTS_DB в app/main.py; при первом
+запуске (пустая таблица) они импортируются из SEED_CONTRACTS.
+
+Ответы списка и карточки кэшируются на CONTRACTS_CACHE_TTL секунд и
+сбрасываются при любом изменении через API (в этом процессе; в соседних
+процессах — по истечении TTL).
+"""
+import os
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+
+from app.contract_files import contract_files
+from app.contract_search import contract_search
+from app.models import Contract
+from app.stats_service import TTLCache
+
+CONTRACTS_CACHE_TTL = float(os.getenv("CONTRACTS_CACHE_TTL", "300"))
+
+contracts_cache = TTLCache(CONTRACTS_CACHE_TTL)
+
+# Договоры, которые раньше жили в app/main.py (CONTRACTS_DB)
+SEED_CONTRACTS = [
+    {
+        "id": 1,
+        "number": "ДОГ-2025-001",
+        "name": "Разработка веб-портала",
+        "client": "ООО \"ТехноПром\"",
+        "date": "2025-01-15",
+        "amount": 450000,
+        "original_file": "ДОГ-2025-001.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+    {
+        "id": 2,
+        "number": "ДОГ-2025-042",
+        "name": "Мобильное приложение",
+        "client": "ИП Иванов А.А.",
+        "date": "2025-02-10",
+        "amount": 780000,
+        "original_file": "ДОГ-2025-042.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+    {
+        "id": 3,
+        "number": "ДОГ-2024-128",
+        "name": "Автоматизация отчетности",
+        "client": "АО \"СтройИнвест\"",
+        "date": "2024-11-05",
+        "amount": 320000,
+        "original_file": "ДОГ-2024-128.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+    {
+        "id": 4,
+        "number": "ДОГ-2025-089",
+        "name": "SEO-оптимизация",
+        "client": "ООО \"МедиаГрупп\"",
+        "date": "2025-03-01",
+        "amount": 180000,
+        "original_file": "ДОГ-2025-089.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+    {
+        "id": 5,
+        "number": "ДОГ-2024-256",
+        "name": "Разработка LMS",
+        "client": "ЧУ ДПО \"Образование+\"",
+        "date": "2024-09-20",
+        "amount": 950000,
+        "original_file": "ДОГ-2024-256.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+    {
+        "id": 6,
+        "number": "ДОГ-2025-103",
+        "name": "Система управления складом",
+        "client": "ООО \"ЛогистикПро\"",
+        "date": "2025-03-15",
+        "amount": 1250000,
+        "original_file": "ДОГ-2025-103.txt",
+        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+    },
+]
+
+
+def contract_to_dict(contract: Contract) -> Dict[str, Any]:
+    """Формат ответа прежнего CONTRACTS_DB (+ связи с пользователем и проектом)"""
+    return {
+        "id": contract.id,
+        "number": contract.number,
+        "name": contract.name,
+        "client": contract.client,
+        "date": contract.date.isoformat() if contract.date else None,
+        "amount": contract.amount,
+        "original_file": contract.original_file,
+        "available_formats": list(contract.available_formats or []),
+        "user_id": contract.user_id,
+        "project_id": contract.project_id,
+    }
+
+
+def list_contracts(db: Session, client: Optional[str] = None, user_id: Optional[int] = None,
+                   project_id: Optional[int] = None, date_from: Optional[date] = None,
+                   date_to: Optional[date] = None, amount_min: Optional[int] = None,
+                   amount_max: Optional[int] = None, limit: int = 100, offset: int = 0) -> dict:
+    """Страница договоров по фильтрам (из кэша); {"total": ..., "items": [...]}"""
+    filters = dict(client=client, user_id=user_id, project_id=project_id, date_from=date_from,
+                   date_to=date_to, amount_min=amount_min, amount_max=amount_max)
+    key = "list:" + repr(sorted(filters.items())) + f":{limit}:{offset}"
+
+    def compute():
+        conditions = []
+        if client:
+            conditions.append(Contract.client == client)
+        if user_id is not None:
+            conditions.append(Contract.user_id == user_id)
+        if project_id is not None:
+            conditions.append(Contract.project_id == project_id)
+        if date_from:
+            conditions.append(Contract.date >= date_from)
+        if date_to:
+            conditions.append(Contract.date <= date_to)
+        if amount_min is not None:
+            conditions.append(Contract.amount >= amount_min)
+        if amount_max is not None:
+            conditions.append(Contract.amount <= amount_max)
+
+        total = db.scalar(select(func.count(Contract.id)).where(*conditions))
+        rows = db.scalars(
+            select(Contract).where(*conditions)
+            .order_by(Contract.id)
+            .offset(offset).limit(limit)
+        ).all()
+        return {"total": total, "items": [contract_to_dict(row) for row in rows]}
+
+    return contracts_cache.get_or_compute(key, compute)
+
+
+def get_contract(db: Session, contract_id: int) -> Optional[Dict[str, Any]]:
+    """Договор по id (из кэша); None — не найден"""
+    def compute():
+        contract = db.get(Contract, contract_id)
+        return contract_to_dict(contract) if contract else None
+
+    return contracts_cache.get_or_compute(f"contract:{contract_id}", compute)
+
+
+def all_contracts(db: Session) -> List[Dict[str, Any]]:
+    return [contract_to_dict(row) for row in db.scalars(select(Contract).order_by(Contract.id))]
+
+
+def changed(contract: Optional[Contract] = None, deleted_id: Optional[int] = None):
+    """Сбросить кэш, обновить индексы файлов и поиска после изменения договора"""
+    contracts_cache.invalidate()
+    if contract is not None:
+        contract_files.add(contract_to_dict(contract))
+        contract_search.sync_contract(contract.id)
+    if deleted_id is not None:
+        contract_files.forget(deleted_id)
+        contract_search.remove(deleted_id)
+
+
+def ensure_initialized(db: Session):
+    """Первый запуск: импортировать прежний CONTRACTS_DB в пустую таблицу"""
+    if db.scalar(select(func.count()).select_from(Contract)) == 0:
+        for item in SEED_CONTRACTS:
+            db.add(Contract(**dict(item, date=date.fromisoformat(item["date"]))))
+        db.flush()
+        # id заданы явно (на них ссылаются страницы) — PostgreSQL должен
+        # продолжить последовательность после них
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT setval(pg_get_serial_sequence('contracts', 'id'), (SELECT MAX(id) FROM contracts))"))
+        db.commit()
+        print(f"📄 Договоры импортированы: {len(SEED_CONTRACTS)}")
@@ -0,0 +1,351 @@
+"""Счётчики для дашбордов в таблице counters.
+
+Значения ведутся ORM-хуками в той же транзакции, что и изменения данных:
+вставка, удаление и смена статуса/суммы у User, Service, Project, Message,
+Transaction и Payment. Итоги на дашборде читаются из counters по ключу,
+без COUNT/SUM по большим таблицам.
+
+Ключи:
+    users_total, services_total, projects_total, messages_total,
+    transactions_total, transactions_amount_total, payments_total,
+    projects_status:<status>, payments_status:<status>,
+    payments_amount:succeeded
+
+Суммы по дням лежат в daily_rollups (см. app/rollups.py).
+
+Изменения в обход ORM (bulk UPDATE, ручной SQL, скрипты) счётчики не видят —
+для этого есть сверка:
+
+    python -m app.counters reconcile          # показать расхождения
+    python -m app.counters reconcile --fix    # исправить
+"""
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable
+
+from sqlalchemy import event, func, select, update, inspect as sa_inspect
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import User, Service, Project, Message, Transaction, Payment, Counter
+
+# ---------- вклад одной строки в счётчики ----------
+
+def _user_counters(values: dict) -> Dict[str, int]:
+    return {"users_total": 1}
+
+
+def _service_counters(values: dict) -> Dict[str, int]:
+    return {"services_total": 1}
+
+
+def _project_counters(values: dict) -> Dict[str, int]:
+    return {
+        "projects_total": 1,
+        f"projects_status:{values['status']}": 1,
+    }
+
+
+def _message_counters(values: dict) -> Dict[str, int]:
+    return {"messages_total": 1}
+
+
+def _transaction_counters(values: dict) -> Dict[str, int]:
+    return {
+        "transactions_total": 1,
+        "transactions_amount_total": values["amount"] or 0,
+    }
+
+
+def _payment_counters(values: dict) -> Dict[str, int]:
+    result = {
+        "payments_total": 1,
+        f"payments_status:{values['status']}": 1,
+    }
+    if values["status"] == "succeeded":
+        result["payments_amount:succeeded"] = values["amount"] or 0
+    return result
+
+
+# модель -> (функция вклада, атрибуты, от которых он зависит)
+TRACKED = {
+    User: (_user_counters, ()),
+    Service: (_service_counters, ()),
+    Project: (_project_counters, ("status",)),
+    Message: (_message_counters, ()),
+    Transaction: (_transaction_counters, ("amount",)),
+    Payment: (_payment_counters, ("status", "amount")),
+}
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+def track_old_values(model, attrs: Iterable[str]):
+    """Помнить старое значение атрибутов, даже если они были expired на
+    момент присваивания (обычная ситуация после commit) — иначе history
+    его не хранит"""
+    for attr in attrs:
+        event.listen(getattr(model, attr), "set", _keep_old_value, active_history=True)
+
+
+for _model, (_, _attrs) in TRACKED.items():
+    track_old_values(_model, _attrs)
+
+
+def attribute_values(obj, attrs: Iterable[str], old: bool) -> dict:
+    """Текущие или исходные (до изменения в сессии) значения атрибутов"""
+    state = sa_inspect(obj)
+    result = {}
+    for attr in attrs:
+        if old:
+            history = state.attrs[attr].history
+            if history.deleted:
+                result[attr] = history.deleted[0]
+                continue
+        value = getattr(obj, attr)
+        if value is None:
+            # Для новых объектов Column(default=...) подставится только при INSERT
+            default = obj.__table__.c[attr].default
+            if default is not None and default.is_scalar:
+                value = default.arg
+        result[attr] = value
+    return result
+
+
+def add_contribution(deltas: Dict[str, int], contribution: Dict[str, int], sign: int):
+    for name, value in contribution.items():
+        deltas[name] += sign * value
+
+
+def collect_deltas(session: Session) -> Dict[str, int]:
+    """Изменения счётчиков для объектов, ожидающих flush"""
+    deltas: Dict[str, int] = defaultdict(int)
+
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            counters, attrs = tracked
+            add_contribution(deltas, counters(attribute_values(obj, attrs, old=False)), +1)
+
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            counters, attrs = tracked
+            add_contribution(deltas, counters(attribute_values(obj, attrs, old=True)), -1)
+
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if not tracked or not tracked[1]:
+            continue
+        counters, attrs = tracked
+        state = sa_inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in attrs):
+            continue
+        add_contribution(deltas, counters(attribute_values(obj, attrs, old=True)), -1)
+        add_contribution(deltas, counters(attribute_values(obj, attrs, old=False)), +1)
+
+    return {name: delta for name, delta in deltas.items() if delta}
+
+
+def increment(connection, deltas: Dict[str, int]):
+    """Атомарно прибавить deltas к счётчикам (UPSERT)"""
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    table = Counter.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.name],
+            set_={"value": table.c.value + stmt.excluded.value, "updated_at": now}
+        )
+        connection.execute(stmt, [
+            {"name": name, "value": delta, "updated_at": now}
+            for name, delta in sorted(deltas.items())
+        ])
+        return
+
+    # Прочие СУБД: UPDATE, а если строки нет — INSERT
+    for name, delta in sorted(deltas.items()):
+        result = connection.execute(
+            update(table).where(table.c.name == name)
+            .values(value=table.c.value + delta, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(name=name, value=delta, updated_at=now))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_counter_deltas(session, flush_context, instances):
+    deltas = collect_deltas(session)
+    if deltas:
+        pending = session.info.setdefault("counter_deltas", defaultdict(int))
+        for name, delta in deltas.items():
+            pending[name] += delta
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_counter_deltas(session, flush_context):
+    deltas = session.info.pop("counter_deltas", None)
+    if deltas:
+        increment(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_counter_deltas(session):
+    session.info.pop("counter_deltas", None)
+
+
+# ---------- чтение ----------
+
+def read_counters(db: Session, names: Iterable[str]) -> Dict[str, int]:
+    """Прочитать счётчики одним запросом (отсутствующие ключи = 0)"""
+    names = list(names)
+    rows = db.execute(select(Counter.name, Counter.value).where(Counter.name.in_(names))).all()
+    result = dict.fromkeys(names, 0)
+    result.update({name: value for name, value in rows})
+    return result
+
+
+# ---------- сверка ----------
+
+def compute_expected(db: Session) -> Dict[str, int]:
+    """Пересчитать все счётчики из исходных таблиц"""
+    expected: Dict[str, int] = defaultdict(int)
+
+    expected["users_total"] = db.scalar(select(func.count(User.id))) or 0
+    expected["services_total"] = db.scalar(select(func.count(Service.id))) or 0
+    expected["messages_total"] = db.scalar(select(func.count(Message.id))) or 0
+
+    expected["projects_total"] = db.scalar(select(func.count(Project.id))) or 0
+    for status, count in db.execute(
+        select(Project.status, func.count(Project.id)).group_by(Project.status)
+    ):
+        expected[f"projects_status:{status}"] += count
+
+    expected["transactions_total"] = db.scalar(select(func.count(Transaction.id))) or 0
+    expected["transactions_amount_total"] = db.scalar(
+        select(func.coalesce(func.sum(Transaction.amount), 0))
+    ) or 0
+
+    expected["payments_total"] = db.scalar(select(func.count(Payment.id))) or 0
+    for status, count, amount in db.execute(
+        select(Payment.status, func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0))
+        .group_by(Payment.status)
+    ):
+        expected[f"payments_status:{status}"] += count
+        if status == "succeeded":
+            expected["payments_amount:succeeded"] += amount
+
+    return dict(expected)
+
+
+def reconcile(db: Session, fix: bool = False) -> Dict[str, dict]:
+    """Сравнить counters с исходными таблицами.
+
+    Возвращает {ключ: {"stored": ..., "expected": ..., "drift": ...}} для
+    расходящихся ключей. При fix=True записывает правильные значения.
+    """
+    expected = compute_expected(db)
+    stored = {name: value for name, value in db.execute(select(Counter.name, Counter.value))}
+
+    drift = {}
+    for name in sorted(set(expected) | set(stored)):
+        want = expected.get(name, 0)
+        have = stored.get(name, 0)
+        if want != have:
+            drift[name] = {"stored": have, "expected": want, "drift": have - want}
+
+    if fix and drift:
+        now = datetime.utcnow()
+        for name, item in drift.items():
+            if name in stored:
+                db.execute(update(Counter).where(Counter.name == name).values(value=item["expected"], updated_at=now))
+            else:
+                db.add(Counter(name=name, value=item["expected"], updated_at=now))
+        db.commit()
+
+    return drift
+
+
+def insert_absent(connection, values: Dict[str, int]) -> int:
+    """Вставить счётчики, которых ещё нет; существующие не трогать.
+    Возвращает число вставленных строк"""
+    if not values:
+        return 0
+    now = datetime.utcnow()
+    table = Counter.__table__
+    rows = [{"name": name, "value": value, "updated_at": now} for name, value in sorted(values.items())]
+    dialect = connection.dialect.name
+
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        inserted = 0
+        for row in rows:
+            inserted += connection.execute(
+                insert(table).values(**row).on_conflict_do_nothing(index_elements=[table.c.name])
+            ).rowcount
+        return inserted
+
+    # Прочие СУБД: каждая вставка в своей точке сохранения
+    inserted = 0
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(**row))
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def ensure_initialized(db: Session):
+    """Заполнить пустую таблицу counters из исходных таблиц (первый запуск).
+    Несколько воркеров могут стартовать одновременно: вставка «если нет»,
+    ключи, уже записанные соседом, пропускаются"""
+    if db.scalar(select(func.count()).select_from(Counter)) == 0:
+        inserted = insert_absent(db.connection(), compute_expected(db))
+        db.commit()
+        print(f"📊 Счётчики инициализированы: {inserted} ключей")
+
+
+def main(argv):
+    from app.database import SessionLocal
+
+    if not argv or argv[0] != "reconcile":
+        print("Использование: python -m app.counters reconcile [--fix]")
+        return 2
+
+    fix = "--fix" in argv
+    db = SessionLocal()
+    try:
+        drift = reconcile(db, fix=fix)
+    finally:
+        db.close()
+
+    if not drift:
+        print("✅ Счётчики совпадают с исходными таблицами")
+        return 0
+
+    print(f"⚠️ Расхождений: {len(drift)}")
+    for name, item in drift.items():
+        print(f"  {name}: stored={item['stored']} expected={item['expected']} drift={item['drift']:+d}")
+    if fix:
+        print("✅ Исправлено")
+    return 0 if fix else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
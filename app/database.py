@@ -226,6 +226,11 @@ def create_tables():
         
         # Создаём все таблицы, если их ещё нет
         Base.metadata.create_all(bind=engine)
+        
+        # create_all не добавляет новые индексы в уже существующие таблицы
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(bind=engine, checkfirst=True)
         logger.info("✅ Таблицы БД созданы/проверены")
         
         # Дополнительная проверка для PostgreSQL
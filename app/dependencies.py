@@ -4,13 +4,22 @@ from sqlalchemy.orm import Session
 from jose import jwt
 from datetime import datetime
 from typing import Optional
+import os
 from app.database import get_db
 from app.models import User
+from app.token_cache import VerifiedTokenCache
 
 # Прямое определение SECRET_KEY и ALGORITHM (без импорта из main)
 SECRET_KEY = "your-super-secret-jwt-key-change-this-in-production"
 ALGORITHM = "HS256"
 
+# Общий кэш проверенных токенов (API, /dashboard, /admin)
+token_cache = VerifiedTokenCache(
+    SECRET_KEY,
+    ALGORITHM,
+    maxsize=int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 async def get_current_user(
@@ -47,7 +56,7 @@ async def get_current_user(
     
     # 6. Декодируем токен
     try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
+        payload = token_cache.decode(access_token)
         user_id = payload.get("sub")
         
         if user_id is None:
@@ -63,7 +72,7 @@ async def get_current_user(
             detail="Токен истек",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    except jwt.InvalidTokenError as e:
+    except jwt.JWTError as e:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail=f"Недействительный токен: {str(e)}",
@@ -0,0 +1,145 @@
+"""Локальный фейк платёжного провайдера (API в формате ЮKassa v3).
+
+Для разработки и нагрузочных проверок без сети:
+
+    uvicorn app.fake_provider:app --port 9000
+
+- POST /v3/payments            — создать платёж (pending), с Idempotence-Key;
+- GET  /v3/payments/{id}       — статус;
+- GET  /confirm/{id}           — «оплатить» (страница подтверждения);
+- POST /fake/payments/{id}/{succeeded|canceled} — сменить статус вручную.
+
+Смена статуса шлёт вебхук на FAKE_PROVIDER_WEBHOOK_URL так же, как
+ЮKassa. Настройки (переменные окружения):
+    FAKE_PROVIDER_LATENCY_MS      задержка каждого ответа (по умолчанию 0)
+    FAKE_PROVIDER_ERROR_RATE      доля ответов 503, чтобы проверить повторы (0)
+    FAKE_PROVIDER_AUTO_OUTCOME    succeeded | canceled | none — чем закончится
+                                  платёж сам через FAKE_PROVIDER_AUTO_DELAY секунд
+    FAKE_PROVIDER_AUTO_DELAY      (по умолчанию 2)
+    FAKE_PROVIDER_WEBHOOK_DROP    доля «потерянных» вебхуков (0) — для сверки
+"""
+import asyncio
+import os
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, RedirectResponse
+
+LATENCY = float(os.getenv("FAKE_PROVIDER_LATENCY_MS", "0")) / 1000
+ERROR_RATE = float(os.getenv("FAKE_PROVIDER_ERROR_RATE", "0"))
+AUTO_OUTCOME = os.getenv("FAKE_PROVIDER_AUTO_OUTCOME", "none")
+AUTO_DELAY = float(os.getenv("FAKE_PROVIDER_AUTO_DELAY", "2"))
+WEBHOOK_URL = os.getenv("FAKE_PROVIDER_WEBHOOK_URL", "http://localhost:8080/api/payments/webhook")
+WEBHOOK_DROP = float(os.getenv("FAKE_PROVIDER_WEBHOOK_DROP", "0"))
+
+app = FastAPI(title="Fake payment provider")
+
+payments: Dict[str, dict] = {}
+idempotence: Dict[str, str] = {}  # Idempotence-Key -> id платежа
+_webhook_client: Optional[httpx.AsyncClient] = None
+
+
+@app.middleware("http")
+async def emulate_network(request: Request, call_next):
+    if LATENCY:
+        await asyncio.sleep(LATENCY)
+    if ERROR_RATE and request.url.path.startswith("/v3/") and random.random() < ERROR_RATE:
+        return JSONResponse({"type": "error", "code": "internal_server_error"}, status_code=503)
+    return await call_next(request)
+
+
+@app.on_event("shutdown")
+async def close_client():
+    if _webhook_client is not None:
+        await _webhook_client.aclose()
+
+
+async def send_webhook(payment: dict):
+    global _webhook_client
+    if WEBHOOK_DROP and random.random() < WEBHOOK_DROP:
+        return
+    if _webhook_client is None:
+        _webhook_client = httpx.AsyncClient(timeout=10)
+    body = {"type": "notification", "event": f"payment.{payment['status']}", "object": payment}
+    for attempt in range(3):
+        try:
+            response = await _webhook_client.post(WEBHOOK_URL, json=body)
+            if response.status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.5 * (attempt + 1))
+
+
+def set_status(payment_id: str, status: str) -> dict:
+    payment = payments.get(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail={"type": "error", "code": "not_found"})
+    if payment["status"] == "pending":
+        payment["status"] = status
+        payment["paid"] = status == "succeeded"
+        asyncio.get_running_loop().create_task(send_webhook(payment))
+    return payment
+
+
+async def auto_finish(payment_id: str):
+    await asyncio.sleep(AUTO_DELAY)
+    set_status(payment_id, AUTO_OUTCOME)
+
+
+@app.post("/v3/payments")
+async def create_payment(request: Request, idempotence_key: Optional[str] = Header(None)):
+    if not idempotence_key:
+        raise HTTPException(status_code=400, detail={"type": "error", "code": "invalid_request",
+                                                     "description": "Idempotence-Key required"})
+    if idempotence_key in idempotence:
+        return payments[idempotence[idempotence_key]]
+
+    body = await request.json()
+    payment_id = str(uuid.uuid4())
+    base_url = str(request.base_url).rstrip("/")
+    payment = {
+        "id": payment_id,
+        "status": "pending",
+        "paid": False,
+        "amount": body["amount"],
+        "description": body.get("description"),
+        "metadata": body.get("metadata") or {},
+        "created_at": datetime.utcnow().isoformat() + "Z",
+        "confirmation": {
+            "type": "redirect",
+            "return_url": (body.get("confirmation") or {}).get("return_url"),
+            "confirmation_url": f"{base_url}/confirm/{payment_id}",
+        },
+        "test": True,
+    }
+    payments[payment_id] = payment
+    idempotence[idempotence_key] = payment_id
+    if AUTO_OUTCOME in ("succeeded", "canceled"):
+        asyncio.get_running_loop().create_task(auto_finish(payment_id))
+    return payment
+
+
+@app.get("/v3/payments/{payment_id}")
+async def get_payment(payment_id: str):
+    payment = payments.get(payment_id)
+    if payment is None:
+        raise HTTPException(status_code=404, detail={"type": "error", "code": "not_found"})
+    return payment
+
+
+@app.get("/confirm/{payment_id}")
+async def confirm_payment(payment_id: str):
+    payment = set_status(payment_id, "succeeded")
+    return RedirectResponse(payment["confirmation"]["return_url"] or "/", status_code=302)
+
+
+@app.post("/fake/payments/{payment_id}/{status}")
+async def force_status(payment_id: str, status: str):
+    if status not in ("succeeded", "canceled"):
+        raise HTTPException(status_code=400, detail="succeeded | canceled")
+    return set_status(payment_id, status)
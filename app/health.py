@@ -0,0 +1,158 @@
+"""Проверки живости и готовности для платформы (railway.json healthcheckPath).
+
+/healthz — процесс жив и цикл событий отвечает: без БД, без шаблонов,
+готовые байты.
+
+/readyz — готовность принимать трафик. Состояние БД проверяет фоновая
+задача (start_checker при старте) раз в HEALTH_CHECK_INTERVAL секунд:
+SELECT 1, время ответа, состояние пула, ревизия миграций (alembic_version)
+против головы в alembic/versions. Проба только читает последний снимок —
+к пулу не обращается. Готов = последняя проверка успешна и не старше
+HEALTH_STALE_AFTER секунд (если проверка зависла на исчерпанном пуле,
+снимок устаревает и /readyz отвечает 503).
+
+Ревизия миграций — справочно: схему создаёт create_all, alembic при деплое
+не запускается, поэтому на готовность она не влияет.
+"""
+import asyncio
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi.responses import Response
+from sqlalchemy import text
+from starlette.concurrency import run_in_threadpool
+
+from app.database import engine
+
+HEALTH_CHECK_INTERVAL = float(os.getenv("HEALTH_CHECK_INTERVAL", "5"))
+HEALTH_STALE_AFTER = float(os.getenv("HEALTH_STALE_AFTER", str(HEALTH_CHECK_INTERVAL * 3)))
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic", "versions")
+
+HEADERS = {"Cache-Control": "no-store"}
+LIVE_BODY = b'{"status":"ok"}'
+
+_REVISION = re.compile(r"^revision\b[^=]*=\s*['\"]([^'\"]+)['\"]", re.M)
+_DOWN_REVISION = re.compile(r"^down_revision\b[^=]*=\s*(.+)$", re.M)
+
+
+def migration_heads(directory: str = MIGRATIONS_DIR) -> List[str]:
+    """Головы миграций по файлам alembic/versions (без импорта alembic)"""
+    revisions, parents = set(), set()
+    for path in glob.glob(os.path.join(directory, "*.py")):
+        with open(path, encoding="utf-8") as f:
+            source = f.read()
+        revision = _REVISION.search(source)
+        if not revision:
+            continue
+        revisions.add(revision.group(1))
+        down = _DOWN_REVISION.search(source)
+        if down:
+            parents.update(re.findall(r"['\"]([^'\"]+)['\"]", down.group(1)))
+    return sorted(revisions - parents)
+
+
+def pool_state() -> dict:
+    """Счётчики пула без захвата соединения"""
+    pool = engine.pool
+    state = {"class": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            state[name] = method()
+    return state
+
+
+def check_database() -> dict:
+    """Одна проверка БД (в пуле потоков, из фоновой задачи)"""
+    started = time.perf_counter()
+    result = {"backend": engine.dialect.name}
+    try:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            result["latency_ms"] = round((time.perf_counter() - started) * 1000, 2)
+            try:
+                result["revision"] = conn.execute(text("SELECT version_num FROM alembic_version")).scalar()
+            except Exception:
+                result["revision"] = None  # таблицы нет: схема создана create_all
+        result["ok"] = True
+    except Exception as e:
+        result["ok"] = False
+        result["error"] = f"{type(e).__name__}: {e}"[:300]
+    return result
+
+
+class HealthChecker:
+    def __init__(self, interval: float = HEALTH_CHECK_INTERVAL, stale_after: float = HEALTH_STALE_AFTER):
+        self.interval = interval
+        self.stale_after = stale_after
+        self.heads = migration_heads()
+        self._checked_at: Optional[float] = None
+        self._ok = False
+        self._body = json.dumps({"status": "starting"}).encode()
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self):
+        database = await run_in_threadpool(check_database)
+        database["pool"] = pool_state()
+        revision = database.get("revision")
+        database["migrations"] = {
+            "revision": revision,
+            "heads": self.heads,
+            "up_to_date": revision in self.heads if revision else None,
+        }
+        database.pop("revision", None)
+        self._ok = database["ok"]
+        self._checked_at = time.monotonic()
+        self._body = json.dumps({
+            "status": "ready" if self._ok else "unavailable",
+            "checked_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+            "interval": self.interval,
+            "database": database,
+        }, ensure_ascii=False).encode()
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Проверка готовности: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self.run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def readiness(self) -> Response:
+        """Последний снимок: 200 — готов, 503 — нет, ещё не проверяли или снимок устарел"""
+        if self._checked_at is None:
+            return Response(self._body, status_code=503, media_type="application/json", headers=HEADERS)
+        age = time.monotonic() - self._checked_at
+        if age > self.stale_after:
+            body = json.dumps({"status": "stale", "age": round(age, 1), "last": json.loads(self._body)},
+                              ensure_ascii=False).encode()
+            return Response(body, status_code=503, media_type="application/json", headers=HEADERS)
+        return Response(self._body, status_code=200 if self._ok else 503, media_type="application/json",
+                        headers=HEADERS)
+
+
+health = HealthChecker()
+
+
+def liveness() -> Response:
+    return Response(LIVE_BODY, media_type="application/json", headers=HEADERS)
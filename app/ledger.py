@@ -0,0 +1,333 @@
+"""Журнал движений по балансу (ledger_entries) и баланс пользователя (user_balances).
+
+Каждое зачисление или списание — новая строка ledger_entries; строки не
+меняются и не удаляются. Вместе с записью, в той же транзакции БД,
+атомарно (UPSERT) обновляется строка user_balances, поэтому баланс
+читается по ключу, сколько бы движений ни было у пользователя.
+
+Успешный платёж (app/billing.py) пишет запись kind="payment" со ссылкой
+на платёж и созданную транзакцию; уникальный ключ (payment_id, kind) не
+даст зачислить платёж дважды.
+
+Перенос старых транзакций (kind="import") идёт при старте в каждом
+воркере: записи вставляются «если нет» по уникальному ключу
+(transaction_id, kind), балансы записываются суммами журнала (UPSERT),
+поэтому параллельный перенос в двух процессах ничего не удваивает.
+
+Сверка баланса с журналом и журнала с completed-транзакциями:
+
+    python -m app.ledger reconcile          # показать расхождения
+    python -m app.ledger reconcile --fix    # дописать журнал и пересчитать балансы
+"""
+import sys
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import case, delete, event, func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import LedgerEntry, Transaction, UserBalance
+
+BALANCE_FIELDS = ["balance", "total_credited", "total_debited", "entries_count"]
+
+# Статус транзакции, которая должна быть отражена в журнале
+LEDGER_TRANSACTION_STATUS = "completed"
+
+
+@event.listens_for(LedgerEntry, "before_update")
+@event.listens_for(LedgerEntry, "before_delete")
+def _forbid_changes(mapper, connection, target):
+    raise ValueError("ledger_entries только дополняется: исправления — новой записью kind='adjustment'")
+
+
+def _balance_delta(amount: int) -> dict:
+    return {
+        "balance": amount,
+        "total_credited": max(amount, 0),
+        "total_debited": max(-amount, 0),
+        "entries_count": 1,
+    }
+
+
+def apply_to_balances(connection, deltas: Dict[int, dict]):
+    """Атомарно прибавить изменения к user_balances (UPSERT по user_id)"""
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    table = UserBalance.__table__
+    rows = [dict(deltas[user_id], user_id=user_id, updated_at=now) for user_id in sorted(deltas)]
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        set_ = {field: table.c[field] + stmt.excluded[field] for field in BALANCE_FIELDS}
+        set_["updated_at"] = now
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.user_id], set_=set_)
+        connection.execute(stmt, rows)
+        return
+
+    # Прочие СУБД: UPDATE, а если строки нет — INSERT
+    for row in rows:
+        result = connection.execute(
+            update(table).where(table.c.user_id == row["user_id"]).values(
+                updated_at=now, **{field: table.c[field] + row[field] for field in BALANCE_FIELDS}
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+def _dialect_insert(connection):
+    """insert с ON CONFLICT для PostgreSQL и SQLite; None — для прочих СУБД"""
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
+
+
+def write_balances(connection, values: Dict[int, dict]):
+    """Записать балансы как есть (UPSERT по user_id): повторная запись тех же
+    сумм другим процессом безвредна"""
+    if not values:
+        return
+    now = datetime.utcnow()
+    table = UserBalance.__table__
+    rows = [dict(values[user_id], user_id=user_id, updated_at=now) for user_id in sorted(values)]
+
+    insert = _dialect_insert(connection)
+    if insert is not None:
+        stmt = insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.user_id],
+            set_={field: stmt.excluded[field] for field in BALANCE_FIELDS + ["updated_at"]}
+        )
+        connection.execute(stmt, rows)
+        return
+
+    for row in rows:
+        result = connection.execute(update(table).where(table.c.user_id == row["user_id"]).values(**row))
+        if result.rowcount == 0:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**row))
+            except IntegrityError:
+                connection.execute(update(table).where(table.c.user_id == row["user_id"]).values(**row))
+
+
+def insert_imports(connection, transactions: Iterable[Transaction]):
+    """Дописать транзакции в журнал (kind="import"); уже перенесённые — в том
+    числе другим процессом прямо сейчас — пропускаются по (transaction_id, kind)"""
+    now = datetime.utcnow()
+    table = LedgerEntry.__table__
+    rows = [
+        dict(user_id=transaction.user_id, amount=transaction.amount or 0, kind="import",
+             transaction_id=transaction.id, comment="Дописано сверкой", created_at=now)
+        for transaction in transactions
+    ]
+    if not rows:
+        return
+
+    insert = _dialect_insert(connection)
+    if insert is not None:
+        connection.execute(
+            insert(table).on_conflict_do_nothing(index_elements=[table.c.transaction_id, table.c.kind]),
+            rows
+        )
+        return
+
+    for row in rows:
+        try:
+            with connection.begin_nested():
+                connection.execute(table.insert().values(**row))
+        except IntegrityError:
+            pass
+
+
+def post_entry(db: Session, user_id: int, amount: int, kind: str,
+               payment_id: Optional[int] = None, transaction_id: Optional[int] = None,
+               comment: Optional[str] = None) -> LedgerEntry:
+    """Добавить запись в журнал и обновить баланс (в текущей транзакции БД, без commit)"""
+    return post_entries(db, [dict(
+        user_id=user_id,
+        amount=amount,
+        kind=kind,
+        payment_id=payment_id,
+        transaction_id=transaction_id,
+        comment=comment
+    )])[0]
+
+
+def post_entries(db: Session, entries: List[dict]) -> List[LedgerEntry]:
+    """Пакетная запись: одна вставка и один UPSERT балансов на пакет"""
+    now = datetime.utcnow()
+    objects = [LedgerEntry(created_at=now, **entry) for entry in entries]
+    db.add_all(objects)
+    db.flush()
+
+    deltas: Dict[int, dict] = {}
+    for entry in objects:
+        delta = _balance_delta(entry.amount)
+        if entry.user_id in deltas:
+            delta = {field: deltas[entry.user_id][field] + delta[field] for field in BALANCE_FIELDS}
+        deltas[entry.user_id] = delta
+    apply_to_balances(db.connection(), deltas)
+    return objects
+
+
+# ---------- чтение ----------
+
+def read_balances(db: Session, user_ids: Iterable[int]) -> Dict[int, dict]:
+    """Балансы пользователей одним запросом по ключу (нет строки — нули)"""
+    user_ids = list(user_ids)
+    result = {user_id: dict.fromkeys(BALANCE_FIELDS, 0) for user_id in user_ids}
+    if not user_ids:
+        return result
+    for row in db.execute(
+        select(UserBalance.user_id, *[getattr(UserBalance, field) for field in BALANCE_FIELDS])
+        .where(UserBalance.user_id.in_(user_ids))
+    ):
+        result[row[0]] = dict(zip(BALANCE_FIELDS, row[1:]))
+    return result
+
+
+# ---------- сверка ----------
+
+def ledger_totals(db: Session) -> Dict[int, dict]:
+    """Баланс каждого пользователя, посчитанный по журналу"""
+    totals = {}
+    for user_id, balance, credited, debited, count in db.execute(
+        select(
+            LedgerEntry.user_id,
+            func.coalesce(func.sum(LedgerEntry.amount), 0),
+            func.coalesce(func.sum(case((LedgerEntry.amount > 0, LedgerEntry.amount), else_=0)), 0),
+            func.coalesce(func.sum(case((LedgerEntry.amount < 0, -LedgerEntry.amount), else_=0)), 0),
+            func.count(LedgerEntry.id)
+        ).group_by(LedgerEntry.user_id)
+    ):
+        totals[user_id] = {
+            "balance": balance,
+            "total_credited": credited,
+            "total_debited": debited,
+            "entries_count": count,
+        }
+    return totals
+
+
+def unposted_transactions(db: Session) -> List[Transaction]:
+    """Completed-транзакции, которых нет в журнале"""
+    posted = select(LedgerEntry.transaction_id).where(LedgerEntry.transaction_id.isnot(None))
+    return db.scalars(
+        select(Transaction)
+        .where(Transaction.status == LEDGER_TRANSACTION_STATUS, Transaction.id.notin_(posted))
+        .order_by(Transaction.id)
+    ).all()
+
+
+def stale_entries(db: Session) -> List[tuple]:
+    """Записи журнала со ссылкой на транзакцию, которая (уже) не completed"""
+    return db.execute(
+        select(LedgerEntry.id, LedgerEntry.transaction_id, Transaction.status)
+        .join(Transaction, Transaction.id == LedgerEntry.transaction_id)
+        .where(Transaction.status != LEDGER_TRANSACTION_STATUS)
+        .order_by(LedgerEntry.id)
+    ).all()
+
+
+def reconcile(db: Session, fix: bool = False) -> dict:
+    """Сверить user_balances с журналом и журнал с транзакциями.
+
+    Возвращает {"balances": {user_id: {поле: (stored, expected)}},
+    "unposted": [id транзакций без записи в журнале],
+    "stale": [(id записи, id транзакции, статус)]}.
+    При fix=True дописывает в журнал недостающие транзакции (kind="import")
+    и перезаписывает user_balances суммами по журналу. Записи журнала
+    не меняются — stale только показываются.
+    """
+    unposted = unposted_transactions(db)
+    stale = stale_entries(db)
+
+    if fix and unposted:
+        insert_imports(db.connection(), unposted)
+
+    expected = ledger_totals(db)
+    stored = {
+        row[0]: dict(zip(BALANCE_FIELDS, row[1:]))
+        for row in db.execute(select(UserBalance.user_id, *[getattr(UserBalance, f) for f in BALANCE_FIELDS]))
+    }
+    zero = dict.fromkeys(BALANCE_FIELDS, 0)
+    balances = {}
+    for user_id in sorted(set(expected) | set(stored)):
+        want = expected.get(user_id, zero)
+        have = stored.get(user_id, zero)
+        diff = {field: (have[field], want[field]) for field in BALANCE_FIELDS if have[field] != want[field]}
+        if diff:
+            balances[user_id] = diff
+
+    if fix and (balances or unposted):
+        db.execute(delete(UserBalance).where(UserBalance.user_id.notin_(list(expected) or [0])))
+        write_balances(db.connection(), expected)
+    if fix:
+        db.commit()
+
+    return {
+        "balances": balances,
+        "unposted": [transaction.id for transaction in unposted],
+        "stale": [tuple(row) for row in stale],
+    }
+
+
+def ensure_initialized(db: Session):
+    """Первый запуск: перенести completed-транзакции в пустой журнал"""
+    if db.scalar(select(func.count()).select_from(LedgerEntry)) == 0:
+        result = reconcile(db, fix=True)
+        if result["unposted"]:
+            print(f"💰 Журнал баланса заполнен: {len(result['unposted'])} транзакций")
+
+
+def main(argv):
+    from app.database import SessionLocal
+
+    if not argv or argv[0] != "reconcile":
+        print("Использование: python -m app.ledger reconcile [--fix]")
+        return 2
+
+    fix = "--fix" in argv
+    db = SessionLocal()
+    try:
+        result = reconcile(db, fix=fix)
+    finally:
+        db.close()
+
+    if not any(result.values()):
+        print("✅ Балансы совпадают с журналом, журнал — с транзакциями")
+        return 0
+
+    if result["unposted"]:
+        print(f"⚠️ Транзакций без записи в журнале: {len(result['unposted'])}")
+        print(f"  {', '.join(str(i) for i in result['unposted'][:50])}")
+    if result["stale"]:
+        print(f"⚠️ Записей журнала по не completed транзакциям: {len(result['stale'])}")
+        for entry_id, transaction_id, status in result["stale"][:50]:
+            print(f"  запись {entry_id}: транзакция {transaction_id} ({status})")
+    if result["balances"]:
+        print(f"⚠️ Расхождений баланса: {len(result['balances'])}")
+        for user_id, diff in result["balances"].items():
+            details = ", ".join(f"{field}: {have} != {want}" for field, (have, want) in diff.items())
+            print(f"  пользователь {user_id}: {details}")
+    if fix:
+        print("✅ Журнал дописан, балансы пересчитаны")
+        return 1 if result["stale"] else 0
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
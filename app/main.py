@@ -4,9 +4,18 @@ from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse, RedirectResponse, FileResponse
 from jose import jwt
 from datetime import datetime, timedelta
-from app.database import get_db, create_tables, check_connection
+from app.database import get_db, create_tables, check_connection, SessionLocal
 from app.models import User
-from app.routers import auth, chat, projects, admin, services, stats, payments
+from app.dependencies import token_cache
+from app import counters, rollups, ledger, webhook_inbox, contracts_catalog, contract_search
+from app.payment_events import broker as payment_broker
+from app.payment_providers import close_provider
+from app.contract_files import contract_files
+from app.contract_formats import contract_formats
+from app.static_assets import AssetFiles, asset_url
+from app.page_cache import page_cache
+from app.health import health, liveness
+from app.routers import auth, chat, projects, admin, services, stats, payments, exports, contracts
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi import WebSocket, WebSocketDisconnect
 import os
@@ -20,6 +29,17 @@ logger = logging.getLogger(__name__)
 app = FastAPI(title="AI Developer Portal", version="1.0")
 
 # ========== ДИАГНОСТИКА ПРИ ЗАПУСКЕ ==========
+def run_startup_step(title: str, step, db=None) -> bool:
+    """Выполнить шаг запуска; при ошибке — записать в лог и откатить сессию"""
+    try:
+        step()
+        return True
+    except Exception as e:
+        logger.exception(f"❌ Ошибка при запуске ({title}): {e}")
+        if db is not None:
+            db.rollback()
+        return False
+
 @app.on_event("startup")
 async def startup_event():
     """Действия при запуске приложения"""
@@ -39,13 +59,45 @@ async def startup_event():
             logger.info("✅ Таблицы созданы/проверены")
         except Exception as e:
             logger.error(f"❌ Ошибка при создании таблиц: {e}")
+        
+        # Первый запуск: заполняем счётчики, дневные итоги, журнал баланса
+        # и каталог договоров; индекс файлов договоров — по каталогу.
+        # Шаги независимы: ошибка одного не отменяет остальные
+        db = SessionLocal()
+        try:
+            run_startup_step("счётчики", lambda: counters.ensure_initialized(db), db)
+            run_startup_step("дневные итоги", lambda: rollups.ensure_initialized(db), db)
+            run_startup_step("журнал баланса", lambda: ledger.ensure_initialized(db), db)
+            run_startup_step("каталог договоров", lambda: contracts_catalog.ensure_initialized(db), db)
+            run_startup_step("индекс файлов договоров",
+                             lambda: contract_files.build(contracts_catalog.all_contracts(db)), db)
+        finally:
+            db.close()
+        run_startup_step("поиск по договорам", contract_search.ensure_initialized)
     else:
         logger.error("❌ ПРОБЛЕМА С ПОДКЛЮЧЕНИЕМ К БАЗЕ ДАННЫХ")
     
+    # Обработчик входящих вебхуков платежей и рассылка смен статусов
+    payment_broker.bind()
+    webhook_inbox.start_worker()
+    logger.info("📨 Обработчик вебхуков запущен")
+    
+    # Фоновая проверка БД для /readyz
+    health.start()
+    
     logger.info("="*60)
     logger.info("✅ ПРИЛОЖЕНИЕ ГОТОВО К РАБОТЕ")
     logger.info("="*60)
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await webhook_inbox.stop_worker()
+    await health.stop()
+    await close_provider()
+    contract_formats.shutdown()
+    if contract_search.contract_search.dirty:
+        contract_search.contract_search.save()
+
 # ========== JWT НАСТРОЙКИ ==========
 SECRET_KEY = "your-super-secret-jwt-key-change-this-in-production"
 ALGORITHM = "HS256"
@@ -71,262 +123,77 @@ app.include_router(admin.router)      # /api/admin/*
 app.include_router(services.router)   # /api/services/*
 app.include_router(stats.router)      # /api/stats/*
 app.include_router(payments.router)   # /api/payments/*
+app.include_router(exports.router)    # /api/admin/export/*
+app.include_router(contracts.router)  # /api/contracts/*
 # ==========================================
 
+app.mount("/assets", AssetFiles(), name="assets")  # собранная статика: python -m app.static_assets build
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 templates = Jinja2Templates(directory="app/templates")
+templates.env.globals["asset_url"] = asset_url
 
-# ========== ЭНДПОЙНТЫ ДЛЯ РАБОТЫ С ФАЙЛАМИ ДОГОВОРОВ ==========
-
-# База данных договоров с информацией о доступных форматах
-CONTRACTS_DB = {
-    1: {
-        "id": 1,
-        "number": "ДОГ-2025-001",
-        "name": "Разработка веб-портала",
-        "client": "ООО \"ТехноПром\"",
-        "date": "2025-01-15",
-        "amount": 450000,
-        "original_file": "ДОГ-2025-001.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
-    },
-    2: {
-        "id": 2,
-        "number": "ДОГ-2025-042",
-        "name": "Мобильное приложение",
-        "client": "ИП Иванов А.А.",
-        "date": "2025-02-10",
-        "amount": 780000,
-        "original_file": "ДОГ-2025-042.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
-    },
-    3: {
-        "id": 3,
-        "number": "ДОГ-2024-128",
-        "name": "Автоматизация отчетности",
-        "client": "АО \"СтройИнвест\"",
-        "date": "2024-11-05",
-        "amount": 320000,
-        "original_file": "ДОГ-2024-128.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
-    },
-    4: {
-        "id": 4,
-        "number": "ДОГ-2025-089",
-        "name": "SEO-оптимизация",
-        "client": "ООО \"МедиаГрупп\"",
-        "date": "2025-03-01",
-        "amount": 180000,
-        "original_file": "ДОГ-2025-089.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
-    },
-    5: {
-        "id": 5,
-        "number": "ДОГ-2024-256",
-        "name": "Разработка LMS",
-        "client": "ЧУ ДПО \"Образование+\"",
-        "date": "2024-09-20",
-        "amount": 950000,
-        "original_file": "ДОГ-2024-256.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
+# Содержимое главной — константы: страница рендерится один раз и кэшируется (app/page_cache.py)
+HOME_SERVICES = [
+    {
+        "icon": "🤖",
+        "title": "AI-разработка",
+        "items": [
+            "Интеграция с языковыми моделями для чатов, ассистентов, ботов, игр",
+            "Создание умных агентов для веб-приложений",
+            "Взаимодействие с ChatGPT, Claude, Gemini, YandexGPT и др."
+        ]
     },
-    6: {
-        "id": 6,
-        "number": "ДОГ-2025-103",
-        "name": "Система управления складом",
-        "client": "ООО \"ЛогистикПро\"",
-        "date": "2025-03-15",
-        "amount": 1250000,
-        "original_file": "ДОГ-2025-103.txt",
-        "available_formats": ["txt", "docx", "pdf", "xlsx"]
-    }
-}
-
-@app.get("/api/contracts/list")
-async def get_contracts_list():
-    """Получить список всех договоров"""
-    return list(CONTRACTS_DB.values())
-
-@app.get("/api/contracts/info/{contract_id}")
-async def get_contract_info(contract_id: int):
-    """Получить информацию о конкретном договоре"""
-    if contract_id not in CONTRACTS_DB:
-        raise HTTPException(status_code=404, detail="Contract not found")
-    return CONTRACTS_DB[contract_id]
-
-@app.get("/api/contracts/file/{contract_id}")
-async def get_contract_file(contract_id: int, format: str = None):
-    """
-    Эндпоинт для получения файла договора
-    - contract_id: ID договора
-    - format: желаемый формат (txt, docx, pdf, xlsx) - если не указан, вернёт оригинал
-    Файлы открываются в РОДНОМ ФОРМАТЕ (Word, PDF, Excel)
-    """
-    print(f"=== ЗАПРОС ФАЙЛА: contract_id={contract_id}, format={format} ===")
-    
-    if contract_id not in CONTRACTS_DB:
-        print(f"❌ Договор {contract_id} не найден в БД")
-        raise HTTPException(status_code=404, detail="Contract not found")
-    
-    contract = CONTRACTS_DB[contract_id]
-    print(f"✅ Договор найден: {contract['number']}")
-    
-    # Определяем какой файл отдавать
-    if format and format in contract["available_formats"]:
-        # Формируем имя файла в запрошенном формате
-        base_name = contract["original_file"].replace('.txt', '')
-        filename = f"{base_name}.{format}"
-        print(f"🔍 Ищем файл в формате {format}: {filename}")
-        
-        possible_paths = [
-            os.path.join("app", "static", "contracts", filename),
-            os.path.join("static", "contracts", filename)
+    {
+        "icon": "💻",
+        "title": "Разработка веб-приложений",
+        "items": [
+            "Веб-приложения с ИИ-функциями",
+            "Полный цикл разработки: от идеи до внедрения",
+            "MVP ИИ-продуктов 'под ключ'"
         ]
-    else:
-        # Отдаём оригинальный файл
-        filename = contract["original_file"]
-        print(f"🔍 Ищем оригинальный файл: {filename}")
-        possible_paths = [
-            os.path.join("app", "static", "contracts", filename),
-            os.path.join("static", "contracts", filename)
+    },
+    {
+        "icon": "🏢",
+        "title": "Интеграция ИИ в бизнес",
+        "items": [
+            "Внедрение ИИ в CRM (AmoCRM), мессенджеры, соцсети",
+            "Автоматизация маркетинга, продаж и поддержки",
+            "Создание систем аналитики на основе ИИ"
         ]
-    
-    # Ищем файл
-    for file_path in possible_paths:
-        print(f"  Проверяем путь: {file_path}")
-        if os.path.exists(file_path):
-            print(f"✅ Файл НАЙДЕН: {file_path}")
-            print(f"  Размер файла: {os.path.getsize(file_path)} байт")
-            
-            # Определяем media type на основе расширения для родного формата
-            ext = os.path.splitext(file_path)[1].lower()
-            
-            # Правильные MIME-типы для каждого формата
-            media_types = {
-                '.txt': 'text/plain; charset=utf-8',
-                '.docx': 'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                '.pdf': 'application/pdf',
-                '.xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-            }
-            media_type = media_types.get(ext, 'application/octet-stream')
-            
-            # Для всех файлов используем inline (открытие в браузере/приложении)
-            disposition = 'inline'
-            
-            # Кодируем имя файла для корректной обработки русских символов
-            filename_display = os.path.basename(file_path)
-            filename_encoded = urllib.parse.quote(filename_display)
-            
-            print(f"📤 Отправляем файл: {filename_display}")
-            print(f"  Media type: {media_type} (родной формат)")
-            print(f"  Disposition: {disposition} (открытие в приложении)")
-            
-            # Возвращаем файл с правильными заголовками
-            return FileResponse(
-                path=file_path,
-                filename=filename_display,
-                media_type=media_type,
-                headers={
-                    "Content-Disposition": f"{disposition}; filename*=UTF-8''{filename_encoded}"
-                }
-            )
-    
-    # Если файл не найден
-    print(f"❌ Файл НЕ НАЙДЕН ни по одному пути")
-    raise HTTPException(status_code=404, detail=f"File not found for contract {contract_id} in format {format or 'original'}")
-
-@app.get("/api/contracts/formats/{contract_id}")
-async def get_available_formats(contract_id: int):
-    """Получить список доступных форматов для договора"""
-    if contract_id not in CONTRACTS_DB:
-        raise HTTPException(status_code=404, detail="Contract not found")
-    
-    # Проверяем, какие форматы реально существуют
-    contract = CONTRACTS_DB[contract_id]
-    available_formats = []
-    
-    for format in contract["available_formats"]:
-        base_name = contract["original_file"].replace('.txt', '')
-        filename = f"{base_name}.{format}"
-        
-        # Проверяем в разных папках
-        possible_paths = [
-            os.path.join("app", "static", "contracts", filename),
-            os.path.join("static", "contracts", filename)
+    },
+    {
+        "icon": "⚙️",
+        "title": "Автоматизация бизнес-процессов",
+        "items": [
+            "Аудит и поиск точек для автоматизации",
+            "Создание ИИ-инструментов для HR (прескрининг резюме)",
+            "Анализ звонков, генерация контента"
         ]
-        
-        for path in possible_paths:
-            if os.path.exists(path):
-                available_formats.append(format)
-                break
-    
-    return {
-        "contract_id": contract_id,
-        "contract_number": contract["number"],
-        "available_formats": available_formats
     }
+]
+HOME_PORTFOLIO = [
+    {
+        "title": "Illustraitor AI",
+        "description": "Chrome-расширение для генерации иллюстраций через DALL-E 3",
+        "metrics": "15+ тысяч пользователей, 99% uptime",
+        "link": "https://illustraitor-ai-v2.onrender.com"
+    },
+    {
+        "title": "SMM-эксперт с ИИ",
+        "description": "Автоматизация создания контента (тестирование)",
+        "metrics": "Ускорение работы в 4 раза: с 15 часов до 1 часа в день",
+        "link": "#"
+    }
+]
 
-# ============================================================
+def render_page(name: str, request: Request, **context) -> str:
+    return templates.get_template(name).render(request=request, **context)
 
 @app.get("/", response_class=HTMLResponse)
 async def read_root(request: Request):
-    services_list = [
-        {
-            "icon": "🤖",
-            "title": "AI-разработка",
-            "items": [
-                "Интеграция с языковыми моделями для чатов, ассистентов, ботов, игр",
-                "Создание умных агентов для веб-приложений",
-                "Взаимодействие с ChatGPT, Claude, Gemini, YandexGPT и др."
-            ]
-        },
-        {
-            "icon": "💻",
-            "title": "Разработка веб-приложений",
-            "items": [
-                "Веб-приложения с ИИ-функциями",
-                "Полный цикл разработки: от идеи до внедрения",
-                "MVP ИИ-продуктов 'под ключ'"
-            ]
-        },
-        {
-            "icon": "🏢",
-            "title": "Интеграция ИИ в бизнес",
-            "items": [
-                "Внедрение ИИ в CRM (AmoCRM), мессенджеры, соцсети",
-                "Автоматизация маркетинга, продаж и поддержки",
-                "Создание систем аналитики на основе ИИ"
-            ]
-        },
-        {
-            "icon": "⚙️",
-            "title": "Автоматизация бизнес-процессов",
-            "items": [
-                "Аудит и поиск точек для автоматизации",
-                "Создание ИИ-инструментов для HR (прескрининг резюме)",
-                "Анализ звонков, генерация контента"
-            ]
-        }
-    ]
-    portfolio = [
-        {
-            "title": "Illustraitor AI",
-            "description": "Chrome-расширение для генерации иллюстраций через DALL-E 3",
-            "metrics": "15+ тысяч пользователей, 99% uptime",
-            "link": "https://illustraitor-ai-v2.onrender.com"
-        },
-        {
-            "title": "SMM-эксперт с ИИ",
-            "description": "Автоматизация создания контента (тестирование)",
-            "metrics": "Ускорение работы в 4 раза: с 15 часов до 1 часа в день",
-            "link": "#"
-        }
-    ]
-    return templates.TemplateResponse("index.html", {
-        "request": request,
-        "services": services_list,
-        "portfolio": portfolio
-    })
+    return page_cache.response(request, lambda: render_page(
+        "index.html", request, services=HOME_SERVICES, portfolio=HOME_PORTFOLIO
+    ))
 
 @app.get("/register", response_class=HTMLResponse)
 async def register_page(request: Request):
@@ -353,7 +220,7 @@ async def dashboard(request: Request):
         
         # Декодируем токен вручную
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = token_cache.decode(token)
             user_id = payload.get("sub")
             
             if not user_id:
@@ -378,7 +245,7 @@ async def dashboard(request: Request):
                 }
             })
             
-        except jwt.InvalidTokenError:
+        except jwt.JWTError:
             return RedirectResponse(url="/login")
         except Exception as e:
             print(f"Ошибка в dashboard: {e}")
@@ -405,7 +272,7 @@ async def admin_page(request: Request):
         
         # Декодируем токен вручную
         try:
-            payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+            payload = token_cache.decode(token)
             user_id = payload.get("sub")
             
             if not user_id:
@@ -432,7 +299,7 @@ async def admin_page(request: Request):
                     "is_admin": user.is_admin
                 }
             })
-        except jwt.InvalidTokenError:
+        except jwt.JWTError:
             return RedirectResponse(url="/login")
         except Exception as e:
             print(f"Ошибка в admin_page: {e}")
@@ -442,6 +309,15 @@ async def admin_page(request: Request):
         print(f"Критическая ошибка в admin_page: {e}")
         return RedirectResponse(url="/login")
 
+# Пробы платформы: /healthz — без I/O, /readyz — снимок фоновой проверки БД (app/health.py)
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return liveness()
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    return health.readiness()
+
 @app.get("/test-api")
 async def test_api():
     return {"message": "API работает", "status": "ok"}
@@ -449,15 +325,15 @@ async def test_api():
 # Дополнительные страницы
 @app.get("/services", response_class=HTMLResponse)
 async def services_page(request: Request):
-    return templates.TemplateResponse("services.html", {"request": request})
+    return page_cache.response(request, lambda: render_page("services.html", request))
 
 @app.get("/pricing", response_class=HTMLResponse)
 async def pricing_page(request: Request):
-    return templates.TemplateResponse("pricing.html", {"request": request})
+    return page_cache.response(request, lambda: render_page("pricing.html", request))
 
 @app.get("/contacts", response_class=HTMLResponse)
 async def contacts_page(request: Request):
-    return templates.TemplateResponse("contacts.html", {"request": request})
+    return page_cache.response(request, lambda: render_page("contacts.html", request))
 
 # ========== WebSocket для тестирования ==========
 @app.websocket("/test-ws")
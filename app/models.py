@@ -1,4 +1,4 @@
-﻿from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, Boolean, JSON
+﻿from sqlalchemy import Column, Integer, BigInteger, String, Text, Date, DateTime, ForeignKey, Boolean, JSON, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -139,8 +139,128 @@ class Payment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now(), nullable=True)
     
+    __table_args__ = (
+        # Поиск зависших pending-платежей (app/payment_reconciliation.py)
+        Index("ix_payments_status_created_at", "status", "created_at"),
+    )
+    
     # Связи
     user = relationship("User", back_populates="payments")
     
     def __repr__(self):
-        return f"<Payment {self.id}: {self.amount} {self.currency} - {self.status}>"
\ No newline at end of file
+        return f"<Payment {self.id}: {self.amount} {self.currency} - {self.status}>"
+
+class Counter(Base):
+    """Счётчики для дашбордов (ведутся ORM-хуками, см. app/counters.py)"""
+    __tablename__ = "counters"
+    
+    name = Column(String(100), primary_key=True)
+    value = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<Counter {self.name}={self.value}>"
+
+class DailyRollup(Base):
+    """Итоги по дням для графиков (ведутся ORM-хуками, см. app/rollups.py)"""
+    __tablename__ = "daily_rollups"
+    
+    day = Column(Date, primary_key=True)
+    revenue = Column(BigInteger, nullable=False, default=0)  # сумма completed-транзакций
+    transactions_count = Column(Integer, nullable=False, default=0)
+    transactions_amount = Column(BigInteger, nullable=False, default=0)  # все транзакции
+    new_users = Column(Integer, nullable=False, default=0)
+    messages = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<DailyRollup {self.day}: revenue={self.revenue}>"
+
+class WebhookEvent(Base):
+    """Входящие вебхуки платёжной системы (inbox, см. app/webhook_inbox.py)"""
+    __tablename__ = "webhook_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_id = Column(String(255), unique=True, nullable=False)  # id события у провайдера
+    event_type = Column(String(100), nullable=True)  # payment.succeeded, payment.canceled, ...
+    payment_ref = Column(String, nullable=True)  # Payment.transaction_id
+    payload = Column(JSON, nullable=False)
+    status = Column(String(20), nullable=False, default="pending")  # pending, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(Text, nullable=True)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+    
+    __table_args__ = (
+        Index("ix_webhook_events_status_next_attempt", "status", "next_attempt_at"),
+    )
+    
+    def __repr__(self):
+        return f"<WebhookEvent {self.event_id}: {self.status}>"
+
+class LedgerEntry(Base):
+    """Движение по балансу пользователя: только добавляется (см. app/ledger.py)"""
+    __tablename__ = "ledger_entries"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    amount = Column(BigInteger, nullable=False)  # копейки: > 0 — зачисление, < 0 — списание
+    kind = Column(String(30), nullable=False)  # payment, import, adjustment
+    payment_id = Column(Integer, ForeignKey("payments.id"), nullable=True)
+    transaction_id = Column(Integer, ForeignKey("transactions.id"), nullable=True, index=True)
+    comment = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Один платёж зачисляется один раз
+        UniqueConstraint("payment_id", "kind", name="uq_ledger_entries_payment_kind"),
+        # Одна транзакция переносится в журнал один раз (kind="import", app/ledger.py);
+        # индекс, а не ограничение — create_tables добавит его и в существующую таблицу
+        Index("uq_ledger_entries_transaction_kind", "transaction_id", "kind", unique=True),
+    )
+    
+    def __repr__(self):
+        return f"<LedgerEntry {self.id}: user={self.user_id} {self.amount:+d} {self.kind}>"
+
+class UserBalance(Base):
+    """Текущий баланс пользователя (обновляется вместе с каждой записью ledger_entries)"""
+    __tablename__ = "user_balances"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    balance = Column(BigInteger, nullable=False, default=0)
+    total_credited = Column(BigInteger, nullable=False, default=0)
+    total_debited = Column(BigInteger, nullable=False, default=0)
+    entries_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<UserBalance user={self.user_id}: {self.balance}>"
+
+class Contract(Base):
+    """Договоры (каталог, см. app/routers/contracts.py)"""
+    __tablename__ = "contracts"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    number = Column(String(50), unique=True, nullable=False)  # ДОГ-2025-001
+    name = Column(String, nullable=False)
+    client = Column(String, nullable=False)  # название клиента в договоре
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    project_id = Column(Integer, ForeignKey("projects.id"), nullable=True, index=True)
+    date = Column(Date, nullable=False, index=True)
+    amount = Column(BigInteger, nullable=False, index=True)  # рубли
+    original_file = Column(String, nullable=False)
+    available_formats = Column(JSON, nullable=False, default=list)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_contracts_client_date", "client", "date"),
+    )
+    
+    # Связи
+    user = relationship("User")
+    project = relationship("Project")
+    
+    def __repr__(self):
+        return f"<Contract {self.number}: {self.client}>"
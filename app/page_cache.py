@@ -0,0 +1,125 @@
+"""Кэш отрендеренных публичных страниц (/, /services, /pricing, /contacts).
+
+Страница рендерится один раз; в памяти хранятся готовые байты и их
+gzip/brotli-варианты. Ответ выбирается по Accept-Encoding (q-значения
+учитываются, см. static_assets.select_encoding), ETag — sha256
+HTML (у сжатых вариантов — с суффиксом кодировки), If-None-Match -> 304.
+
+Ключ — путь страницы плюс значения заголовков из vary (если шаблон от них
+зависит; публичные страницы зависят только от request.url.path).
+
+Содержимое меняется только с деплоем (шаблоны, статика), поэтому TTL нет —
+сброс явный: page_cache.invalidate() / invalidate(path), в админке —
+POST /api/admin/cache/pages/invalidate. PAGE_CACHE_ENABLED=0 отключает кэш
+(удобно при правке шаблонов локально).
+
+Сравнение запросов в секунду на / с кэшем и без:
+
+    python -m benchmarks.page_cache --requests 2000
+"""
+import gzip
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import brotli
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+
+from app.static_assets import select_encoding
+
+PAGE_CACHE_ENABLED = os.getenv("PAGE_CACHE_ENABLED", "1") != "0"
+
+# Браузер перепроверяет страницу по ETag — после деплоя новая видна сразу
+CACHE_CONTROL = "public, max-age=0, must-revalidate"
+MEDIA_TYPE = "text/html; charset=utf-8"
+
+# Предпочтение кодировок: лучшая первая
+ENCODINGS = ("br", "gzip")
+
+
+@dataclass
+class CachedPage:
+    body: bytes
+    etag: str
+    variants: Dict[str, bytes] = field(default_factory=dict)  # кодировка -> сжатое тело
+
+    def select(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        encoding = select_encoding(accept_encoding, [encoding for encoding in ENCODINGS if encoding in self.variants])
+        if encoding:
+            return self.variants[encoding], encoding
+        return self.body, None
+
+
+def compress_page(html: str) -> CachedPage:
+    body = html.encode("utf-8")
+    variants = {
+        "gzip": gzip.compress(body, compresslevel=9, mtime=0),
+        "br": brotli.compress(body, quality=11, mode=brotli.MODE_TEXT),
+    }
+    return CachedPage(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        variants={encoding: data for encoding, data in variants.items() if len(data) < len(body)}
+    )
+
+
+class PageCache:
+    """Готовые ответы по ключу; рендер single-flight — одна страница собирается один раз"""
+
+    def __init__(self, enabled: bool = PAGE_CACHE_ENABLED):
+        self.enabled = enabled
+        self._pages: Dict[tuple, CachedPage] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(request: Request, vary: Iterable[str] = ()) -> tuple:
+        return (request.url.path,) + tuple(request.headers.get(name, "") for name in vary)
+
+    def get_or_render(self, key: tuple, render: Callable[[], str]) -> CachedPage:
+        page = self._pages.get(key)
+        if page is not None:
+            return page
+        with self._lock:
+            page = self._pages.get(key)
+            if page is None:
+                page = self._pages[key] = compress_page(render())
+            return page
+
+    def response(self, request: Request, render: Callable[[], str], vary: Iterable[str] = ()) -> Response:
+        """Ответ из кэша: сжатый вариант по Accept-Encoding, 304 по If-None-Match"""
+        if not self.enabled:
+            return HTMLResponse(render())
+        vary = tuple(vary)
+        page = self.get_or_render(self.key(request, vary), render)
+        body, encoding = page.select(request.headers.get("accept-encoding", ""))
+        etag = page.etag if encoding is None else f'{page.etag[:-1]}-{encoding}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": CACHE_CONTROL,
+            "Vary": ", ".join(("Accept-Encoding",) + vary),
+        }
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        return Response(content=body, media_type=MEDIA_TYPE, headers=headers)
+
+    def invalidate(self, path: str = None):
+        """Сбросить страницу path (все её варианты) или весь кэш"""
+        with self._lock:
+            if path is None:
+                self._pages.clear()
+            else:
+                for key in [key for key in self._pages if key[0] == path]:
+                    del self._pages[key]
+
+    def paths(self):
+        return sorted({key[0] for key in self._pages})
+
+
+page_cache = PageCache()
+
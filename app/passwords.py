@@ -0,0 +1,126 @@
+"""Хэширование паролей вне event loop.
+
+Новые пароли хэшируются bcrypt (passlib). Старые хэши — один раунд
+SHA-256 с солью — проверяются как раньше и после успешного входа
+перехэшируются в bcrypt (см. auth.login).
+
+Вся CPU-работа идёт в ограниченном пуле потоков: bcrypt отпускает GIL,
+поэтому event loop (чат, WebSocket) не блокируется на время входа.
+
+Задержка чата во время шторма входов (пул против bcrypt в event loop):
+
+    python -m benchmarks.login_storm --logins 40 --concurrency 8
+"""
+import asyncio
+import hashlib
+import hmac
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple, Dict, Any
+
+from passlib.context import CryptContext
+
+BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS
+)
+
+
+class PasswordHasherBusy(Exception):
+    """Очередь на хэширование переполнена"""
+    pass
+
+
+def _legacy_hash(password: str, salt: str) -> str:
+    """Старая схема: sha256(password + salt)"""
+    return hashlib.sha256(f"{password}{salt}".encode("utf-8")).hexdigest()
+
+
+def is_legacy_hash(hashed_password: Optional[str]) -> bool:
+    return not (hashed_password or "").startswith("$2")
+
+
+def _verify_sync(password: str, hashed_password: str, salt: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Проверить пароль; вторым элементом вернуть новый хэш, если нужен rehash"""
+    if not hashed_password:
+        return False, None
+
+    if is_legacy_hash(hashed_password):
+        ok = hmac.compare_digest(_legacy_hash(password, salt or ""), hashed_password)
+        return ok, (pwd_context.hash(password) if ok else None)
+
+    try:
+        ok, new_hash = pwd_context.verify_and_update(password, hashed_password)
+    except ValueError:
+        return False, None
+    return ok, new_hash
+
+
+class PasswordHasher:
+    """Пул потоков для bcrypt с лимитом параллелизма и метриками очереди"""
+
+    def __init__(self, workers: int = HASH_WORKERS, max_queue: int = HASH_MAX_QUEUE):
+        self.workers = workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="pwhash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_time_total = 0.0
+        self._queue_time_max = 0.0
+        self._run_time_total = 0.0
+
+    def _timed(self, submitted: float, fn, *args):
+        started = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                waited = started - submitted
+                self._pending -= 1
+                self._completed += 1
+                self._queue_time_total += waited
+                self._queue_time_max = max(self._queue_time_max, waited)
+                self._run_time_total += finished - started
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._pending >= self.max_queue:
+                self._rejected += 1
+                raise PasswordHasherBusy()
+            self._pending += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._timed, time.perf_counter(), fn, *args)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(pwd_context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str, salt: Optional[str] = None) -> Tuple[bool, Optional[str]]:
+        return await self._run(_verify_sync, password, hashed_password, salt)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._completed or 1
+            return {
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "pending": self._pending,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_time_avg_ms": round(self._queue_time_total / completed * 1000, 3),
+                "queue_time_max_ms": round(self._queue_time_max * 1000, 3),
+                "run_time_avg_ms": round(self._run_time_total / completed * 1000, 3),
+            }
+
+
+password_hasher = PasswordHasher()
+
@@ -0,0 +1,132 @@
+"""Уведомления о смене статуса платежа.
+
+Смена Payment.status запоминается ORM-хуком при flush и публикуется только
+после commit (при rollback — отбрасывается), каким бы путём ни прошёл
+платёж: вебхук (app/webhook_inbox.py), test/success, сверка.
+
+Получатели:
+- long-poll GET /api/payments/{id}?wait=N — ждёт первого события по платежу;
+- SSE GET /api/payments/events — поток событий пользователя;
+- чат-WebSocket пользователя, если он подключён (сообщение type="payment_status").
+
+Брокер живёт в процессе: при нескольких воркерах событие, применённое
+в соседнем процессе, long-poll увидит по таймауту, перечитав платёж из БД.
+"""
+import asyncio
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.models import Payment
+
+
+class PaymentStatusBroker:
+    """Раздача событий ожидающим запросам; publish можно звать из любого потока"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._waiters: Dict[int, Set[asyncio.Future]] = {}
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+
+    def bind(self, loop: asyncio.AbstractEventLoop = None):
+        self._loop = loop or asyncio.get_running_loop()
+
+    def publish(self, message: dict):
+        if self._loop is None or self._loop.is_closed():
+            return
+        self._loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _dispatch(self, message: dict):
+        for future in self._waiters.pop(message["payment_id"], ()):
+            if not future.done():
+                future.set_result(message)
+        for queue in self._subscribers.get(message["user_id"], ()):
+            queue.put_nowait(message)
+        asyncio.ensure_future(_send_to_chat(message))
+
+    # ---------- long-poll ----------
+
+    def waiter(self, payment_id: int) -> asyncio.Future:
+        """Будущее событие по платежу; зарегистрировать ДО чтения статуса из БД"""
+        self.bind()
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(payment_id, set()).add(future)
+        return future
+
+    def discard(self, payment_id: int, future: asyncio.Future):
+        waiters = self._waiters.get(payment_id)
+        if waiters:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[payment_id]
+
+    # ---------- SSE ----------
+
+    @contextmanager
+    def subscribe(self, user_id: int):
+        self.bind()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(user_id, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            subscribers = self._subscribers.get(user_id)
+            if subscribers:
+                subscribers.discard(queue)
+                if not subscribers:
+                    del self._subscribers[user_id]
+
+
+broker = PaymentStatusBroker()
+
+
+async def _send_to_chat(message: dict):
+    from app.routers.chat import manager
+
+    if message["user_id"] in manager.user_connections:
+        await manager.send_to_user(message["user_id"], dict(message, type="payment_status"))
+
+
+# ---------- ORM-хуки ----------
+
+def queue_event(session: Session, payment_id: int, user_id: int, status: str,
+                previous_status: Optional[str], amount: int, currency: str):
+    """Запомнить смену статуса; уйдёт получателям после commit сессии.
+    Для изменений в обход ORM (пакетный UPDATE) — вызывать вручную."""
+    session.info.setdefault("payment_events", []).append({
+        "payment_id": payment_id,
+        "user_id": user_id,
+        "status": status,
+        "previous_status": previous_status,
+        "amount": amount,
+        "currency": currency,
+        "changed_at": datetime.utcnow().isoformat(),
+    })
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_payment_events(session, flush_context, instances):
+    for obj in session.dirty:
+        if not isinstance(obj, Payment):
+            continue
+        history = sa_inspect(obj).attrs.status.history
+        if not history.has_changes() or not history.added:
+            continue
+        previous = history.deleted[0] if history.deleted else None
+        if previous == history.added[0]:
+            continue
+        queue_event(session, obj.id, obj.user_id, history.added[0], previous, obj.amount, obj.currency)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_payment_events(session):
+    for message in session.info.pop("payment_events", ()):
+        broker.publish(message)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_payment_events(session):
+    session.info.pop("payment_events", None)
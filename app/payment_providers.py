@@ -0,0 +1,226 @@
+"""Адаптеры платёжных провайдеров.
+
+PaymentProvider — общий интерфейс (создать платёж, узнать статус).
+Реализации:
+- TestModeProvider — без сети, как прежний тестовый режим;
+- YooKassaProvider — HTTP API ЮKassa (v3) на общем httpx.AsyncClient:
+  keep-alive пул соединений, таймауты, повторы с задержкой при сетевых
+  ошибках, 429 и 5xx. POST повторяется безопасно — с Idempotence-Key.
+
+Выбор — переменная PAYMENT_PROVIDER (test | yookassa), по умолчанию test.
+Живые платежи включаются только явно: PAYMENT_PROVIDER=yookassa плюс
+YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY; одних ключей недостаточно.
+YOOKASSA_API_URL позволяет направить клиент на локальный фейк
+(app/fake_provider.py):
+
+    uvicorn app.fake_provider:app --port 9000
+    PAYMENT_PROVIDER=yookassa YOOKASSA_API_URL=http://localhost:9000/v3 \\
+        YOOKASSA_SHOP_ID=test YOOKASSA_SECRET_KEY=test \\
+        python -m benchmarks.payment_provider --count 2000 --concurrency 50
+"""
+import asyncio
+import os
+import random
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Optional
+
+import httpx
+from dotenv import load_dotenv
+
+load_dotenv()
+
+PROVIDER_TIMEOUT = float(os.getenv("PAYMENT_PROVIDER_TIMEOUT", "10"))
+PROVIDER_CONNECT_TIMEOUT = float(os.getenv("PAYMENT_PROVIDER_CONNECT_TIMEOUT", "3"))
+PROVIDER_RETRIES = int(os.getenv("PAYMENT_PROVIDER_RETRIES", "3"))
+PROVIDER_RETRY_BASE = float(os.getenv("PAYMENT_PROVIDER_RETRY_BASE", "0.2"))  # секунды
+PROVIDER_MAX_CONNECTIONS = int(os.getenv("PAYMENT_PROVIDER_MAX_CONNECTIONS", "50"))
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ProviderError(Exception):
+    """Провайдер недоступен или отклонил запрос"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class ProviderPayment:
+    """Платёж на стороне провайдера"""
+    id: str
+    status: str  # pending, waiting_for_capture, succeeded, canceled
+    amount: int  # копейки
+    currency: str = "RUB"
+    confirmation_url: Optional[str] = None
+    raw: dict = field(default_factory=dict)
+
+
+def to_kopecks(value: str) -> int:
+    """'123.45' -> 12345"""
+    rubles, _, kopecks = str(value).partition(".")
+    return int(rubles) * 100 + int((kopecks + "00")[:2])
+
+
+def to_rubles(amount: int) -> str:
+    """12345 -> '123.45' (формат amount.value в API ЮKassa)"""
+    return f"{amount // 100}.{amount % 100:02d}"
+
+
+class PaymentProvider(ABC):
+    """Интерфейс провайдера; все методы асинхронные и не блокируют цикл событий"""
+
+    name = "base"
+    test_mode = False
+
+    @abstractmethod
+    async def create_payment(self, amount: int, currency: str, description: str,
+                             return_url: str, metadata: dict, idempotence_key: str) -> ProviderPayment:
+        """Создать платёж; повтор с тем же idempotence_key не создаёт второй"""
+
+    @abstractmethod
+    async def get_payment(self, provider_payment_id: str) -> ProviderPayment:
+        """Текущее состояние платежа у провайдера"""
+
+    async def close(self):
+        pass
+
+
+class TestModeProvider(PaymentProvider):
+    """Тестовый режим: платёж «создаётся» без сети и ждёт test/success или вебхука"""
+
+    name = "test"
+    test_mode = True
+
+    async def create_payment(self, amount, currency, description, return_url, metadata, idempotence_key):
+        return ProviderPayment(
+            id=f"test-{uuid.uuid4()}",
+            status="pending",
+            amount=amount,
+            currency=currency,
+            confirmation_url=f"{return_url}?payment_id={metadata.get('payment_id')}&test_mode=true"
+        )
+
+    async def get_payment(self, provider_payment_id):
+        # Статус в тестовом режиме меняют только вебхук и test/success
+        raise ProviderError("Тестовый режим: статус у провайдера не запрашивается")
+
+
+class YooKassaProvider(PaymentProvider):
+    """HTTP API ЮKassa на пуле keep-alive соединений"""
+
+    name = "yookassa"
+
+    def __init__(self, shop_id: str, secret_key: str, api_url: str = "https://api.yookassa.ru/v3",
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self._client = httpx.AsyncClient(
+            base_url=api_url.rstrip("/"),
+            auth=(shop_id, secret_key),
+            timeout=httpx.Timeout(PROVIDER_TIMEOUT, connect=PROVIDER_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=PROVIDER_MAX_CONNECTIONS,
+                max_keepalive_connections=PROVIDER_MAX_CONNECTIONS
+            ),
+            transport=transport
+        )
+
+    async def _request(self, method: str, url: str, **kwargs) -> dict:
+        last_error: Optional[ProviderError] = None
+        for attempt in range(PROVIDER_RETRIES + 1):
+            if attempt:
+                # Экспоненциальная задержка с разбросом
+                await asyncio.sleep(PROVIDER_RETRY_BASE * (2 ** (attempt - 1)) * (0.5 + random.random()))
+            try:
+                response = await self._client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                last_error = ProviderError(f"{type(e).__name__}: {e}")
+                continue
+            if response.status_code in RETRY_STATUSES:
+                last_error = ProviderError(f"HTTP {response.status_code}", response.status_code)
+                continue
+            if response.status_code >= 400:
+                raise ProviderError(f"HTTP {response.status_code}: {response.text[:500]}", response.status_code)
+            try:
+                return response.json()
+            except ValueError:
+                # HTML-страница ошибки прокси, пустое тело и т. п.
+                raise ProviderError(
+                    f"HTTP {response.status_code}: ответ не JSON: {response.text[:200]!r}",
+                    response.status_code
+                )
+        raise last_error
+
+    @staticmethod
+    def _parse(data: dict) -> ProviderPayment:
+        try:
+            amount = data.get("amount") or {}
+            return ProviderPayment(
+                id=data["id"],
+                status=data["status"],
+                amount=to_kopecks(amount.get("value", "0")),
+                currency=amount.get("currency", "RUB"),
+                confirmation_url=(data.get("confirmation") or {}).get("confirmation_url"),
+                raw=data
+            )
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise ProviderError(f"Неожиданный ответ провайдера: {type(e).__name__}: {e}")
+
+    async def create_payment(self, amount, currency, description, return_url, metadata, idempotence_key):
+        data = await self._request(
+            "POST", "/payments",
+            json={
+                "amount": {"value": to_rubles(amount), "currency": currency},
+                "capture": True,
+                "confirmation": {"type": "redirect", "return_url": return_url},
+                "description": description,
+                "metadata": metadata,
+            },
+            headers={"Idempotence-Key": idempotence_key}
+        )
+        return self._parse(data)
+
+    async def get_payment(self, provider_payment_id):
+        return self._parse(await self._request("GET", f"/payments/{provider_payment_id}"))
+
+    async def close(self):
+        await self._client.aclose()
+
+
+_provider: Optional[PaymentProvider] = None
+
+
+def create_provider() -> PaymentProvider:
+    shop_id = os.getenv("YOOKASSA_SHOP_ID")
+    secret_key = os.getenv("YOOKASSA_SECRET_KEY")
+    # Живые платежи — только по явному выбору, наличие ключей ничего не включает
+    name = (os.getenv("PAYMENT_PROVIDER") or "test").strip().lower()
+    if name == "test" and shop_id and secret_key:
+        print("⚠️ Ключи ЮKassa заданы, но PAYMENT_PROVIDER не yookassa — платежи в тестовом режиме")
+
+    if name == "yookassa":
+        if not shop_id or not secret_key:
+            raise RuntimeError("PAYMENT_PROVIDER=yookassa: нужны YOOKASSA_SHOP_ID и YOOKASSA_SECRET_KEY")
+        return YooKassaProvider(shop_id, secret_key, os.getenv("YOOKASSA_API_URL", "https://api.yookassa.ru/v3"))
+    if name == "test":
+        return TestModeProvider()
+    raise RuntimeError(f"Неизвестный PAYMENT_PROVIDER: {name}")
+
+
+def get_provider() -> PaymentProvider:
+    """Общий экземпляр провайдера (один пул соединений на процесс)"""
+    global _provider
+    if _provider is None:
+        _provider = create_provider()
+        print(f"💳 Платёжный провайдер: {_provider.name}")
+    return _provider
+
+
+async def close_provider():
+    global _provider
+    if _provider is not None:
+        await _provider.close()
+        _provider = None
+
@@ -0,0 +1,192 @@
+"""Сверка зависших pending-платежей с провайдером.
+
+Если вебхук так и не пришёл, платёж остаётся pending. Задача проходит по
+pending-платежам старше заданного возраста порциями (keyset по индексу
+payments(status, created_at)), спрашивает статус у провайдера с
+ограниченной параллельностью и применяет результаты пакетно
+(app/billing.py, *_bulk). Каждая порция — своя короткая транзакция; во
+время запросов к провайдеру транзакция не открыта.
+
+    python -m app.payment_reconciliation                     # старше 30 минут
+    python -m app.payment_reconciliation --older-than 60 --batch 1000 --concurrency 20
+    python -m app.payment_reconciliation --dry-run           # только отчёт
+
+Локально — против фейка (app/fake_provider.py):
+
+    PAYMENT_PROVIDER=yookassa YOOKASSA_API_URL=http://localhost:9000/v3 \\
+        YOOKASSA_SHOP_ID=test YOOKASSA_SECRET_KEY=test python -m app.payment_reconciliation
+"""
+import asyncio
+import os
+import sys
+import time
+from collections import Counter as Tally
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import and_, or_, select
+
+from app import billing
+from app.models import Payment
+from app.payment_providers import PaymentProvider, ProviderError, create_provider
+
+RECONCILE_OLDER_THAN = int(os.getenv("PAYMENT_RECONCILE_OLDER_THAN", "30"))  # минуты
+RECONCILE_BATCH_SIZE = int(os.getenv("PAYMENT_RECONCILE_BATCH_SIZE", "500"))
+RECONCILE_CONCURRENCY = int(os.getenv("PAYMENT_RECONCILE_CONCURRENCY", "10"))
+
+# Статус у провайдера -> что делаем с локальным pending-платежом
+FINAL_OUTCOMES = {"succeeded": "succeeded", "canceled": "canceled"}
+
+
+def fetch_batch(db, cutoff: datetime, after_id: Optional[int], size: int) -> List[tuple]:
+    """Следующая порция (id, transaction_id) по (created_at, id) после платежа after_id"""
+    query = (
+        select(Payment.id, Payment.transaction_id)
+        .where(
+            Payment.status == "pending",
+            Payment.created_at < cutoff,
+            Payment.transaction_id.isnot(None)
+        )
+        .order_by(Payment.created_at, Payment.id)
+        .limit(size)
+    )
+    if after_id is not None:
+        # created_at берём из самой строки, а не параметром: в SQLite
+        # server_default хранится без микросекунд и сравнение с datetime
+        # из Python пропустило бы платежи той же секунды
+        after_created = select(Payment.created_at).where(Payment.id == after_id).scalar_subquery()
+        query = query.where(or_(
+            Payment.created_at > after_created,
+            and_(Payment.created_at == after_created, Payment.id > after_id)
+        ))
+    return db.execute(query).all()
+
+
+async def query_statuses(provider: PaymentProvider, batch: List[tuple], concurrency: int) -> Dict[int, str]:
+    """{id платежа: статус у провайдера | not_found | error}"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(payment_id, provider_payment_id):
+        async with semaphore:
+            try:
+                return payment_id, (await provider.get_payment(provider_payment_id)).status
+            except ProviderError as e:
+                return payment_id, "not_found" if e.status_code == 404 else "error"
+
+    results = await asyncio.gather(*[one(row[0], row[1]) for row in batch])
+    return dict(results)
+
+
+async def reconcile_pending(older_than: int = RECONCILE_OLDER_THAN, batch_size: int = RECONCILE_BATCH_SIZE,
+                            concurrency: int = RECONCILE_CONCURRENCY, dry_run: bool = False,
+                            provider: Optional[PaymentProvider] = None, session_factory=None) -> dict:
+    """Сверить pending-платежи старше older_than минут; возвращает отчёт"""
+    if session_factory is None:
+        from app.database import SessionLocal as session_factory
+    own_provider = provider is None
+    if own_provider:
+        provider = create_provider()
+    if provider.test_mode:
+        raise ProviderError("Тестовый режим: сверять не с чем (нужен PAYMENT_PROVIDER=yookassa)")
+
+    started = time.perf_counter()
+    cutoff = datetime.utcnow() - timedelta(minutes=older_than)
+    report = {
+        "cutoff": cutoff.isoformat(),
+        "dry_run": dry_run,
+        "batches": 0,
+        "scanned": 0,
+        "provider_statuses": Tally(),
+        "succeeded": 0,
+        "canceled": 0,
+        "still_pending": 0,
+        "not_found": 0,
+        "errors": 0,
+    }
+
+    after_id = None
+    try:
+        while True:
+            db = session_factory()
+            try:
+                batch = fetch_batch(db, cutoff, after_id, batch_size)
+            finally:
+                db.close()
+            if not batch:
+                break
+            after_id = batch[-1][0]
+            report["batches"] += 1
+            report["scanned"] += len(batch)
+
+            statuses = await query_statuses(provider, batch, concurrency)
+            report["provider_statuses"].update(statuses.values())
+
+            outcomes: Dict[str, List[int]] = {"succeeded": [], "canceled": []}
+            for payment_id, status in statuses.items():
+                if status in FINAL_OUTCOMES:
+                    outcomes[FINAL_OUTCOMES[status]].append(payment_id)
+                elif status == "not_found":
+                    report["not_found"] += 1
+                elif status == "error":
+                    report["errors"] += 1
+                else:
+                    report["still_pending"] += 1
+
+            if dry_run:
+                report["succeeded"] += len(outcomes["succeeded"])
+                report["canceled"] += len(outcomes["canceled"])
+                continue
+
+            db = session_factory()
+            try:
+                succeeded = billing.mark_payments_succeeded_bulk(db, outcomes["succeeded"])
+                canceled = billing.mark_payments_canceled_bulk(db, outcomes["canceled"])
+                db.commit()
+            except Exception:
+                db.rollback()
+                raise
+            finally:
+                db.close()
+            report["succeeded"] += len(succeeded)
+            report["canceled"] += len(canceled)
+    finally:
+        if own_provider:
+            await provider.close()
+
+    report["provider_statuses"] = dict(report["provider_statuses"])
+    report["elapsed_seconds"] = round(time.perf_counter() - started, 2)
+    return report
+
+
+def print_report(report: dict):
+    mode = " (dry-run, без изменений)" if report["dry_run"] else ""
+    print(f"🧾 Сверка pending-платежей старше {report['cutoff']}{mode}")
+    print(f"   проверено: {report['scanned']} за {report['elapsed_seconds']} с, порций: {report['batches']}")
+    print(f"   → succeeded: {report['succeeded']}, → canceled: {report['canceled']}, "
+          f"ещё pending: {report['still_pending']}")
+    print(f"   не найдено у провайдера: {report['not_found']}, ошибок запроса: {report['errors']}")
+    if report["provider_statuses"]:
+        print(f"   статусы у провайдера: {report['provider_statuses']}")
+
+
+def main(argv):
+    def option(name, default):
+        return argv[argv.index(name) + 1] if name in argv else default
+
+    try:
+        report = asyncio.run(reconcile_pending(
+            older_than=int(option("--older-than", RECONCILE_OLDER_THAN)),
+            batch_size=int(option("--batch", RECONCILE_BATCH_SIZE)),
+            concurrency=int(option("--concurrency", RECONCILE_CONCURRENCY)),
+            dry_run="--dry-run" in argv
+        ))
+    except ProviderError as e:
+        print(f"❌ {e}")
+        return 2
+
+    print_report(report)
+    return 1 if report["errors"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,303 @@
+"""Встраиваемый TrueType-шрифт для самописного PDF (app/contract_formats.py).
+
+Стандартные шрифты PDF (Helvetica и др.) не встраиваются и кириллицы не
+содержат: просмотрщик подставляет свой шрифт, и буквы теряются. Поэтому
+в PDF кладётся подмножество TrueType-шрифта (по умолчанию DejaVu Sans из
+app/fonts, путь — CONTRACT_PDF_FONT) — только глифы, которые есть в
+документе. Шрифт оформлен как Type0/CIDFontType2 с кодировкой Identity-H:
+текст пишется номерами глифов, а ToUnicode возвращает из них символы для
+поиска и копирования.
+
+Подмножество сохраняет номера глифов: ненужные глифы становятся пустыми,
+таблицы loca/hmtx остаются полной длины и хорошо сжимаются. Только
+стандартная библиотека.
+"""
+import hashlib
+import os
+import struct
+import zlib
+from functools import lru_cache
+from typing import Dict, Iterable, List, Set
+
+CONTRACT_PDF_FONT = os.getenv(
+    "CONTRACT_PDF_FONT", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fonts", "DejaVuSans.ttf")
+)
+
+# Таблицы, которые PDF требует от встроенного TrueType (cmap не нужен: Identity-H)
+SUBSET_TABLES = (b"cvt ", b"fpgm", b"glyf", b"head", b"hhea", b"hmtx", b"loca", b"maxp", b"prep")
+
+# Флаги составного глифа (спецификация glyf)
+_ARG_WORDS, _HAS_SCALE, _MORE_COMPONENTS, _XY_SCALE, _TWO_BY_TWO = 0x0001, 0x0008, 0x0020, 0x0040, 0x0080
+
+
+class FontError(ValueError):
+    pass
+
+
+def _checksum(data: bytes) -> int:
+    data += b"\0" * (-len(data) % 4)
+    return sum(struct.unpack(f">{len(data) // 4}L", data)) & 0xFFFFFFFF
+
+
+class TrueTypeFont:
+    def __init__(self, data: bytes):
+        self.data = data
+        version, count = struct.unpack_from(">LH", data, 0)
+        if version not in (0x00010000, 0x74727565):  # 1.0 или 'true'
+            raise FontError("Нужен TrueType-шрифт с контурами glyf")
+        self.tables: Dict[bytes, bytes] = {}
+        for index in range(count):
+            tag, _, offset, length = struct.unpack_from(">4sLLL", data, 12 + 16 * index)
+            self.tables[tag] = data[offset:offset + length]
+        for tag in (b"head", b"hhea", b"maxp", b"hmtx", b"loca", b"glyf", b"cmap"):
+            if tag not in self.tables:
+                raise FontError(f"В шрифте нет таблицы {tag.decode()}")
+
+        head = self.tables[b"head"]
+        self.units_per_em = struct.unpack_from(">H", head, 18)[0]
+        self.bbox = struct.unpack_from(">hhhh", head, 36)
+        long_loca = struct.unpack_from(">h", head, 50)[0] == 1
+
+        hhea = self.tables[b"hhea"]
+        self.ascent, self.descent = struct.unpack_from(">hh", hhea, 4)
+        metrics_count = struct.unpack_from(">H", hhea, 34)[0]
+        self.glyph_count = struct.unpack_from(">H", self.tables[b"maxp"], 4)[0]
+
+        loca = self.tables[b"loca"]
+        if long_loca:
+            self.offsets = list(struct.unpack_from(f">{self.glyph_count + 1}L", loca))
+        else:
+            self.offsets = [offset * 2 for offset in struct.unpack_from(f">{self.glyph_count + 1}H", loca)]
+
+        hmtx = self.tables[b"hmtx"]
+        advances = [struct.unpack_from(">H", hmtx, 4 * index)[0] for index in range(metrics_count)]
+        self.advances = advances + [advances[-1]] * (self.glyph_count - metrics_count)
+
+        os2 = self.tables.get(b"OS/2")
+        self.cap_height = struct.unpack_from(">h", os2, 88)[0] if os2 and len(os2) >= 90 else self.ascent
+        self.name = self._postscript_name() or "Embedded"
+        self.cmap = self._read_cmap()
+        self._char_widths: Dict[str, int] = {}
+
+    def _postscript_name(self) -> str:
+        table = self.tables.get(b"name")
+        if not table:
+            return ""
+        count, strings = struct.unpack_from(">2xHH", table, 0)
+        for index in range(count):
+            platform, _, _, name_id, length, offset = struct.unpack_from(">6H", table, 6 + 12 * index)
+            if name_id == 6:
+                raw = table[strings + offset:strings + offset + length]
+                name = raw.decode("utf-16-be" if platform in (0, 3) else "latin-1", errors="ignore")
+                return "".join(char for char in name if char.isalnum() or char in "-_")
+        return ""
+
+    def _read_cmap(self) -> Dict[int, int]:
+        table = self.tables[b"cmap"]
+        subtables = {}
+        for index in range(struct.unpack_from(">H", table, 2)[0]):
+            platform, encoding, offset = struct.unpack_from(">HHL", table, 4 + 8 * index)
+            subtables[(platform, encoding)] = offset
+        for key in ((3, 10), (0, 4), (3, 1), (0, 3)):
+            if key not in subtables:
+                continue
+            offset = subtables[key]
+            format = struct.unpack_from(">H", table, offset)[0]
+            if format == 12:
+                return self._cmap_format12(table, offset)
+            if format == 4:
+                return self._cmap_format4(table, offset)
+        raise FontError("В шрифте нет Unicode-таблицы cmap (формат 4 или 12)")
+
+    @staticmethod
+    def _cmap_format4(table: bytes, offset: int) -> Dict[int, int]:
+        segments = struct.unpack_from(">H", table, offset + 6)[0] // 2
+        ends = struct.unpack_from(f">{segments}H", table, offset + 14)
+        starts_at = offset + 16 + 2 * segments
+        starts = struct.unpack_from(f">{segments}H", table, starts_at)
+        deltas = struct.unpack_from(f">{segments}h", table, starts_at + 2 * segments)
+        range_offsets_at = starts_at + 4 * segments
+        range_offsets = struct.unpack_from(f">{segments}H", table, range_offsets_at)
+        mapping = {}
+        for segment, (start, end, delta, range_offset) in enumerate(zip(starts, ends, deltas, range_offsets)):
+            for code in range(start, end + 1):
+                if code == 0xFFFF:
+                    continue
+                if range_offset == 0:
+                    glyph = (code + delta) & 0xFFFF
+                else:
+                    at = range_offsets_at + 2 * segment + range_offset + 2 * (code - start)
+                    glyph = struct.unpack_from(">H", table, at)[0]
+                    glyph = (glyph + delta) & 0xFFFF if glyph else 0
+                if glyph:
+                    mapping[code] = glyph
+        return mapping
+
+    @staticmethod
+    def _cmap_format12(table: bytes, offset: int) -> Dict[int, int]:
+        groups = struct.unpack_from(">L", table, offset + 12)[0]
+        mapping = {}
+        for index in range(groups):
+            start, end, glyph = struct.unpack_from(">LLL", table, offset + 16 + 12 * index)
+            for code in range(start, end + 1):
+                mapping[code] = glyph + code - start
+        return mapping
+
+    def glyph(self, char: str) -> int:
+        """Номер глифа символа; 0 (.notdef) — символа в шрифте нет"""
+        return self.cmap.get(ord(char), 0)
+
+    def width(self, glyph: int) -> int:
+        """Ширина глифа в тысячных долях кегля (единицы PDF)"""
+        return round(self.advances[glyph] * 1000 / self.units_per_em)
+
+    def text_width(self, text: str, size: float) -> float:
+        widths = self._char_widths
+        total = 0
+        for char in text:
+            width = widths.get(char)
+            if width is None:
+                width = widths[char] = self.width(self.glyph(char))
+            total += width
+        return total * size / 1000
+
+    def _glyph_data(self, glyph: int) -> bytes:
+        return self.tables[b"glyf"][self.offsets[glyph]:self.offsets[glyph + 1]]
+
+    def _components(self, glyph: int) -> List[int]:
+        data = self._glyph_data(glyph)
+        if len(data) < 10 or struct.unpack_from(">h", data, 0)[0] >= 0:
+            return []
+        components, position = [], 10
+        while True:
+            flags, component = struct.unpack_from(">HH", data, position)
+            components.append(component)
+            position += 4 + (4 if flags & _ARG_WORDS else 2)
+            if flags & _HAS_SCALE:
+                position += 2
+            elif flags & _XY_SCALE:
+                position += 4
+            elif flags & _TWO_BY_TWO:
+                position += 8
+            if not flags & _MORE_COMPONENTS:
+                return components
+
+    def closure(self, glyphs: Iterable[int]) -> Set[int]:
+        """Глифы вместе с частями составных глифов; .notdef — всегда"""
+        result, pending = set(), {0, *glyphs}
+        while pending:
+            glyph = pending.pop()
+            if glyph in result or glyph >= self.glyph_count:
+                continue
+            result.add(glyph)
+            pending.update(self._components(glyph))
+        return result
+
+    def subset(self, glyphs: Iterable[int]) -> bytes:
+        """Файл шрифта только с нужными глифами (номера глифов не меняются)"""
+        keep = self.closure(glyphs)
+        glyf, offsets = bytearray(), []
+        for glyph in range(self.glyph_count):
+            offsets.append(len(glyf))
+            if glyph in keep:
+                glyf += self._glyph_data(glyph)
+                glyf += b"\0" * (-len(glyf) % 4)
+        offsets.append(len(glyf))
+
+        head = bytearray(self.tables[b"head"])
+        struct.pack_into(">L", head, 8, 0)  # checkSumAdjustment — пересчитывается ниже
+        struct.pack_into(">h", head, 50, 1)  # loca в длинном формате
+        tables = {tag: self.tables[tag] for tag in SUBSET_TABLES if tag in self.tables}
+        tables.update({b"glyf": bytes(glyf), b"loca": struct.pack(f">{len(offsets)}L", *offsets), b"head": bytes(head)})
+
+        count = len(tables)
+        power = 1 << (count.bit_length() - 1)
+        directory = [struct.pack(">LHHHH", 0x00010000, count, power * 16, power.bit_length() - 1, (count - power) * 16)]
+        body, offset = [], 12 + 16 * count
+        for tag in sorted(tables):
+            data = tables[tag]
+            directory.append(struct.pack(">4sLLL", tag, _checksum(data), offset, len(data)))
+            padded = data + b"\0" * (-len(data) % 4)
+            body.append(padded)
+            offset += len(padded)
+
+        font = bytearray(b"".join(directory) + b"".join(body))
+        for index in range(count):
+            tag, _, table_offset, _ = struct.unpack_from(">4sLLL", font, 12 + 16 * index)
+            if tag == b"head":
+                struct.pack_into(">L", font, table_offset + 8, (0xB1B0AFBA - _checksum(bytes(font))) & 0xFFFFFFFF)
+        return bytes(font)
+
+
+@lru_cache(maxsize=4)
+def load_font(path: str = CONTRACT_PDF_FONT) -> TrueTypeFont:
+    """Шрифт читается один раз на процесс (пул генерации — по разу на воркер)"""
+    with open(path, "rb") as f:
+        return TrueTypeFont(f.read())
+
+
+def _to_unicode(used: Dict[int, str]) -> bytes:
+    lines = [
+        b"/CIDInit /ProcSet findresource begin 12 dict begin begincmap",
+        b"/CIDSystemInfo << /Registry (Adobe) /Ordering (UCS) /Supplement 0 >> def",
+        b"/CMapName /Adobe-Identity-UCS def /CMapType 2 def",
+        b"1 begincodespacerange <0000> <FFFF> endcodespacerange",
+    ]
+    items = sorted(used.items())
+    for start in range(0, len(items), 100):  # в блоке bfchar не больше 100 записей
+        chunk = items[start:start + 100]
+        lines.append(b"%d beginbfchar" % len(chunk))
+        lines.extend(b"<%04X> <%s>" % (glyph, char.encode("utf-16-be").hex().upper().encode("ascii"))
+                     for glyph, char in chunk)
+        lines.append(b"endbfchar")
+    lines.append(b"endcmap CMapName currentdict /CMap defineresource pop end end")
+    return b"\n".join(lines)
+
+
+class PdfFont:
+    """Шрифт одного документа: копит использованные глифы и отдаёт объекты PDF"""
+
+    def __init__(self, font: TrueTypeFont):
+        self.font = font
+        self.used: Dict[int, str] = {}
+
+    def encode(self, text: str) -> bytes:
+        """Строка PDF (шестнадцатеричная, по 2 байта на глиф) для оператора Tj/'"""
+        glyphs = []
+        for char in text:
+            glyph = self.font.glyph(char)
+            if glyph:
+                self.used.setdefault(glyph, char)
+            glyphs.append(glyph)
+        return b"<" + "".join(f"{glyph:04X}" for glyph in glyphs).encode("ascii") + b">"
+
+    def objects(self, add) -> bytes:
+        """Добавить подмножество шрифта и его описания через add(body) -> номер;
+        вернуть тело Type0-шрифта — на него ссылаются страницы"""
+        font = self.font
+        tag = "".join(chr(65 + byte % 26) for byte in hashlib.sha256(repr(sorted(self.used)).encode()).digest()[:6])
+        name = f"/{tag}+{font.name}".encode("ascii")
+
+        data = font.subset(self.used)
+        packed = zlib.compress(data)
+        file_id = add(b"<< /Length %d /Length1 %d /Filter /FlateDecode >>\nstream\n" % (len(packed), len(data))
+                      + packed + b"\nendstream")
+        scale = 1000 / font.units_per_em
+        bbox = " ".join(str(round(value * scale)) for value in font.bbox).encode("ascii")
+        descriptor = add(
+            b"<< /Type /FontDescriptor /FontName " + name + b" /Flags 32 /FontBBox [" + bbox + b"] /ItalicAngle 0 "
+            b"/Ascent %d /Descent %d /CapHeight %d /StemV 80 /FontFile2 %d 0 R >>"
+            % (round(font.ascent * scale), round(font.descent * scale), round(font.cap_height * scale), file_id)
+        )
+        widths = b" ".join(b"%d [%d]" % (glyph, font.width(glyph)) for glyph in sorted(self.used))
+        cid_font = add(
+            b"<< /Type /Font /Subtype /CIDFontType2 /BaseFont " + name +
+            b" /CIDSystemInfo << /Registry (Adobe) /Ordering (Identity) /Supplement 0 >> "
+            b"/FontDescriptor %d 0 R /DW %d /W [" % (descriptor, font.width(0)) + widths + b"] /CIDToGIDMap /Identity >>"
+        )
+        cmap = zlib.compress(_to_unicode(self.used))
+        to_unicode = add(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(cmap) + cmap + b"\nendstream")
+        return (
+            b"<< /Type /Font /Subtype /Type0 /BaseFont " + name + b" /Encoding /Identity-H "
+            b"/DescendantFonts [%d 0 R] /ToUnicode %d 0 R >>" % (cid_font, to_unicode)
+        )
@@ -0,0 +1,258 @@
+"""Ограничение частоты запросов для /api/auth/login и /api/auth/register.
+
+Скользящее окно (sliding log) по ключам «IP» и «email». Проверка идёт
+до любых обращений к БД и хэширования пароля.
+
+Вход: по IP считается каждая попытка, по email — только неудачные, и
+только с того же адреса (ключ «email + IP»): иначе любой, кто знает
+адрес почты, запирал бы владельца неверными паролями. Успешный вход
+сбрасывает счётчик неудач.
+
+Бэкенды:
+- InMemoryRateLimitBackend — шардированный, с ограничением по памяти
+  (по умолчанию, один процесс);
+- RedisRateLimitBackend — общий для нескольких воркеров, включается
+  переменной RATE_LIMIT_REDIS_URL (нужен пакет redis).
+
+Адрес клиента: по умолчанию — адрес TCP-соединения. За обратным прокси
+(Railway) нужно RATE_LIMIT_TRUST_PROXY=1: тогда берётся запись
+X-Forwarded-For, добавленная доверенным прокси, — RATE_LIMIT_TRUSTED_PROXIES-я
+справа (по умолчанию последняя). Левые записи присылает сам клиент, по
+ним лимит обходился бы подменой заголовка.
+
+В тестах бэкенд можно подменить: rate_limiter.backend = InMemoryRateLimitBackend()
+
+Накладные расходы на запрос: python -m benchmarks.rate_limit --requests 100000
+"""
+import os
+import time
+import threading
+import zlib
+from collections import OrderedDict, deque
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request
+
+try:
+    import redis.asyncio as aioredis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+
+def parse_rule(value: str) -> Tuple[int, float]:
+    """'20/60' -> (20 запросов, окно 60 секунд)"""
+    limit, window = value.split("/", 1)
+    return int(limit), float(window)
+
+
+class InMemoryRateLimitBackend:
+    """Шардированный sliding log в памяти процесса"""
+
+    def __init__(self, shards: int = 16, max_keys_per_shard: int = 10000):
+        self.max_keys_per_shard = max_keys_per_shard
+        self._shards = [(threading.Lock(), OrderedDict()) for _ in range(shards)]
+
+    def _shard(self, key: str):
+        return self._shards[zlib.crc32(key.encode("utf-8")) % len(self._shards)]
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        """Учесть запрос; вернуть (разрешён, через сколько секунд повторить)"""
+        now = time.monotonic()
+        lock, entries = self._shard(key)
+        with lock:
+            hits = entries.get(key)
+            if hits is None:
+                hits = deque()
+                entries[key] = hits
+                # Вытесняем самые давно использованные ключи
+                while len(entries) > self.max_keys_per_shard:
+                    entries.popitem(last=False)
+            else:
+                entries.move_to_end(key)
+
+            border = now - window
+            while hits and hits[0] <= border:
+                hits.popleft()
+
+            if len(hits) >= limit:
+                return False, hits[0] + window - now
+
+            # Отклонённые запросы не храним — в deque не больше limit отметок
+            hits.append(now)
+            return True, 0.0
+
+    async def peek(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        """Как hit, но запрос не учитывается"""
+        now = time.monotonic()
+        lock, entries = self._shard(key)
+        with lock:
+            hits = entries.get(key)
+            if not hits:
+                return True, 0.0
+            border = now - window
+            while hits and hits[0] <= border:
+                hits.popleft()
+            if len(hits) >= limit:
+                return False, hits[0] + window - now
+            return True, 0.0
+
+    async def reset(self, key: str):
+        lock, entries = self._shard(key)
+        with lock:
+            entries.pop(key, None)
+
+    def size(self) -> int:
+        return sum(len(entries) for _, entries in self._shards)
+
+
+class RedisRateLimitBackend:
+    """Sliding log в Redis (sorted set на ключ), общий для всех воркеров"""
+
+    SCRIPT = """
+    local key = KEYS[1]
+    local now = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local limit = tonumber(ARGV[3])
+    redis.call('ZREMRANGEBYSCORE', key, '-inf', now - window)
+    if redis.call('ZCARD', key) >= limit then
+        local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+        return {0, tostring(tonumber(oldest[2]) + window - now)}
+    end
+    if ARGV[4] == '' then
+        return {1, '0'}
+    end
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, math.ceil(window * 1000))
+    return {1, '0'}
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        self.prefix = prefix
+        self._client = aioredis.from_url(url)
+        self._script = self._client.register_script(self.SCRIPT)
+        self._seq = 0
+
+    async def _run(self, key: str, limit: int, window: float, member: str) -> Tuple[bool, float]:
+        allowed, retry_after = await self._script(
+            keys=[self.prefix + key],
+            args=[time.time(), window, limit, member]
+        )
+        return bool(int(allowed)), float(retry_after)
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        self._seq += 1
+        return await self._run(key, limit, window, f"{time.time()}:{os.getpid()}:{self._seq}")
+
+    async def peek(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        # Пустой member — скрипт только проверяет окно, не добавляя отметку
+        return await self._run(key, limit, window, "")
+
+    async def reset(self, key: str):
+        await self._client.delete(self.prefix + key)
+
+
+class RateLimiter:
+    """Набор правил (scope -> лимиты по IP и email) поверх бэкенда"""
+
+    def __init__(self, backend, rules: Dict[str, Dict[str, Tuple[int, float]]],
+                 enabled: bool = True, trust_proxy: bool = False, trusted_proxies: int = 1):
+        self.backend = backend
+        self.rules = rules
+        self.enabled = enabled
+        self.trust_proxy = trust_proxy
+        self.trusted_proxies = max(1, trusted_proxies)
+
+    def client_ip(self, request: Request) -> str:
+        if self.trust_proxy:
+            # Каждый прокси дописывает адрес справа; доверять можно только
+            # записям, добавленным нашими прокси
+            forwarded = [
+                part.strip()
+                for header in request.headers.getlist("x-forwarded-for")
+                for part in header.split(",")
+                if part.strip()
+            ]
+            if len(forwarded) >= self.trusted_proxies:
+                return forwarded[-self.trusted_proxies]
+        return request.client.host if request.client else "unknown"
+
+    @staticmethod
+    def _too_many(retry_after: float) -> HTTPException:
+        return HTTPException(
+            status_code=429,
+            detail="Слишком много попыток, попробуйте позже",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
+
+    async def check(self, scope: str, request: Request, email: Optional[str] = None):
+        """Бросает HTTPException(429), если превышен любой из лимитов scope"""
+        if not self.enabled:
+            return
+
+        keys = [("ip", self.client_ip(request))]
+        if email:
+            keys.append(("email", email.strip().lower()))
+
+        for kind, value in keys:
+            rule = self.rules.get(scope, {}).get(kind)
+            if rule is None:
+                continue
+            limit, window = rule
+            allowed, retry_after = await self.backend.hit(f"{scope}:{kind}:{value}", limit, window)
+            if not allowed:
+                raise self._too_many(retry_after)
+
+    def _failures_key(self, scope: str, request: Request, email: str) -> str:
+        return f"{scope}:failures:{email.strip().lower()}:{self.client_ip(request)}"
+
+    async def check_failures(self, scope: str, request: Request, email: str):
+        """429, если неудачные попытки для email с этого адреса исчерпаны;
+        сама проверка попыткой не считается"""
+        rule = self.rules.get(scope, {}).get("failures")
+        if not self.enabled or rule is None:
+            return
+        allowed, retry_after = await self.backend.peek(self._failures_key(scope, request, email), *rule)
+        if not allowed:
+            raise self._too_many(retry_after)
+
+    async def record_failure(self, scope: str, request: Request, email: str):
+        rule = self.rules.get(scope, {}).get("failures")
+        if self.enabled and rule is not None:
+            await self.backend.hit(self._failures_key(scope, request, email), *rule)
+
+    async def reset_failures(self, scope: str, request: Request, email: str):
+        if self.enabled and "failures" in self.rules.get(scope, {}):
+            await self.backend.reset(self._failures_key(scope, request, email))
+
+
+def _create_backend():
+    redis_url = os.getenv("RATE_LIMIT_REDIS_URL")
+    if redis_url:
+        if REDIS_AVAILABLE:
+            return RedisRateLimitBackend(redis_url)
+        print("⚠️ RATE_LIMIT_REDIS_URL задан, но пакет redis не установлен. Используем память процесса.")
+    return InMemoryRateLimitBackend(
+        shards=int(os.getenv("RATE_LIMIT_SHARDS", "16")),
+        max_keys_per_shard=int(os.getenv("RATE_LIMIT_MAX_KEYS_PER_SHARD", "10000"))
+    )
+
+
+rate_limiter = RateLimiter(
+    _create_backend(),
+    rules={
+        "login": {
+            "ip": parse_rule(os.getenv("LOGIN_RATE_LIMIT_IP", "20/60")),
+            # Неудачные попытки на пару «email + IP»
+            "failures": parse_rule(os.getenv("LOGIN_RATE_LIMIT_EMAIL", "5/60")),
+        },
+        "register": {
+            "ip": parse_rule(os.getenv("REGISTER_RATE_LIMIT_IP", "5/600")),
+            "email": parse_rule(os.getenv("REGISTER_RATE_LIMIT_EMAIL", "3/600")),
+        },
+    },
+    enabled=os.getenv("RATE_LIMIT_ENABLED", "1") == "1",
+    trust_proxy=os.getenv("RATE_LIMIT_TRUST_PROXY", "0") == "1",
+    trusted_proxies=int(os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "1"))
+)
+
@@ -0,0 +1,319 @@
+"""Дневные итоги в таблице daily_rollups.
+
+Строка на день: выручка (completed-транзакции), число и сумма транзакций,
+новые пользователи, сообщения. Значения ведутся теми же ORM-хуками, что и
+counters (app/counters.py), в той же транзакции, что и изменения данных:
+успешный платёж создаёт completed-транзакцию — и выручка дня растёт сразу.
+
+Графики читают диапазон дней по первичному ключу, без сканирования
+исходных таблиц.
+
+День строки — дата created_at в UTC в обоих путях: хуки проставляют
+created_at новым строкам сами (в UTC, до flush — вместо server_default,
+так что записанное значение и есть то, по которому посчитан день), а
+пересчёт берёт UTC-дату из БД (timezone('UTC', ...) в PostgreSQL). Иначе
+около полуночи хуки и пересчёт разложили бы строки по разным дням.
+
+Пересчёт из исходных таблиц (первый запуск, ручные правки, импорт):
+
+    python -m app.rollups backfill                               # всё
+    python -m app.rollups backfill --from 2026-01-01 --to 2026-01-31
+"""
+import sys
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, select, delete, inspect as sa_inspect
+from sqlalchemy.orm import Session
+
+from app.counters import attribute_values, add_contribution, track_old_values
+from app.models import User, Message, Transaction, DailyRollup
+
+METRICS = ["revenue", "transactions_count", "transactions_amount", "new_users", "messages"]
+
+# Статус транзакции, который считается выручкой
+REVENUE_STATUS = "completed"
+
+
+def _day(value: Optional[datetime]) -> date:
+    """UTC-дата; naive-значения уже в UTC"""
+    if value is None:
+        value = datetime.now(timezone.utc)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def _utc_now_for(column) -> datetime:
+    return datetime.now(timezone.utc) if column.type.timezone else datetime.utcnow()
+
+
+def stamp_created_at(session: Session):
+    """Проставить created_at новым строкам до flush и привести его к UTC:
+    день в итогах и сохранённое значение берутся из одного источника"""
+    for obj in session.new:
+        if type(obj) not in TRACKED:
+            continue
+        value = obj.created_at
+        if value is None:
+            obj.created_at = _utc_now_for(obj.__table__.c.created_at)
+        elif value.tzinfo is not None and value.utcoffset():
+            obj.created_at = value.astimezone(timezone.utc)
+
+
+# ---------- вклад одной строки ----------
+
+def _user_rollup(values: dict) -> Dict[tuple, int]:
+    return {(_day(values["created_at"]), "new_users"): 1}
+
+
+def _message_rollup(values: dict) -> Dict[tuple, int]:
+    return {(_day(values["created_at"]), "messages"): 1}
+
+
+def _transaction_rollup(values: dict) -> Dict[tuple, int]:
+    day = _day(values["created_at"])
+    amount = values["amount"] or 0
+    result = {
+        (day, "transactions_count"): 1,
+        (day, "transactions_amount"): amount,
+    }
+    if values["status"] == REVENUE_STATUS:
+        result[(day, "revenue")] = amount
+    return result
+
+
+TRACKED = {
+    User: (_user_rollup, ("created_at",)),
+    Message: (_message_rollup, ("created_at",)),
+    Transaction: (_transaction_rollup, ("status", "amount", "created_at")),
+}
+
+for _model, (_, _attrs) in TRACKED.items():
+    track_old_values(_model, _attrs)
+
+
+def collect_deltas(session: Session) -> Dict[tuple, int]:
+    """{(день, метрика): изменение} для объектов, ожидающих flush"""
+    deltas: Dict[tuple, int] = defaultdict(int)
+
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            rollup, attrs = tracked
+            add_contribution(deltas, rollup(attribute_values(obj, attrs, old=False)), +1)
+
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            rollup, attrs = tracked
+            add_contribution(deltas, rollup(attribute_values(obj, attrs, old=True)), -1)
+
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if not tracked:
+            continue
+        rollup, attrs = tracked
+        state = sa_inspect(obj)
+        if not any(state.attrs[attr].history.has_changes() for attr in attrs):
+            continue
+        add_contribution(deltas, rollup(attribute_values(obj, attrs, old=True)), -1)
+        add_contribution(deltas, rollup(attribute_values(obj, attrs, old=False)), +1)
+
+    return {key: delta for key, delta in deltas.items() if delta}
+
+
+def increment(connection, deltas: Dict[tuple, int]):
+    """Атомарно прибавить deltas к строкам daily_rollups (UPSERT по дню)"""
+    if not deltas:
+        return
+    now = datetime.utcnow()
+    table = DailyRollup.__table__
+
+    rows: Dict[date, dict] = {}
+    for (day, metric), delta in deltas.items():
+        row = rows.setdefault(day, dict({m: 0 for m in METRICS}, day=day, updated_at=now))
+        row[metric] += delta
+
+    dialect = connection.dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        stmt = insert(table)
+        set_ = {metric: table.c[metric] + stmt.excluded[metric] for metric in METRICS}
+        set_["updated_at"] = now
+        stmt = stmt.on_conflict_do_update(index_elements=[table.c.day], set_=set_)
+        connection.execute(stmt, [rows[day] for day in sorted(rows)])
+        return
+
+    # Прочие СУБД: UPDATE, а если строки нет — INSERT
+    for day in sorted(rows):
+        row = rows[day]
+        result = connection.execute(
+            table.update().where(table.c.day == day).values(
+                updated_at=now, **{metric: table.c[metric] + row[metric] for metric in METRICS}
+            )
+        )
+        if result.rowcount == 0:
+            connection.execute(table.insert().values(**row))
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_rollup_deltas(session, flush_context, instances):
+    stamp_created_at(session)
+    deltas = collect_deltas(session)
+    if deltas:
+        pending = session.info.setdefault("rollup_deltas", defaultdict(int))
+        for key, delta in deltas.items():
+            pending[key] += delta
+
+
+@event.listens_for(Session, "after_flush")
+def _apply_rollup_deltas(session, flush_context):
+    deltas = session.info.pop("rollup_deltas", None)
+    if deltas:
+        increment(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_rollup_deltas(session):
+    session.info.pop("rollup_deltas", None)
+
+
+# ---------- чтение ----------
+
+def read_range(db: Session, start: date, end: date) -> Dict[date, dict]:
+    """Строки daily_rollups за [start, end] одним запросом по ключу"""
+    rows = db.scalars(
+        select(DailyRollup).where(DailyRollup.day.between(start, end))
+    ).all()
+    return {row.day: {metric: getattr(row, metric) for metric in METRICS} for row in rows}
+
+
+def time_series(db: Session, start: date, end: date, metrics: List[str]) -> List[dict]:
+    """Ряд по дням с нулями для дней без данных"""
+    stored = read_range(db, start, end)
+    zero = dict.fromkeys(METRICS, 0)
+    series = []
+    day = start
+    while day <= end:
+        values = stored.get(day, zero)
+        series.append(dict({"date": day.isoformat()}, **{metric: values[metric] for metric in metrics}))
+        day += timedelta(days=1)
+    return series
+
+
+# ---------- пересчёт ----------
+
+def _as_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(str(value)[:10])
+
+
+def utc_date(db: Session, column):
+    """SQL-выражение: UTC-дата метки времени (как _day в хуках)"""
+    if db.get_bind().dialect.name == "postgresql" and column.type.timezone:
+        return func.date(func.timezone("UTC", column))
+    # SQLite хранит UTC без смещения (CURRENT_TIMESTAMP и stamp_created_at)
+    return func.date(column)
+
+
+def compute_from_sources(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Dict[date, dict]:
+    """Посчитать дневные итоги из исходных таблиц"""
+    result: Dict[date, dict] = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+
+    def in_range(column):
+        conditions = []
+        if start:
+            conditions.append(utc_date(db, column) >= start.isoformat())
+        if end:
+            conditions.append(utc_date(db, column) <= end.isoformat())
+        return conditions
+
+    user_day = utc_date(db, User.created_at)
+    for day, count in db.execute(
+        select(user_day, func.count(User.id)).where(*in_range(User.created_at)).group_by(user_day)
+    ):
+        if day is not None:
+            result[_as_date(day)]["new_users"] += count
+
+    message_day = utc_date(db, Message.created_at)
+    for day, count in db.execute(
+        select(message_day, func.count(Message.id)).where(*in_range(Message.created_at)).group_by(message_day)
+    ):
+        if day is not None:
+            result[_as_date(day)]["messages"] += count
+
+    tx_day = utc_date(db, Transaction.created_at)
+    for day, status, count, amount in db.execute(
+        select(tx_day, Transaction.status, func.count(Transaction.id), func.coalesce(func.sum(Transaction.amount), 0))
+        .where(*in_range(Transaction.created_at))
+        .group_by(tx_day, Transaction.status)
+    ):
+        if day is None:
+            continue
+        row = result[_as_date(day)]
+        row["transactions_count"] += count
+        row["transactions_amount"] += amount
+        if status == REVENUE_STATUS:
+            row["revenue"] += amount
+
+    return dict(result)
+
+
+def backfill(db: Session, start: Optional[date] = None, end: Optional[date] = None) -> Tuple[int, int]:
+    """Перезаписать daily_rollups за период значениями из исходных таблиц.
+
+    Возвращает (записано дней, удалено пустых дней).
+    """
+    computed = compute_from_sources(db, start, end)
+
+    conditions = []
+    if start:
+        conditions.append(DailyRollup.day >= start)
+    if end:
+        conditions.append(DailyRollup.day <= end)
+    removed = db.execute(delete(DailyRollup).where(*conditions)).rowcount
+
+    now = datetime.utcnow()
+    for day in sorted(computed):
+        db.add(DailyRollup(day=day, updated_at=now, **computed[day]))
+    db.commit()
+
+    return len(computed), max(0, removed - len(computed))
+
+
+def ensure_initialized(db: Session):
+    """Заполнить пустую таблицу daily_rollups (первый запуск)"""
+    if db.scalar(select(func.count()).select_from(DailyRollup)) == 0:
+        written, _ = backfill(db)
+        print(f"📈 Дневные итоги заполнены: {written} дней")
+
+
+def main(argv):
+    from app.database import SessionLocal
+
+    if not argv or argv[0] != "backfill":
+        print("Использование: python -m app.rollups backfill [--from YYYY-MM-DD] [--to YYYY-MM-DD]")
+        return 2
+
+    start = end = None
+    if "--from" in argv:
+        start = date.fromisoformat(argv[argv.index("--from") + 1])
+    if "--to" in argv:
+        end = date.fromisoformat(argv[argv.index("--to") + 1])
+
+    db = SessionLocal()
+    try:
+        written, removed = backfill(db, start, end)
+    finally:
+        db.close()
+
+    print(f"✅ Пересчитано дней: {written}, удалено пустых: {removed}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
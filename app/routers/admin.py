@@ -1,12 +1,19 @@
-﻿from fastapi import APIRouter, Depends, HTTPException, status
+﻿from fastapi import APIRouter, Depends, HTTPException, Query, status
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 from typing import List, Optional
 import app.database as database
 import app.models as models
 import app.schemas as schemas
 from app.dependencies import get_current_user
-from sqlalchemy import func, inspect
+from app.stats_service import get_dashboard_stats, get_dashboard_stats_async, stats_cache
+from app.page_cache import page_cache
+from app import rollups, counters, ledger
+from sqlalchemy import func, inspect, select, union, update, insert
+from collections import defaultdict
+import asyncio
+import time
 
 router = APIRouter(
     prefix="/api/admin",
@@ -25,6 +32,97 @@ def check_admin(user: models.User):
         raise HTTPException(status_code=403, detail="Требуются права администратора")
     return user
 
+def bulk_result(results: List[schemas.BulkItemResult], all_or_nothing: bool):
+    """Проверка пакета до применения: при all_or_nothing любая ошибка отменяет всё"""
+    errors = [r for r in results if r.status == "error"]
+    if errors and all_or_nothing:
+        raise HTTPException(status_code=400, detail={
+            "message": f"Пакет отклонён: ошибок {len(errors)}",
+            "results": [r.model_dump() for r in results]
+        })
+
+def bulk_summary(results: List[schemas.BulkItemResult]) -> dict:
+    summary = defaultdict(int)
+    for r in results:
+        summary[r.status] += 1
+    return {
+        "status": "success",
+        "summary": dict(summary),
+        "results": results
+    }
+
+# ================ BOOTSTRAP ================
+def bootstrap_users(db: Session) -> list:
+    rows = db.execute(
+        select(models.User.id, models.User.email, models.User.name, models.User.is_admin, models.User.created_at)
+        .order_by(models.User.id)
+    ).mappings().all()
+    return [dict(row) for row in rows]
+
+def bootstrap_projects(db: Session) -> list:
+    rows = db.execute(
+        select(models.Project.id, models.Project.title, models.Project.status,
+               models.Project.user_id, models.Project.service_id, models.Project.created_at)
+        .order_by(models.Project.id)
+    ).mappings().all()
+    return [dict(row) for row in rows]
+
+def bootstrap_stats(db: Session) -> dict:
+    stats = get_dashboard_stats(db)
+    return {
+        "total_users": stats["total_users"],
+        "total_projects": stats["total_projects"],
+        "total_messages": stats["total_messages"],
+        "total_services": stats["total_services"],
+        "active_users": stats["active_users"],
+    }
+
+# секция -> функция чтения (каждая выполняется в своём потоке со своей сессией)
+BOOTSTRAP_SECTIONS = {
+    "users": bootstrap_users,
+    "projects": bootstrap_projects,
+    "stats": bootstrap_stats,
+}
+
+def run_section(loader):
+    db = database.SessionLocal()
+    try:
+        return loader(db)
+    finally:
+        db.close()
+
+@router.get("/bootstrap")
+async def get_admin_bootstrap(
+    sections: str = Query("me,users,projects,stats", description="Секции через запятую: me, users, projects, stats"),
+    current_user: models.User = Depends(get_current_user)
+):
+    """Все данные для первой отрисовки админ-панели одним запросом.
+    Авторизация проверяется один раз, секции читаются параллельно.
+    """
+    check_admin(current_user)
+
+    requested = [s.strip() for s in sections.split(",") if s.strip()]
+    unknown = [s for s in requested if s != "me" and s not in BOOTSTRAP_SECTIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные секции: {', '.join(unknown)}")
+
+    started = time.perf_counter()
+    result = {"status": "success"}
+    if "me" in requested:
+        result["me"] = {
+            "id": current_user.id,
+            "email": current_user.email,
+            "name": current_user.name,
+            "is_admin": current_user.is_admin,
+        }
+
+    names = [s for s in dict.fromkeys(requested) if s in BOOTSTRAP_SECTIONS]
+    values = await asyncio.gather(*[run_in_threadpool(run_section, BOOTSTRAP_SECTIONS[name]) for name in names])
+    result.update(zip(names, values))
+
+    result["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return result
+
 # ================ ПОЛЬЗОВАТЕЛИ ================
 @router.get("/users")
 async def get_all_users(
@@ -57,6 +155,100 @@ async def get_all_projects(
 
 # ================ КЛИЕНТЫ (CLIENT DETAILS) ================
 
+CLIENT_STATISTICS_MAX_IDS = 500
+
+def collect_client_statistics(db: Session, user_ids: List[int]) -> dict:
+    """Статистика карточек клиентов: по одному GROUP BY на метрику,
+    число запросов не зависит от количества клиентов"""
+    stats = {
+        user_id: {
+            "total_messages": 0,
+            "total_projects": 0,
+            "total_transactions": 0,
+            "total_payments_sum": 0.0,
+            "balance": 0
+        }
+        for user_id in user_ids
+    }
+    if not user_ids:
+        return stats
+    
+    # Сообщения: отправленные и полученные (UNION убирает дубли, если sender == receiver)
+    participants = union(
+        select(models.Message.id, models.Message.sender_id.label("user_id"))
+        .where(models.Message.sender_id.in_(user_ids)),
+        select(models.Message.id, models.Message.receiver_id.label("user_id"))
+        .where(models.Message.receiver_id.in_(user_ids))
+    ).subquery()
+    for user_id, count in db.execute(
+        select(participants.c.user_id, func.count()).group_by(participants.c.user_id)
+    ):
+        stats[user_id]["total_messages"] = count
+    
+    # Проекты
+    for user_id, count in db.execute(
+        select(models.Project.user_id, func.count(models.Project.id))
+        .where(models.Project.user_id.in_(user_ids))
+        .group_by(models.Project.user_id)
+    ):
+        stats[user_id]["total_projects"] = count
+    
+    # Транзакции
+    for user_id, count in db.execute(
+        select(models.Transaction.user_id, func.count(models.Transaction.id))
+        .where(models.Transaction.user_id.in_(user_ids))
+        .group_by(models.Transaction.user_id)
+    ):
+        stats[user_id]["total_transactions"] = count
+    
+    # Сумма оплат и баланс — из user_balances по ключу (app/ledger.py)
+    for user_id, balance in ledger.read_balances(db, user_ids).items():
+        stats[user_id]["total_payments_sum"] = float(balance["total_credited"])
+        stats[user_id]["balance"] = balance["balance"]
+    
+    return stats
+
+@router.get("/clients/statistics")
+async def get_clients_statistics_batch(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    user_ids: Optional[List[int]] = Query(None),
+    limit: int = Query(50, ge=1, le=CLIENT_STATISTICS_MAX_IDS),
+    offset: int = Query(0, ge=0)
+):
+    """Статистика для нескольких карточек клиентов за один вызов
+    - user_ids: ?user_ids=1&user_ids=2 — конкретные клиенты (не больше 500)
+    - без user_ids: страница клиентов по id (limit/offset)
+    """
+    check_admin(current_user)
+    
+    if user_ids:
+        user_ids = list(dict.fromkeys(user_ids))
+        if len(user_ids) > CLIENT_STATISTICS_MAX_IDS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Не больше {CLIENT_STATISTICS_MAX_IDS} клиентов за запрос, передано {len(user_ids)}"
+            )
+    
+    query = select(models.User.id).order_by(models.User.id)
+    if user_ids:
+        query = query.where(models.User.id.in_(user_ids))
+    else:
+        query = query.offset(offset).limit(limit)
+    existing_ids = list(db.scalars(query))
+    
+    stats = collect_client_statistics(db, existing_ids)
+    
+    return {
+        "status": "success",
+        "count": len(existing_ids),
+        "statistics": [
+            schemas.ClientStatisticsItem(user_id=user_id, **stats[user_id])
+            for user_id in existing_ids
+        ],
+        "not_found": sorted(set(user_ids or []) - set(existing_ids))
+    }
+
 @router.get("/clients/{user_id}")
 async def get_client_details(
     user_id: int,
@@ -79,6 +271,53 @@ async def get_client_details(
     
     return client_details
 
+@router.put("/clients/bulk")
+async def bulk_update_client_details(
+    bulk: schemas.BulkClientDetailsRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Обновить реквизиты нескольких клиентов одной транзакцией"""
+    check_admin(current_user)
+    
+    user_ids = {item.user_id for item in bulk.items}
+    existing_users = set(db.scalars(select(models.User.id).where(models.User.id.in_(user_ids))))
+    details_ids = dict(db.execute(
+        select(models.ClientDetails.user_id, models.ClientDetails.id)
+        .where(models.ClientDetails.user_id.in_(user_ids))
+    ).all())
+    
+    results = []
+    updates, inserts = [], []
+    seen = set()
+    now = datetime.utcnow()
+    for item in bulk.items:
+        fields = item.model_dump(exclude_unset=True, exclude={"user_id"})
+        if item.user_id in seen:
+            results.append(schemas.BulkItemResult(id=item.user_id, status="error", detail="Повтор user_id в пакете"))
+        elif item.user_id not in existing_users:
+            results.append(schemas.BulkItemResult(id=item.user_id, status="error", detail="Пользователь не найден"))
+        elif not fields:
+            results.append(schemas.BulkItemResult(id=item.user_id, status="unchanged"))
+        elif item.user_id in details_ids:
+            updates.append(dict(fields, id=details_ids[item.user_id], updated_at=now))
+            results.append(schemas.BulkItemResult(id=item.user_id, status="updated"))
+        else:
+            inserts.append(dict(fields, user_id=item.user_id, created_at=now, updated_at=now))
+            results.append(schemas.BulkItemResult(id=item.user_id, status="created"))
+        seen.add(item.user_id)
+    
+    bulk_result(results, bulk.all_or_nothing)
+    
+    # UPDATE по первичному ключу пачкой (executemany) + INSERT недостающих
+    if updates:
+        db.execute(update(models.ClientDetails), updates)
+    if inserts:
+        db.execute(insert(models.ClientDetails), inserts)
+    db.commit()
+    
+    return bulk_summary(results)
+
 @router.put("/clients/{user_id}")
 async def update_client_details(
     user_id: int,
@@ -124,32 +363,7 @@ async def get_client_statistics(
     if not user:
         raise HTTPException(status_code=404, detail="Пользователь не найден")
     
-    # Считаем сообщения
-    total_messages = db.query(models.Message).filter(
-        (models.Message.sender_id == user_id) | (models.Message.receiver_id == user_id)
-    ).count()
-    
-    # Считаем проекты
-    total_projects = db.query(models.Project).filter(
-        models.Project.user_id == user_id
-    ).count()
-    
-    # Считаем транзакции и сумму
-    total_transactions = db.query(models.Transaction).filter(
-        models.Transaction.user_id == user_id
-    ).count()
-    
-    total_payments_sum = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.user_id == user_id,
-        models.Transaction.status == "completed"
-    ).scalar() or 0.0
-    
-    return {
-        "total_messages": total_messages,
-        "total_projects": total_projects,
-        "total_transactions": total_transactions,
-        "total_payments_sum": float(total_payments_sum)
-    }
+    return collect_client_statistics(db, [user_id])[user_id]
 
 # ================ УСЛУГИ ================
 @router.get("/services")
@@ -200,6 +414,14 @@ async def get_all_services(
         "services": services_list
     }
 
+# Публичные страницы, где видны услуги (кэш app/page_cache.py)
+SERVICE_PAGES = ("/", "/services", "/pricing")
+
+def services_changed():
+    """Сбросить кэш страниц с услугами — после commit любой правки услуг"""
+    for path in SERVICE_PAGES:
+        page_cache.invalidate(path)
+
 @router.post("/services")
 async def create_service(
     service_data: dict,
@@ -232,6 +454,7 @@ async def create_service(
     db.add(new_service)
     db.commit()
     db.refresh(new_service)
+    services_changed()
     
     return {
         "status": "success",
@@ -247,6 +470,55 @@ async def create_service(
         }
     }
 
+@router.put("/services/active")
+async def bulk_toggle_services(
+    bulk: schemas.BulkServiceActiveRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Включить/выключить несколько услуг одной транзакцией"""
+    check_admin(current_user)
+    
+    current = dict(db.execute(
+        select(models.Service.id, models.Service.is_active)
+        .where(models.Service.id.in_({item.id for item in bulk.items}))
+    ).all())
+    
+    results = []
+    targets = {True: [], False: []}
+    seen = set()
+    for item in bulk.items:
+        if item.id in seen:
+            results.append(schemas.BulkItemResult(id=item.id, status="error", detail="Повтор id в пакете"))
+        elif item.id not in current:
+            results.append(schemas.BulkItemResult(id=item.id, status="error", detail="Услуга не найдена"))
+        elif current[item.id] == item.is_active:
+            results.append(schemas.BulkItemResult(id=item.id, status="unchanged"))
+        else:
+            targets[item.is_active].append(item.id)
+            results.append(schemas.BulkItemResult(id=item.id, status="updated"))
+        seen.add(item.id)
+    
+    bulk_result(results, bulk.all_or_nothing)
+    
+    # Не больше двух UPDATE на пакет
+    now = datetime.utcnow()
+    for is_active, ids in targets.items():
+        if ids:
+            db.execute(
+                update(models.Service)
+                .where(models.Service.id.in_(ids))
+                .values(is_active=is_active, updated_at=now)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    
+    # UPDATE в обход ORM — кэш страниц сбрасываем явно
+    if targets[True] or targets[False]:
+        services_changed()
+    
+    return bulk_summary(results)
+
 @router.put("/services/{service_id}")
 async def update_service(
     service_id: int,
@@ -285,6 +557,7 @@ async def update_service(
     service.updated_at = datetime.utcnow()
     db.commit()
     db.refresh(service)
+    services_changed()
     
     return {
         "status": "success",
@@ -315,6 +588,7 @@ async def delete_service(
     
     db.delete(service)
     db.commit()
+    services_changed()
     
     return {
         "status": "success",
@@ -362,34 +636,18 @@ async def get_transactions_stats(
     """Статистика по транзакциям"""
     check_admin(current_user)
     
-    inspector = inspect(db.bind)
-    if 'transactions' not in inspector.get_table_names():
-        return {
-            "status": "success",
-            "stats": {
-                "total_transactions": 0,
-                "total_revenue": 0,
-                "average_amount": 0,
-                "last_month_revenue": 0
-            }
-        }
-    
-    total_transactions = db.query(models.Transaction).count()
-    total_revenue = db.query(func.sum(models.Transaction.amount)).scalar() or 0
+    stats = await get_dashboard_stats_async(db)
+    total_transactions = stats["total_transactions"]
+    total_revenue = stats["total_revenue"]
     average_amount = total_revenue / total_transactions if total_transactions > 0 else 0
     
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    last_month_revenue = db.query(func.sum(models.Transaction.amount)).filter(
-        models.Transaction.created_at >= thirty_days_ago
-    ).scalar() or 0
-    
     return {
         "status": "success",
         "stats": {
             "total_transactions": total_transactions,
             "total_revenue": float(total_revenue),
             "average_amount": float(average_amount),
-            "last_month_revenue": float(last_month_revenue)
+            "last_month_revenue": float(stats["last_month_revenue"])
         }
     }
 
@@ -402,75 +660,125 @@ async def get_admin_stats(
     """Получить статистику для админ-панели"""
     check_admin(current_user)
     
-    total_users = db.query(models.User).count()
-    total_projects = db.query(models.Project).count()
-    total_services = db.query(models.Service).count()
-    
-    thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-    active_users = db.query(models.User).filter(
-        models.User.created_at >= thirty_days_ago
-    ).count()
+    stats = await get_dashboard_stats_async(db)
     
     return {
         "status": "success",
         "stats": {
-            "total_users": total_users,
-            "total_projects": total_projects,
-            "total_services": total_services,
-            "active_users": active_users,
+            "total_users": stats["total_users"],
+            "total_projects": stats["total_projects"],
+            "total_services": stats["total_services"],
+            "active_users": stats["active_users"],
             "revenue": 0,
             "growth_rate": 0
         }
     }
 
+@router.get("/stats/timeseries")
+async def get_stats_timeseries(
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    metrics: Optional[str] = None
+):
+    """Ряды по дням для графиков (из daily_rollups, без сканирования таблиц)
+    - start/end: YYYY-MM-DD, по умолчанию последние 30 дней
+    - metrics: через запятую из revenue, transactions_count, transactions_amount, new_users, messages
+    """
+    check_admin(current_user)
+    
+    end = end or datetime.utcnow().date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=400, detail="start позже end")
+    if (end - start).days > 1100:
+        raise HTTPException(status_code=400, detail="Слишком большой период (максимум 3 года)")
+    
+    selected = rollups.METRICS
+    if metrics:
+        selected = [m.strip() for m in metrics.split(",") if m.strip()]
+        unknown = [m for m in selected if m not in rollups.METRICS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Неизвестные метрики: {', '.join(unknown)}")
+    
+    return {
+        "status": "success",
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "metrics": selected,
+        "series": rollups.time_series(db, start, end, selected)
+    }
+
 # ================ АРХИВ ПРОЕКТОВ (ДОБАВЛЕНО) ================
+
+# Русские названия категорий
+ARCHIVE_CATEGORY_NAMES = {
+    'pending': 'Заявка',
+    'in_progress': 'В работе',
+    'completed': 'Выполнен',
+    'cancelled': 'Отменён'
+}
+
 @router.get("/archive/projects")
 async def get_archive_projects(
     current_user: models.User = Depends(get_current_user),
     db: Session = Depends(get_db),
-    category: Optional[str] = None
+    category: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0)
 ):
     """Получить проекты для архива
-    Категории: completed (выполненные), in_progress (в работе), pending (заявки)
+    Категории: completed (выполненные), in_progress (в работе), pending (заявки), cancelled (отменённые)
+    Несколько категорий — через запятую: ?category=pending,in_progress
+    Всегда два запроса (total + страница) независимо от числа проектов
     """
     check_admin(current_user)
     
-    # Базовый запрос
-    query = db.query(models.Project)
+    # Проекты вместе с именем клиента одним запросом, только нужные колонки
+    query = db.query(
+        models.Project.id,
+        models.Project.title,
+        models.Project.description,
+        models.Project.status,
+        models.Project.user_id,
+        models.Project.created_at,
+        models.User.name.label("user_name")
+    ).outerjoin(models.User, models.User.id == models.Project.user_id)
     
     # Фильтр по категории
-    if category in ['completed', 'in_progress', 'pending']:
-        query = query.filter(models.Project.status == category)
-    
-    projects = query.order_by(models.Project.created_at.desc()).all()
+    if category:
+        categories = [c.strip() for c in category.split(",") if c.strip() in ARCHIVE_CATEGORY_NAMES]
+        if categories:
+            query = query.filter(models.Project.status.in_(categories))
+    
+    total = query.order_by(None).count()
+    rows = query.order_by(
+        models.Project.created_at.desc(),
+        models.Project.id.desc()
+    ).offset(offset).limit(limit).all()
     
     # Форматируем результат
-    result = []
-    for project in projects:
-        user = db.query(models.User).filter(models.User.id == project.user_id).first()
-        
-        # Русские названия категорий
-        category_names = {
-            'pending': 'Заявка',
-            'in_progress': 'В работе',
-            'completed': 'Выполнен',
-            'cancelled': 'Отменён'
+    result = [
+        {
+            "id": row.id,
+            "title": row.title,
+            "description": row.description,
+            "category": row.status,
+            "category_name": ARCHIVE_CATEGORY_NAMES.get(row.status, row.status),
+            "user_id": row.user_id,
+            "user_name": row.user_name or "Неизвестный",
+            "created_at": row.created_at.isoformat() if row.created_at else None
         }
-        
-        result.append({
-            "id": project.id,
-            "title": project.title,
-            "description": project.description,
-            "category": project.status,
-            "category_name": category_names.get(project.status, project.status),
-            "user_id": project.user_id,
-            "user_name": user.name if user else "Неизвестный",
-            "created_at": project.created_at.isoformat() if project.created_at else None
-        })
+        for row in rows
+    ]
     
     return {
         "status": "success",
         "count": len(result),
+        "total": total,
+        "limit": limit,
+        "offset": offset,
         "projects": result
     }
 
@@ -482,12 +790,7 @@ async def get_archive_stats(
     """Получить статистику по категориям архива"""
     check_admin(current_user)
     
-    stats = {
-        "pending": db.query(models.Project).filter(models.Project.status == 'pending').count(),
-        "in_progress": db.query(models.Project).filter(models.Project.status == 'in_progress').count(),
-        "completed": db.query(models.Project).filter(models.Project.status == 'completed').count(),
-        "cancelled": db.query(models.Project).filter(models.Project.status == 'cancelled').count()
-    }
+    stats = dict((await get_dashboard_stats_async(db))["projects_by_status"])
     stats["total"] = sum(stats.values())
     
     return {
@@ -495,6 +798,59 @@ async def get_archive_stats(
         "stats": stats
     }
 
+@router.put("/archive/projects/category")
+async def bulk_change_project_category(
+    bulk: schemas.BulkProjectCategoryRequest,
+    current_user: models.User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Перенести несколько проектов между категориями архива одной транзакцией"""
+    check_admin(current_user)
+    
+    current = dict(db.execute(
+        select(models.Project.id, models.Project.status)
+        .where(models.Project.id.in_({item.id for item in bulk.items}))
+    ).all())
+    
+    results = []
+    moves = defaultdict(list)  # (старая категория, новая) -> [id]
+    seen = set()
+    for item in bulk.items:
+        if item.id in seen:
+            results.append(schemas.BulkItemResult(id=item.id, status="error", detail="Повтор id в пакете"))
+        elif item.category not in ARCHIVE_CATEGORY_NAMES:
+            results.append(schemas.BulkItemResult(id=item.id, status="error", detail="Некорректная категория"))
+        elif item.id not in current:
+            results.append(schemas.BulkItemResult(id=item.id, status="error", detail="Проект не найден"))
+        elif current[item.id] == item.category:
+            results.append(schemas.BulkItemResult(id=item.id, status="unchanged"))
+        else:
+            moves[(current[item.id], item.category)].append(item.id)
+            results.append(schemas.BulkItemResult(id=item.id, status="updated"))
+        seen.add(item.id)
+    
+    bulk_result(results, bulk.all_or_nothing)
+    
+    # Один UPDATE на пару категорий. Bulk UPDATE идёт мимо ORM-хуков,
+    # поэтому счётчики категорий правим сами — один раз на пакет
+    deltas = defaultdict(int)
+    for (old_category, new_category), ids in moves.items():
+        moved = db.execute(
+            update(models.Project)
+            .where(models.Project.id.in_(ids), models.Project.status == old_category)
+            .values(status=new_category)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        deltas[f"projects_status:{old_category}"] -= moved
+        deltas[f"projects_status:{new_category}"] += moved
+    counters.increment(db.connection(), {name: delta for name, delta in deltas.items() if delta})
+    db.commit()
+    
+    if moves:
+        stats_cache.invalidate()
+    
+    return bulk_summary(results)
+
 @router.put("/archive/projects/{project_id}/category")
 async def change_project_category(
     project_id: int,
@@ -510,7 +866,7 @@ async def change_project_category(
         raise HTTPException(status_code=404, detail="Проект не найден")
     
     new_category = category_data.get("category")
-    if new_category not in ['pending', 'in_progress', 'completed', 'cancelled']:
+    if new_category not in ARCHIVE_CATEGORY_NAMES:
         raise HTTPException(status_code=400, detail="Некорректная категория")
     
     project.status = new_category
@@ -518,8 +874,26 @@ async def change_project_category(
         project.updated_at = datetime.utcnow()
     
     db.commit()
+    stats_cache.invalidate()
     
     return {
         "status": "success",
         "message": f"Проект перемещён в категорию {new_category}"
-    }
\ No newline at end of file
+    }
+
+# ================ КЭШ СТРАНИЦ ================
+@router.post("/cache/pages/invalidate")
+async def invalidate_page_cache(
+    path: Optional[str] = None,
+    current_user: models.User = Depends(get_current_user)
+):
+    """Сбросить кэш публичных страниц: одну (?path=/pricing) или все"""
+    check_admin(current_user)
+    
+    cached = page_cache.paths()
+    page_cache.invalidate(path)
+    
+    return {
+        "status": "success",
+        "invalidated": [path] if path else cached
+    }
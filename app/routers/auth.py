@@ -5,9 +5,9 @@ from app.database import get_db
 from app.models import User, ClientDetails  # <--- ДОБАВЛЕН ClientDetails
 from jose import jwt  # <--- ИСПРАВЛЕНО!
 from datetime import datetime, timedelta
-import hashlib
-import secrets
 from typing import Optional
+from app.passwords import password_hasher, PasswordHasherBusy
+from app.rate_limit import rate_limiter
 
 router = APIRouter(prefix="/api/auth", tags=["auth"])
 
@@ -24,17 +24,19 @@ class RegisterRequest(BaseModel):
     password: str
     name: str
 
-def hash_password(password: str, salt: str = None) -> tuple:
-    if salt is None:
-        salt = secrets.token_hex(16)
-    hash_obj = hashlib.sha256()
-    hash_obj.update(f"{password}{salt}".encode('utf-8'))
-    hashed_password = hash_obj.hexdigest()
-    return hashed_password, salt
+async def hash_password(password: str) -> str:
+    """bcrypt-хэш пароля (считается в пуле потоков)"""
+    try:
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, попробуйте позже")
 
-def verify_password(password: str, hashed_password: str, salt: str) -> bool:
-    test_hash, _ = hash_password(password, salt)
-    return test_hash == hashed_password
+async def verify_password(password: str, hashed_password: str, salt: Optional[str]) -> tuple:
+    """Проверка пароля; возвращает (ok, новый_хэш_или_None)"""
+    try:
+        return await password_hasher.verify(password, hashed_password, salt)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Сервер перегружен, попробуйте позже")
 
 def create_access_token(user_id: int):
     payload = {
@@ -47,20 +49,24 @@ def create_access_token(user_id: int):
 @router.post("/register")
 async def register(
     register_data: RegisterRequest,
+    request: Request,
     db: Session = Depends(get_db)
 ):
+    # Лимит проверяем до БД и хэширования
+    await rate_limiter.check("register", request, register_data.email)
+    
     # Проверяем, существует ли пользователь
     existing_user = db.query(User).filter(User.email == register_data.email).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email уже зарегистрирован")
     
     # Создаем пользователя
-    hashed_password, salt = hash_password(register_data.password)
+    hashed_password = await hash_password(register_data.password)
     new_user = User(
         email=register_data.email,
         name=register_data.name,
         hashed_password=hashed_password,
-        salt=salt,
+        salt=None,
         is_admin=False,
         created_at=datetime.utcnow()
     )
@@ -85,16 +91,33 @@ async def register(
 async def login(
     login_data: LoginRequest,
     response: Response,
+    request: Request,
     db: Session = Depends(get_db)
 ):
+    # Лимит проверяем до БД и хэширования: по IP — каждая попытка,
+    # по email — только неудачные с этого же адреса
+    await rate_limiter.check("login", request)
+    await rate_limiter.check_failures("login", request, login_data.email)
+    
     db_user = db.query(User).filter(User.email == login_data.email).first()
     
     if not db_user:
+        await rate_limiter.record_failure("login", request, login_data.email)
         raise HTTPException(status_code=401, detail="Неверный email или пароль")
     
-    if not verify_password(login_data.password, db_user.hashed_password, db_user.salt):
+    password_ok, new_hash = await verify_password(login_data.password, db_user.hashed_password, db_user.salt)
+    if not password_ok:
+        await rate_limiter.record_failure("login", request, login_data.email)
         raise HTTPException(status_code=401, detail="Неверный email или пароль")
     
+    await rate_limiter.reset_failures("login", request, login_data.email)
+    
+    # Старый SHA-256 хэш (или устаревшие параметры bcrypt) — перехэшируем
+    if new_hash:
+        db_user.hashed_password = new_hash
+        db_user.salt = None
+        db.commit()
+    
     # Создаём токен с ID пользователя
     access_token = create_access_token(db_user.id)
     
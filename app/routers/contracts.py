@@ -0,0 +1,334 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import date, datetime
+from typing import Dict, Optional, Tuple
+import asyncio
+import urllib.parse
+from starlette.concurrency import run_in_threadpool
+
+import app.database as database
+import app.models as models
+import app.schemas as schemas
+from app import contracts_catalog
+from app.contract_bundle import stream_zip, ZIP_MEDIA_TYPE
+from app.contract_files import contract_files, send_file
+from app.contract_formats import can_render, contract_file
+from app.contract_search import contract_search, make_snippet, read_text
+from app.contract_store import Publication, StoredBlob, UploadError, publish, receive_upload
+from app.dependencies import get_current_admin_user
+
+router = APIRouter(
+    prefix="/api/contracts",
+    tags=["contracts"]
+)
+
+BUNDLE_FORMATS = ["txt", "docx", "pdf", "xlsx"]
+BUNDLE_MAX_CONTRACTS = 500
+
+def get_db():
+    db = database.SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def get_contract_or_404(db: Session, contract_id: int) -> dict:
+    contract = contracts_catalog.get_contract(db, contract_id)
+    if contract is None:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    return contract
+
+@router.get("/list")
+async def get_contracts_list(
+    response: Response,
+    client: Optional[str] = None,
+    user_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    amount_min: Optional[int] = Query(None, ge=0),
+    amount_max: Optional[int] = Query(None, ge=0),
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Список договоров (массив, как и раньше)
+    - client: точное название клиента; date_from/date_to — дата договора (включительно);
+      amount_min/amount_max — сумма в рублях
+    - limit/offset — страница; всего найдено — в заголовке X-Total-Count
+    """
+    page = contracts_catalog.list_contracts(
+        db, client=client, user_id=user_id, project_id=project_id,
+        date_from=date_from, date_to=date_to, amount_min=amount_min, amount_max=amount_max,
+        limit=limit, offset=offset
+    )
+    response.headers["X-Total-Count"] = str(page["total"])
+    return page["items"]
+
+@router.get("/search")
+async def search_contracts(
+    q: str = Query(..., min_length=2, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+    db: Session = Depends(get_db)
+):
+    """
+    Поиск по тексту договоров (с учётом словоформ), по релевантности (BM25)
+    - snippet — фрагмент текста, совпадения в <mark> (остальное HTML-экранировано)
+    """
+    if contract_search.sync_due():
+        await run_in_threadpool(contract_search.sync)
+    total, hits, query_terms = contract_search.search(q, limit=limit, offset=offset)
+
+    def load_results():
+        results = []
+        for contract_id, score in hits:
+            contract = contracts_catalog.get_contract(db, contract_id)
+            entry = contract_files.get(contract_id, None)
+            if contract is None or entry is None:
+                continue
+            try:
+                snippet = make_snippet(read_text(entry.path), query_terms)
+            except OSError:
+                snippet = ""
+            results.append(dict(contract, score=round(score, 4), snippet=snippet))
+        return results
+
+    return {"query": q, "total": total, "results": await run_in_threadpool(load_results)}
+
+@router.get("/info/{contract_id}")
+async def get_contract_info(contract_id: int, db: Session = Depends(get_db)):
+    """Получить информацию о конкретном договоре"""
+    return get_contract_or_404(db, contract_id)
+
+@router.get("/file/{contract_id}")
+async def get_contract_file(request: Request, contract_id: int, format: str = None, db: Session = Depends(get_db)):
+    """
+    Эндпоинт для получения файла договора
+    - contract_id: ID договора
+    - format: желаемый формат (txt, docx, pdf, xlsx) - если не указан, вернёт оригинал
+    Файлы открываются в РОДНОМ ФОРМАТЕ (Word, PDF, Excel); всё, кроме
+    оригинала, собирается из него при первом запросе и кэшируется.
+    Поддерживаются If-None-Match / If-Modified-Since (304) и Range (206).
+    """
+    contract = get_contract_or_404(db, contract_id)
+
+    # Неизвестный формат — отдаём оригинал
+    if format not in contract["available_formats"]:
+        format = None
+
+    entry = await contract_file(contract, format)
+    if entry is None:
+        raise HTTPException(status_code=404, detail=f"File not found for contract {contract_id} in format {format or 'original'}")
+
+    return send_file(request, entry)
+
+@router.get("/formats/{contract_id}")
+async def get_available_formats(contract_id: int, db: Session = Depends(get_db)):
+    """Получить список доступных форматов для договора"""
+    contract = get_contract_or_404(db, contract_id)
+
+    return {
+        "contract_id": contract_id,
+        "contract_number": contract["number"],
+        # Есть оригинал — есть и все форматы (собираются по запросу)
+        "available_formats": [
+            format for format in contract["available_formats"]
+            if can_render(contract, format)
+        ]
+    }
+
+@router.get("/bundle")
+async def download_bundle(
+    ids: Optional[str] = None,
+    client: Optional[str] = None,
+    formats: str = "txt",
+    db: Session = Depends(get_db)
+):
+    """
+    ZIP-архив договоров, собирается на лету (без буферизации в памяти и на диске)
+    - ids: id договоров через запятую (1,2,3) или client: все договоры клиента
+    - formats: форматы через запятую (txt,docx,pdf,xlsx)
+    """
+    requested_formats = [format.strip() for format in formats.split(",") if format.strip()]
+    unknown = [format for format in requested_formats if format not in BUNDLE_FORMATS]
+    if not requested_formats or unknown:
+        raise HTTPException(status_code=400, detail=f"Форматы: {', '.join(BUNDLE_FORMATS)}")
+
+    if ids:
+        try:
+            contract_ids = list(dict.fromkeys(int(value) for value in ids.split(",") if value.strip()))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ids — числа через запятую")
+        if len(contract_ids) > BUNDLE_MAX_CONTRACTS:
+            raise HTTPException(status_code=400, detail=f"Не больше {BUNDLE_MAX_CONTRACTS} договоров за раз")
+        contracts = [get_contract_or_404(db, contract_id) for contract_id in contract_ids]
+    elif client:
+        contracts = contracts_catalog.list_contracts(db, client=client, limit=BUNDLE_MAX_CONTRACTS)["items"]
+    else:
+        raise HTTPException(status_code=400, detail="Укажите ids или client")
+    db.close()
+
+    # Недостающие форматы собираются заранее (пул процессов), архив потом только читает файлы
+    wanted = [
+        (contract, format)
+        for contract in contracts
+        for format in requested_formats
+        if format in contract["available_formats"]
+    ]
+    entries = await asyncio.gather(*[contract_file(contract, format) for contract, format in wanted])
+    files = [(entry.filename, entry.path) for entry in entries if entry is not None]
+    if not files:
+        raise HTTPException(status_code=404, detail="Нет файлов для архива")
+
+    archive_name = f"Договоры {client}.zip" if client and not ids else "contracts.zip"
+    return StreamingResponse(
+        stream_zip(files),
+        media_type=ZIP_MEDIA_TYPE,
+        headers={"Content-Disposition": f"attachment; filename*=UTF-8''{urllib.parse.quote(archive_name)}"}
+    )
+
+# ========== УПРАВЛЕНИЕ КАТАЛОГОМ (АДМИН) ==========
+
+def save_contract(db: Session, contract: models.Contract, publication: Optional[Publication] = None) -> dict:
+    """Commit договора; при ошибке опубликованный файл откатывается"""
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if publication:
+            publication.rollback()
+        raise HTTPException(status_code=400, detail="Договор с таким номером уже есть или неверный user_id/project_id")
+    except Exception:
+        db.rollback()
+        if publication:
+            publication.rollback()
+        raise
+    if publication:
+        publication.commit()
+    db.refresh(contract)
+    contracts_catalog.changed(contract)
+    return contracts_catalog.contract_to_dict(contract)
+
+@router.post("/")
+async def create_contract(
+    contract_data: schemas.ContractCreate,
+    current_user: models.User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Добавить договор (только админ)"""
+    contract = models.Contract(**contract_data.model_dump())
+    db.add(contract)
+    return save_contract(db, contract)
+
+async def receive_contract_file(request: Request) -> Tuple[Dict[str, str], StoredBlob]:
+    try:
+        fields, blob, _ = await receive_upload(request)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    if blob is None:
+        raise HTTPException(status_code=400, detail="Нет файла (поле file)")
+    return fields, blob
+
+def publish_or_400(blob: StoredBlob, filename: str) -> Publication:
+    try:
+        return publish(blob, filename)
+    except UploadError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def upload_result(contract: dict, blob: StoredBlob) -> dict:
+    return {
+        "status": "success",
+        "contract": contract,
+        "sha256": blob.sha256,
+        "size": blob.size,
+        "deduplicated": blob.deduplicated
+    }
+
+@router.post("/upload")
+async def upload_contract(
+    request: Request,
+    current_user: models.User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Новый договор с файлом (multipart/form-data, только админ)
+    - file: текстовый оригинал (.txt); тело пишется на диск потоком, не в память
+    - number, name, client, date, amount, user_id, project_id,
+      available_formats (через запятую) — поля договора
+    Одинаковые файлы хранятся один раз (deduplicated=true в ответе).
+    """
+    fields, blob = await receive_contract_file(request)
+    fields = {key: value for key, value in fields.items() if value.strip()}
+    if "available_formats" in fields:
+        fields["available_formats"] = [format.strip() for format in fields["available_formats"].split(",") if format.strip()]
+    number = fields.get("number", "")
+    fields["original_file"] = number.replace("/", "-").replace("\\", "-") + ".txt"
+    try:
+        contract_data = schemas.ContractCreate(**fields)
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_context=False))
+
+    if db.query(models.Contract.id).filter(models.Contract.original_file == contract_data.original_file).first():
+        raise HTTPException(status_code=409, detail=f"Файл {contract_data.original_file} уже принадлежит другому договору")
+    contract = models.Contract(**contract_data.model_dump())
+    db.add(contract)
+    try:
+        db.flush()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Договор с таким номером уже есть или неверный user_id/project_id")
+
+    publication = publish_or_400(blob, contract.original_file)
+    return upload_result(save_contract(db, contract, publication), blob)
+
+@router.post("/{contract_id}/upload")
+async def upload_contract_file(
+    contract_id: int,
+    request: Request,
+    current_user: models.User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Заменить текстовый оригинал договора (multipart/form-data, поле file; только админ)"""
+    contract = db.get(models.Contract, contract_id)
+    if contract is None:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    _, blob = await receive_contract_file(request)
+
+    publication = publish_or_400(blob, contract.original_file)
+    contract.updated_at = datetime.utcnow()
+    return upload_result(save_contract(db, contract, publication), blob)
+
+@router.put("/{contract_id}")
+async def update_contract(
+    contract_id: int,
+    contract_data: schemas.ContractUpdate,
+    current_user: models.User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Изменить договор (только админ)"""
+    contract = db.get(models.Contract, contract_id)
+    if contract is None:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    for field, value in contract_data.model_dump(exclude_unset=True).items():
+        setattr(contract, field, value)
+    return save_contract(db, contract)
+
+@router.delete("/{contract_id}")
+async def delete_contract(
+    contract_id: int,
+    current_user: models.User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Удалить договор из каталога (файлы на диске не трогаются; только админ)"""
+    contract = db.get(models.Contract, contract_id)
+    if contract is None:
+        raise HTTPException(status_code=404, detail="Contract not found")
+    db.delete(contract)
+    db.commit()
+    contracts_catalog.changed(deleted_id=contract_id)
+    return {"status": "success", "message": f"Договор {contract_id} удалён"}
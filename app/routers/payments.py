@@ -1,22 +1,19 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-import uuid
 from datetime import datetime, timedelta
 from typing import Optional, List
+import asyncio
+import json
 import os
 from dotenv import load_dotenv
 
 from app.database import get_db
-from app.models import User, Payment, Transaction
+from app.models import User, Payment
 from app.dependencies import get_current_user
-
-# Попытка импорта ЮKassa (необязательно для тестового режима)
-try:
-    from yookassa import Configuration, Payment as YooPayment
-    YOOKASSA_AVAILABLE = True
-except ImportError:
-    YOOKASSA_AVAILABLE = False
-    print("ℹ️ ЮKassa не установлена. Работаем в тестовом режиме.")
+from app import billing, webhook_inbox
+from app.payment_events import broker
+from app.payment_providers import ProviderError, get_provider
 
 load_dotenv()
 
@@ -55,12 +52,14 @@ async def initiate_payment(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Инициировать платеж (тестовый режим)"""
+    """Инициировать платеж у провайдера (app/payment_providers.py)"""
     
     # Проверка минимальной суммы (1 рубль = 100 копеек)
     if payment_data.amount < 100:
         raise HTTPException(status_code=400, detail="Минимальная сумма платежа 1 рубль")
     
+    provider = get_provider()
+    
     # Создаем запись в БД
     payment = Payment(
         user_id=current_user.id,
@@ -68,7 +67,8 @@ async def initiate_payment(
         description=payment_data.description or "Пополнение баланса",
         status="pending",
         payment_metadata={
-            "test_mode": True,
+            "test_mode": provider.test_mode,
+            "provider": provider.name,
             "user_email": current_user.email
         }
     )
@@ -76,61 +76,50 @@ async def initiate_payment(
     db.commit()
     db.refresh(payment)
     
-    # ТЕСТОВЫЙ РЕЖИМ: сразу считаем платеж успешным
-    # Через 3 секунды статус изменится на succeeded (имитация)
+    return_url = payment_data.return_url or os.getenv("YOOKASSA_RETURN_URL", "http://localhost:8080/dashboard")
     
-    # Генерируем тестовый payment_id
-    test_payment_id = f"test-{uuid.uuid4()}"
-    payment.transaction_id = test_payment_id
+    # Запрос к провайдеру не блокирует цикл событий; повтор с тем же
+    # ключом идемпотентности не создаст второй платёж
+    try:
+        provider_payment = await provider.create_payment(
+            amount=payment.amount,
+            currency=payment.currency,
+            description=payment.description,
+            return_url=return_url,
+            metadata={"payment_id": payment.id, "user_id": current_user.id},
+            idempotence_key=f"payment-{payment.id}"
+        )
+    except ProviderError as e:
+        print(f"❌ Провайдер не создал платеж {payment.id}: {e}")
+        billing.mark_payment_canceled(db, Payment.id == payment.id)
+        db.commit()
+        raise HTTPException(status_code=502, detail="Платежный сервис недоступен, попробуйте позже")
+    
+    payment.transaction_id = provider_payment.id
     db.commit()
     
-    # В тестовом режиме возвращаем ссылку на локальный success
-    return_url = payment_data.return_url or os.getenv("YOOKASSA_RETURN_URL", "http://localhost:8080/dashboard")
-    
     return PaymentConfirmation(
-        payment_id=test_payment_id,
-        confirmation_url=f"{return_url}?payment_id={payment.id}&test_mode=true",
-        test_mode=True
+        payment_id=provider_payment.id,
+        confirmation_url=provider_payment.confirmation_url,
+        test_mode=provider.test_mode
     )
 
 @router.post("/webhook")
 async def payment_webhook(request: Request, db: Session = Depends(get_db)):
-    """Webhook для уведомлений (тестовый режим)"""
+    """Webhook для уведомлений: событие сохраняется в inbox и сразу
+    подтверждается, применяет его фоновый обработчик (app/webhook_inbox.py).
+    Тело не аутентифицировано: с живым провайдером обработчик перечитывает
+    статус платежа у провайдера и тип события из тела не применяет"""
     
     try:
         body = await request.json()
-        
-        # Тестовый режим: просто логируем
-        print(f"🔔 Тестовый вебхук: {body}")
-        
-        event = body.get("event")
-        payment_id = body.get("object", {}).get("id")
-        
-        if event == "payment.succeeded" and payment_id:
-            payment = db.query(Payment).filter(
-                Payment.transaction_id == payment_id
-            ).first()
-            
-            if payment:
-                payment.status = "succeeded"
-                payment.updated_at = datetime.utcnow()
-                
-                # Создаем транзакцию
-                transaction = Transaction(
-                    user_id=payment.user_id,
-                    amount=payment.amount,
-                    status="completed",
-                    currency=payment.currency
-                )
-                db.add(transaction)
-                db.commit()
-                print(f"✅ Тестовый платеж {payment_id} успешно обработан")
-        
-        return {"status": "ok", "test_mode": True}
-        
-    except Exception as e:
-        print(f"❌ Ошибка тестового вебхука: {e}")
-        return {"status": "error", "message": str(e), "test_mode": True}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Некорректный JSON")
+    if not isinstance(body, dict):
+        raise HTTPException(status_code=400, detail="Некорректное событие")
+    
+    created = webhook_inbox.store_event(db, body)
+    return {"status": "ok", "duplicate": not created, "test_mode": get_provider().test_mode}
 
 # Эндпоинт для имитации успешного платежа (для тестирования)
 @router.post("/test/success/{payment_id}")
@@ -139,7 +128,12 @@ async def test_payment_success(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Принудительно отметить платеж как успешный (только для тестирования)"""
+    """Принудительно отметить платеж как успешный (только для тестирования).
+    С живым провайдером маршрута нет: иначе любой пользователь зачислил бы
+    себе неоплаченный платёж"""
+    
+    if not get_provider().test_mode:
+        raise HTTPException(status_code=404, detail="Not Found")
     
     payment = db.query(Payment).filter(
         Payment.id == payment_id,
@@ -149,19 +143,12 @@ async def test_payment_success(
     if not payment:
         raise HTTPException(status_code=404, detail="Платеж не найден")
     
-    payment.status = "succeeded"
-    payment.updated_at = datetime.utcnow()
-    
-    # Создаем транзакцию
-    transaction = Transaction(
-        user_id=payment.user_id,
-        amount=payment.amount,
-        status="completed",
-        currency=payment.currency
-    )
-    db.add(transaction)
+    # Повторный вызов транзакцию не дублирует
+    transaction = billing.mark_payment_succeeded(db, Payment.id == payment.id)
     db.commit()
     
+    if transaction is None:
+        return {"status": "success", "message": "Платеж уже был отмечен как успешный"}
     return {"status": "success", "message": "Платеж отмечен как успешный"}
 
 @router.get("/history", response_model=List[PaymentResponse])
@@ -181,20 +168,77 @@ async def get_payment_history(
     
     return payments
 
+# Сколько секунд держать SSE-соединение без событий до комментария-пинга
+SSE_PING_INTERVAL = 15
+
+@router.get("/events")
+async def payment_events_stream(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Смены статусов платежей пользователя (Server-Sent Events).
+    EventSource не умеет заголовки — токен можно передать как ?token=...
+    """
+    user_id = current_user.id
+    # Соединение с БД больше не нужно — не держим его, пока открыт поток
+    db.close()
+
+    async def stream():
+        with broker.subscribe(user_id) as queue:
+            yield "retry: 3000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=SSE_PING_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: payment_status\ndata: {json.dumps(message, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.get("/{payment_id}", response_model=PaymentResponse)
 async def get_payment_status(
     payment_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    wait: float = Query(0, ge=0, le=60, description="Long-poll: ждать смены статуса до N секунд"),
+    status: Optional[str] = Query(None, description="Статус, который уже известен клиенту (по умолчанию pending)")
 ):
-    """Получить статус платежа"""
+    """Получить статус платежа.
+    С ?wait=N ответ придёт, как только статус отличается от известного
+    клиенту (или через N секунд с текущим статусом).
+    """
     
-    payment = db.query(Payment).filter(
-        Payment.id == payment_id,
-        Payment.user_id == current_user.id
-    ).first()
+    user_id = current_user.id
     
-    if not payment:
-        raise HTTPException(status_code=404, detail="Платеж не найден")
+    def load():
+        return db.query(Payment).filter(
+            Payment.id == payment_id,
+            Payment.user_id == user_id
+        ).first()
+    
+    # Ожидание регистрируем до чтения, чтобы не пропустить смену статуса между ними
+    waiter = broker.waiter(payment_id) if wait else None
+    try:
+        payment = load()
+        
+        if not payment:
+            raise HTTPException(status_code=404, detail="Платеж не найден")
+        
+        if waiter is not None and payment.status == (status or "pending"):
+            # Возвращаем соединение в пул на время ожидания
+            db.rollback()
+            try:
+                await asyncio.wait_for(waiter, timeout=wait)
+            except asyncio.TimeoutError:
+                pass
+            payment = load()
+    finally:
+        if waiter is not None:
+            broker.discard(payment_id, waiter)
     
     return payment
\ No newline at end of file
@@ -1,9 +1,8 @@
 ﻿from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
-from sqlalchemy import func
 from app.database import SessionLocal
-from app.models import User, Service, Project, Message, Transaction
 from app.schemas import StatisticResponse
+from app.stats_service import get_dashboard_stats, format_rubles
 router = APIRouter(prefix="/api/stats", tags=["statistics"])
 def get_db():
     db = SessionLocal()
@@ -13,15 +12,14 @@ def get_db():
         db.close()
 @router.get("/", response_model=StatisticResponse)
 def get_statistics(db: Session = Depends(get_db)):
-    total_users = db.query(func.count(User.id)).scalar()
-    total_services = db.query(func.count(Service.id)).scalar()
-    total_projects = db.query(func.count(Project.id)).scalar()
-    total_messages = db.query(func.count(Message.id)).scalar()
-    total_transactions = db.query(func.count(Transaction.id)).scalar()
+    stats = get_dashboard_stats(db)
     return StatisticResponse(
-        total_users=total_users,
-        total_services=total_services,
-        total_projects=total_projects,
-        total_messages=total_messages,
-        total_transactions=total_transactions
+        total_users=stats["total_users"],
+        total_services=stats["total_services"],
+        total_projects=stats["total_projects"],
+        total_messages=stats["total_messages"],
+        total_transactions=stats["total_transactions"],
+        active_users=stats["active_users"],
+        revenue_today=format_rubles(stats["revenue_today"]),
+        revenue_month=format_rubles(stats["revenue_month"])
     )
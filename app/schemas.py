@@ -1,5 +1,5 @@
-﻿from pydantic import BaseModel
-from datetime import datetime
+﻿from pydantic import BaseModel, field_validator
+from datetime import datetime, date as Date
 from typing import Optional, List, Dict, Any
 
 # ============================================
@@ -138,4 +138,87 @@ class ClientStatistics(BaseModel):
     total_messages: int
     total_projects: int
     total_transactions: int
-    total_payments_sum: float
\ No newline at end of file
+    total_payments_sum: float
+    balance: int = 0  # копейки, из user_balances
+
+class ClientStatisticsItem(ClientStatistics):
+    """Статистика клиента в пакетном ответе"""
+    user_id: int
+
+# ============================================
+# ПАКЕТНЫЕ ОПЕРАЦИИ АДМИНА
+# ============================================
+
+class BulkProjectCategoryItem(BaseModel):
+    id: int
+    category: str
+
+class BulkProjectCategoryRequest(BaseModel):
+    """Перенос проектов между категориями архива"""
+    items: List[BulkProjectCategoryItem]
+    all_or_nothing: bool = False
+
+class BulkClientDetailsItem(ClientDetailsBase):
+    user_id: int
+
+class BulkClientDetailsRequest(BaseModel):
+    """Обновление реквизитов нескольких клиентов (передаются только изменяемые поля)"""
+    items: List[BulkClientDetailsItem]
+    all_or_nothing: bool = False
+
+class BulkServiceActiveItem(BaseModel):
+    id: int
+    is_active: bool
+
+class BulkServiceActiveRequest(BaseModel):
+    """Включение/выключение нескольких услуг"""
+    items: List[BulkServiceActiveItem]
+    all_or_nothing: bool = False
+
+class BulkItemResult(BaseModel):
+    id: int
+    status: str  # updated, created, unchanged, error
+    detail: Optional[str] = None
+
+# ============================================
+# ДОГОВОРЫ
+# ============================================
+
+def bare_file_name(value: Optional[str]) -> Optional[str]:
+    """Имя файла договора без каталогов: файл отдаётся публично по этому имени,
+    поэтому ../, абсолютные пути и скрытые файлы недопустимы"""
+    if value is None:
+        return value
+    value = value.strip()
+    if not value or value.startswith(".") or any(char in value for char in "/\\:\0"):
+        raise ValueError("Имя файла без каталогов: без /, \\, .. и точки в начале")
+    return value
+
+class ContractBase(BaseModel):
+    number: str
+    name: str
+    client: str
+    date: Date
+    amount: int
+    original_file: str
+    available_formats: List[str] = ["txt", "docx", "pdf", "xlsx"]
+    user_id: Optional[int] = None
+    project_id: Optional[int] = None
+
+    _original_file = field_validator("original_file")(bare_file_name)
+
+class ContractCreate(ContractBase):
+    pass
+
+class ContractUpdate(BaseModel):
+    number: Optional[str] = None
+    name: Optional[str] = None
+    client: Optional[str] = None
+    date: Optional[Date] = None
+    amount: Optional[int] = None
+    original_file: Optional[str] = None
+    available_formats: Optional[List[str]] = None
+    user_id: Optional[int] = None
+    project_id: Optional[int] = None
+
+    _original_file = field_validator("original_file")(bare_file_name)
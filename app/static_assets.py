@@ -0,0 +1,238 @@
+"""Сборка и раздача статики с отпечатками и предсжатыми вариантами.
+
+Сборка (при деплое, см. nixpacks.toml):
+
+    python -m app.static_assets build
+
+копирует css/js/… из app/static в ASSETS_DIR под именами с хэшем
+содержимого (css/style.css -> css/style.3f2a9c1b0d.css), рядом кладёт
+.gz и .br (если сжатие что-то даёт) и пишет
+manifest.json: {"css/style.css": "css/style.3f2a9c1b0d.css"}.
+
+В шаблонах адрес берётся через {{ asset_url('css/style.css') }}: после
+сборки — /assets/<имя с хэшем>, без сборки — прежний /static/... .
+
+/assets раздаёт AssetFiles: вариант .br/.gz по Accept-Encoding (с учётом
+q-значений: «br;q=0» — отказ от br),
+Vary: Accept-Encoding и Cache-Control immutable на год — имя меняется
+вместе с содержимым, так что перепроверять файл браузеру незачем.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import shutil
+import sys
+from typing import Dict, Iterable, Optional, Tuple
+
+import brotli
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+STATIC_DIR = os.path.join("app", "static")
+ASSETS_DIR = os.getenv("ASSETS_DIR", os.path.join("app", "static", "dist"))
+ASSETS_URL = "/assets"
+MANIFEST_NAME = "manifest.json"
+
+# Что собирать (договоры — не статика сайта)
+ASSET_EXTENSIONS = {".css", ".js", ".svg", ".png", ".jpg", ".jpeg", ".gif", ".webp", ".ico", ".woff", ".woff2"}
+SKIP_DIRS = {"contracts", "dist"}
+COMPRESSIBLE = {".css", ".js", ".svg", ".json"}
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+# Предпочтение кодировок: лучшая первая
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def select_encoding(accept_encoding: str, available: Iterable[str]) -> Optional[str]:
+    """Кодировка из available (в порядке предпочтения сервера), которую принимает
+    клиент: наибольшее q, при равных — первая; q=0 — запрет; «*» — все не
+    перечисленные. None — отдавать без сжатия"""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        if not coding:
+            continue
+        weight = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[coding.lower()] = weight
+    best, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+# ---------- сборка ----------
+
+def fingerprint(path: str, data: bytes) -> str:
+    root, ext = os.path.splitext(path)
+    return f"{root}.{hashlib.sha256(data).hexdigest()[:10]}{ext}"
+
+
+def build(source: str = STATIC_DIR, target: str = ASSETS_DIR) -> Dict[str, str]:
+    """Собрать статику в target заново; возвращает манифест"""
+    staging = f"{target}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    manifest: Dict[str, str] = {}
+    saved = 0
+    total = 0
+
+    for root, dirs, files in os.walk(source):
+        dirs[:] = sorted(d for d in dirs if d not in SKIP_DIRS and not d.startswith((".", "__")))
+        for name in sorted(files):
+            ext = os.path.splitext(name)[1].lower()
+            if ext not in ASSET_EXTENSIONS:
+                continue
+            path = os.path.join(root, name)
+            logical = os.path.relpath(path, source).replace(os.sep, "/")
+            with open(path, "rb") as f:
+                data = f.read()
+            built = fingerprint(logical, data)
+            manifest[logical] = built
+
+            output = os.path.join(staging, built)
+            os.makedirs(os.path.dirname(output), exist_ok=True)
+            with open(output, "wb") as f:
+                f.write(data)
+            total += len(data)
+
+            if ext in COMPRESSIBLE:
+                variants = [
+                    (".gz", gzip.compress(data, compresslevel=9, mtime=0)),
+                    (".br", brotli.compress(data, quality=11)),
+                ]
+                for suffix, compressed in variants:
+                    if len(compressed) < len(data):
+                        with open(output + suffix, "wb") as f:
+                            f.write(compressed)
+                best = min(len(compressed) for _, compressed in variants)
+                saved += max(len(data) - best, 0)
+
+    with open(os.path.join(staging, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(staging, target)
+    print(f"📦 Статика собрана: {len(manifest)} файлов, {total // 1024} КБ, сжатие экономит {saved // 1024} КБ")
+    return manifest
+
+
+# ---------- адреса в шаблонах ----------
+
+_manifest: Optional[Dict[str, str]] = None
+
+
+def load_manifest(directory: str = ASSETS_DIR) -> Dict[str, str]:
+    global _manifest
+    try:
+        with open(os.path.join(directory, MANIFEST_NAME), encoding="utf-8") as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(path: str) -> str:
+    """URL ассета: с отпечатком, если статика собрана, иначе /static/<path>"""
+    manifest = _manifest if _manifest is not None else load_manifest()
+    path = path.lstrip("/")
+    built = manifest.get(path)
+    if built:
+        return f"{ASSETS_URL}/{built}"
+    return f"/static/{path}"
+
+
+# ---------- раздача ----------
+
+class AssetFiles:
+    """ASGI-приложение для /assets: предсжатые варианты и immutable-кэширование.
+    Список файлов читается один раз при первом запросе (сборка — только при деплое)."""
+
+    def __init__(self, directory: str = ASSETS_DIR):
+        self.directory = directory
+        self._files: Optional[Dict[str, Tuple[str, Dict[str, str]]]] = None
+
+    def _scan(self) -> Dict[str, Tuple[str, Dict[str, str]]]:
+        """{путь: (файл, {кодировка: файл варианта})}"""
+        files = {}
+        for root, _, names in os.walk(self.directory):
+            present = set(names)
+            for name in names:
+                if name.endswith((".gz", ".br")) or name == MANIFEST_NAME:
+                    continue
+                path = os.path.join(root, name)
+                variants = {
+                    encoding: os.path.join(root, name + suffix)
+                    for encoding, suffix in ENCODINGS
+                    if name + suffix in present
+                }
+                files[os.path.relpath(path, self.directory).replace(os.sep, "/")] = (path, variants)
+        return files
+
+    def lookup(self, path: str, accept_encoding: str) -> Optional[Tuple[str, Optional[str], str]]:
+        """(файл для отдачи, Content-Encoding или None, исходный файл)"""
+        if self._files is None:
+            self._files = self._scan()
+        found = self._files.get(path)
+        if found is None:
+            return None
+        original, variants = found
+        encoding = select_encoding(accept_encoding, [encoding for encoding, _ in ENCODINGS if encoding in variants])
+        if encoding:
+            return variants[encoding], encoding, original
+        return original, None, original
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return
+        response: Response
+        if scope["method"] not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405)
+            await response(scope, receive, send)
+            return
+
+        # Starlette до 0.33 отдаёт в path остаток после префикса монтирования, новее — полный путь
+        path = scope["path"]
+        root_path = scope.get("root_path", "")
+        if root_path and path.startswith(root_path):
+            path = path[len(root_path):]
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        found = self.lookup(path.lstrip("/"), headers.get("accept-encoding", ""))
+        if found is None:
+            response = PlainTextResponse("Not Found", status_code=404)
+            await response(scope, receive, send)
+            return
+
+        file_path, encoding, original = found
+        # Имя содержит хэш содержимого — из него и ETag (у каждого варианта свой)
+        etag = f'"{os.path.basename(original)}{"-" + encoding if encoding else ""}"'
+        response_headers = {"Cache-Control": IMMUTABLE, "Vary": "Accept-Encoding", "ETag": etag}
+        if etag in [tag.strip() for tag in headers.get("if-none-match", "").split(",")]:
+            response = Response(status_code=304, headers=response_headers)
+        else:
+            if encoding:
+                response_headers["Content-Encoding"] = encoding
+            response = FileResponse(
+                file_path,
+                media_type=mimetypes.guess_type(original)[0] or "application/octet-stream",
+                headers=response_headers,
+                method=scope["method"]
+            )
+        await response(scope, receive, send)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["build"]:
+        build()
+        sys.exit(0)
+    print("Использование: python -m app.static_assets build")
+    sys.exit(2)
@@ -0,0 +1,123 @@
+"""Общая статистика для дашбордов.
+
+Все счётчики (/api/stats/, /api/admin/stats, /api/admin/archive/stats,
+/api/admin/transactions/stats) читаются по ключу из таблиц counters и
+daily_rollups (см. app/counters.py, app/rollups.py) и кэшируются на
+STATS_CACHE_TTL секунд.
+Пересчёт single-flight: пока один запрос считает, остальные ждут его результат.
+Async-обработчики ждут и считают в пуле потоков (get_dashboard_stats_async),
+чтобы холодный кэш не останавливал event loop.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app.counters import read_counters
+from app.rollups import read_range
+
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "10"))
+
+PROJECT_STATUSES = ["pending", "in_progress", "completed", "cancelled"]
+
+
+class TTLCache:
+    """Кэш с TTL и single-flight пересчётом по ключу"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._values: Dict[str, tuple] = {}  # key -> (expires_at, value)
+        self._locks: Dict[str, threading.Lock] = {}
+        self._guard = threading.Lock()
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._guard:
+            lock = self._locks.get(key)
+            if lock is None:
+                lock = self._locks[key] = threading.Lock()
+            return lock
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any]) -> Any:
+        entry = self._values.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+
+        with self._lock_for(key):
+            # Пока ждали блокировку, значение мог посчитать другой запрос
+            entry = self._values.get(key)
+            if entry and entry[0] > time.monotonic():
+                return entry[1]
+            value = compute()
+            self._values[key] = (time.monotonic() + self.ttl, value)
+            return value
+
+    async def get_or_compute_async(self, key: str, compute: Callable[[], Any]) -> Any:
+        """get_or_compute для async-кода: свежее значение — сразу, иначе
+        ожидание блокировки и пересчёт идут в пуле потоков"""
+        entry = self._values.get(key)
+        if entry and entry[0] > time.monotonic():
+            return entry[1]
+        return await run_in_threadpool(self.get_or_compute, key, compute)
+
+    def invalidate(self, key: str = None):
+        if key is None:
+            self._values.clear()
+        else:
+            self._values.pop(key, None)
+
+
+stats_cache = TTLCache(STATS_CACHE_TTL)
+
+
+def compute_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """Итоги из counters + окна по дням из daily_rollups (два чтения по ключу)"""
+    today = datetime.utcnow().date()
+    thirty_days_ago = today - timedelta(days=30)
+    month_start = today.replace(day=1)
+
+    names = [
+        "users_total", "services_total", "projects_total", "messages_total",
+        "transactions_total", "transactions_amount_total",
+    ] + [f"projects_status:{status}" for status in PROJECT_STATUSES]
+    counters = read_counters(db, names)
+
+    days = read_range(db, min(thirty_days_ago, month_start), today)
+
+    def window_sum(metric, since):
+        return sum(values[metric] for day, values in days.items() if day >= since)
+
+    return {
+        "total_users": counters["users_total"],
+        "active_users": window_sum("new_users", thirty_days_ago),
+        "total_services": counters["services_total"],
+        "total_projects": counters["projects_total"],
+        "projects_by_status": {
+            status: counters[f"projects_status:{status}"]
+            for status in PROJECT_STATUSES
+        },
+        "total_messages": counters["messages_total"],
+        "total_transactions": counters["transactions_total"],
+        "total_revenue": counters["transactions_amount_total"],
+        "last_month_revenue": window_sum("transactions_amount", thirty_days_ago),
+        "revenue_today": window_sum("revenue", today),
+        "revenue_month": window_sum("revenue", month_start),
+    }
+
+
+def format_rubles(kopecks: int) -> str:
+    """12345 коп. -> '123,5' (формат StatisticResponse)"""
+    return f"{kopecks / 100:.1f}".replace(".", ",")
+
+
+def get_dashboard_stats(db: Session) -> Dict[str, Any]:
+    """Статистика из кэша (пересчёт не чаще раза в STATS_CACHE_TTL)"""
+    return stats_cache.get_or_compute("dashboard", lambda: compute_dashboard_stats(db))
+
+
+async def get_dashboard_stats_async(db: Session) -> Dict[str, Any]:
+    """get_dashboard_stats для async-обработчиков"""
+    return await stats_cache.get_or_compute_async("dashboard", lambda: compute_dashboard_stats(db))
@@ -0,0 +1,72 @@
+"""Кэш проверенных JWT-токенов.
+
+Подпись токена проверяется один раз, дальше claims берутся из памяти
+до истечения `exp`. Ключ кэша — SHA-256 от токена, сами токены не хранятся.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Any
+
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError
+
+
+class VerifiedTokenCache:
+    """LRU-кэш claims проверенных токенов с ограничением по размеру"""
+
+    def __init__(self, secret_key: str, algorithm: str, maxsize: int = 10000):
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, tuple]" = OrderedDict()  # digest -> (claims, exp)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def decode(self, token: str) -> Dict[str, Any]:
+        """Вернуть claims токена; ошибки те же, что у jose.jwt.decode"""
+        key = hashlib.sha256(token.encode("utf-8")).digest()
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                claims, exp = entry
+                if exp > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(claims)
+                # Токен истёк — выкидываем и отвечаем как jose
+                del self._entries[key]
+                raise ExpiredSignatureError("Signature has expired.")
+
+        claims = jwt.decode(token, self.secret_key, algorithms=[self.algorithm])
+
+        exp = claims.get("exp")
+        if not isinstance(exp, (int, float)):
+            # Без exp нельзя ограничить срок жизни записи — не кэшируем
+            return claims
+
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = (dict(claims), float(exp))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+        return claims
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
@@ -0,0 +1,283 @@
+"""Входящие вебхуки платёжной системы (inbox).
+
+Эндпоинт /api/payments/webhook только сохраняет сырое событие в таблицу
+webhook_events и сразу отвечает 200. Уникальный ключ event_id отсекает
+повторные доставки одного события ещё на вставке.
+
+Применяет события фоновый обработчик (start_worker при старте приложения):
+- не больше WEBHOOK_WORKER_CONCURRENCY событий одновременно;
+- событие «арендуется» условным UPDATE, поэтому несколько процессов
+  не возьмут одно и то же; после падения процесса аренда истекает
+  и событие подхватывается снова;
+- при ошибке — повтор с экспоненциальной задержкой, после
+  WEBHOOK_MAX_ATTEMPTS попыток событие помечается failed;
+- сама смена статуса платежа идемпотентна (app/billing.py).
+
+Тело вебхука не аутентифицировано: id платежа клиент получает из
+initiate_payment и может прислать событие сам. Поэтому с живым провайдером
+событие только подсказывает, какой платёж перечитать: статус берётся из
+provider.get_payment, как при сверке (app/payment_reconciliation.py).
+Тип события из тела применяется только в тестовом режиме, где спросить
+провайдера не у кого.
+
+Нагрузочная проверка (повтор вебхуков, только тестовый режим):
+python -m benchmarks.webhook_replay
+"""
+import asyncio
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from app import billing
+from app.models import Payment, WebhookEvent
+from app.payment_providers import PaymentProvider, ProviderError, get_provider
+from app.payment_reconciliation import FINAL_OUTCOMES
+
+WEBHOOK_WORKER_CONCURRENCY = int(os.getenv("WEBHOOK_WORKER_CONCURRENCY", "4"))
+WEBHOOK_MAX_ATTEMPTS = int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8"))
+WEBHOOK_RETRY_BASE = float(os.getenv("WEBHOOK_RETRY_BASE", "2"))  # секунды
+WEBHOOK_RETRY_MAX = float(os.getenv("WEBHOOK_RETRY_MAX", "600"))
+WEBHOOK_POLL_INTERVAL = float(os.getenv("WEBHOOK_POLL_INTERVAL", "5"))
+WEBHOOK_LEASE = float(os.getenv("WEBHOOK_LEASE", "60"))
+BATCH_SIZE = 100
+
+# Тип события из тела -> что делаем с платежом (только тестовый режим)
+EVENT_OUTCOMES = {"payment.succeeded": "succeeded", "payment.canceled": "canceled"}
+
+
+class NotReady(Exception):
+    """Событие пока нельзя применить (например, платёж ещё не записан) — повторить позже"""
+
+
+# ---------- приём ----------
+
+def event_key(body: dict) -> str:
+    """Идентификатор события у провайдера.
+
+    ЮKassa не присылает отдельный id уведомления: одно событие — это пара
+    (тип, id объекта). Если id есть в теле, берём его.
+    """
+    if body.get("id"):
+        return str(body["id"])
+    payment_ref = (body.get("object") or {}).get("id")
+    if body.get("event") and payment_ref:
+        return f"{body['event']}:{payment_ref}"
+    raw = json.dumps(body, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return "sha256:" + hashlib.sha256(raw).hexdigest()
+
+
+def store_event(db: Session, body: dict) -> bool:
+    """Сохранить событие в inbox. False — такое событие уже было"""
+    db.add(WebhookEvent(
+        event_id=event_key(body),
+        event_type=body.get("event"),
+        payment_ref=(body.get("object") or {}).get("id"),
+        payload=body,
+        status="pending",
+        next_attempt_at=datetime.utcnow()
+    ))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        return False
+    wake_worker()
+    return True
+
+
+# ---------- применение ----------
+
+def apply_event(db: Session, event: WebhookEvent, provider_status: Optional[str] = None):
+    """Применить событие к платежу (в транзакции db, без commit).
+    provider_status — статус, перечитанный у живого провайдера: тогда
+    применяется только он, тип события из тела не учитывается"""
+    if not event.payment_ref:
+        return
+    if provider_status is not None:
+        outcome = FINAL_OUTCOMES.get(provider_status)
+    else:
+        outcome = EVENT_OUTCOMES.get(event.event_type)
+
+    condition = Payment.transaction_id == event.payment_ref
+    if outcome == "succeeded":
+        if billing.mark_payment_succeeded(db, condition) is None and not _payment_exists(db, condition):
+            raise NotReady(f"платёж {event.payment_ref} не найден")
+    elif outcome == "canceled":
+        if not billing.mark_payment_canceled(db, condition) and not _payment_exists(db, condition):
+            raise NotReady(f"платёж {event.payment_ref} не найден")
+    # Остальные статусы (pending, waiting_for_capture, not_found) — просто отмечаем
+
+
+def _payment_exists(db: Session, condition) -> bool:
+    return db.scalar(select(Payment.id).where(condition)) is not None
+
+
+def retry_delay(attempts: int) -> float:
+    return min(WEBHOOK_RETRY_BASE * (2 ** max(attempts - 1, 0)), WEBHOOK_RETRY_MAX)
+
+
+def _lease(db: Session, event_id: int) -> Optional[WebhookEvent]:
+    """Взять событие в работу; None — его уже взял другой обработчик"""
+    now = datetime.utcnow()
+    result = db.execute(
+        update(WebhookEvent)
+        .where(
+            WebhookEvent.id == event_id,
+            WebhookEvent.status == "pending",
+            WebhookEvent.next_attempt_at <= now
+        )
+        .values(
+            attempts=WebhookEvent.attempts + 1,
+            next_attempt_at=now + timedelta(seconds=WEBHOOK_LEASE)
+        )
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    if result.rowcount != 1:
+        return None
+    return db.get(WebhookEvent, event_id, populate_existing=True)
+
+
+def provider_status_reader(provider: PaymentProvider, loop: asyncio.AbstractEventLoop) -> Optional[Callable[[str], str]]:
+    """Чтение статуса у живого провайдера из потока обработчика (запрос идёт
+    через общий пул соединений в event loop). В тестовом режиме — None"""
+    if provider.test_mode:
+        return None
+
+    def read(payment_ref: str) -> str:
+        future = asyncio.run_coroutine_threadsafe(provider.get_payment(payment_ref), loop)
+        try:
+            return future.result().status
+        except ProviderError as e:
+            if e.status_code == 404:
+                return "not_found"
+            raise
+
+    return read
+
+
+def process_event(event_id: int, session_factory=None,
+                  read_status: Optional[Callable[[str], str]] = None) -> Optional[str]:
+    """Обработать одно событие; возвращает новый статус или None, если не взяли.
+    read_status — чтение статуса у провайдера (живой режим, см. provider_status_reader)"""
+    if session_factory is None:
+        from app.database import SessionLocal as session_factory
+
+    db = session_factory()
+    try:
+        event = _lease(db, event_id)
+        if event is None:
+            return None
+
+        try:
+            provider_status = None
+            if read_status is not None and event.payment_ref:
+                payment_ref = event.payment_ref
+                db.commit()  # во время запроса к провайдеру транзакция не открыта
+                provider_status = read_status(payment_ref)
+            apply_event(db, event, provider_status)
+            event.status = "done"
+            event.processed_at = datetime.utcnow()
+            event.last_error = None
+            db.commit()
+            return "done"
+        except Exception as e:
+            db.rollback()
+            event = db.get(WebhookEvent, event_id)
+            event.last_error = f"{type(e).__name__}: {e}"[:2000]
+            if event.attempts >= WEBHOOK_MAX_ATTEMPTS:
+                event.status = "failed"
+                print(f"❌ Вебхук {event.event_id} не применён после {event.attempts} попыток: {e}")
+            else:
+                event.next_attempt_at = datetime.utcnow() + timedelta(seconds=retry_delay(event.attempts))
+            db.commit()
+            return event.status
+    finally:
+        db.close()
+
+
+def due_events(db: Session, limit: int = BATCH_SIZE):
+    return db.scalars(
+        select(WebhookEvent.id)
+        .where(WebhookEvent.status == "pending", WebhookEvent.next_attempt_at <= datetime.utcnow())
+        .order_by(WebhookEvent.next_attempt_at, WebhookEvent.id)
+        .limit(limit)
+    ).all()
+
+
+# ---------- фоновый обработчик ----------
+
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+_task: Optional[asyncio.Task] = None
+
+
+def wake_worker():
+    """Разбудить обработчик (можно звать из потока)"""
+    if _loop is not None and _wakeup is not None:
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+async def run_worker(session_factory=None):
+    global _wakeup, _loop
+    if session_factory is None:
+        from app.database import SessionLocal as session_factory
+
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    semaphore = asyncio.Semaphore(WEBHOOK_WORKER_CONCURRENCY)
+
+    async def handle(event_id, read_status):
+        async with semaphore:
+            await run_in_threadpool(process_event, event_id, session_factory, read_status)
+
+    def fetch():
+        db = session_factory()
+        try:
+            return due_events(db)
+        finally:
+            db.close()
+
+    while True:
+        _wakeup.clear()
+        try:
+            ids = await run_in_threadpool(fetch)
+            if ids:
+                read_status = provider_status_reader(get_provider(), _loop)
+                await asyncio.gather(*[handle(event_id, read_status) for event_id in ids])
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"❌ Ошибка обработчика вебхуков: {e}")
+
+        try:
+            await asyncio.wait_for(_wakeup.wait(), timeout=WEBHOOK_POLL_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_worker():
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(run_worker())
+    return _task
+
+
+async def stop_worker():
+    global _task
+    if _task is not None:
+        _task.cancel()
+        try:
+            await _task
+        except asyncio.CancelledError:
+            pass
+        _task = None
+
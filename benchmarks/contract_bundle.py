@@ -0,0 +1,72 @@
+"""Потоковый ZIP договоров (app/contract_bundle.py) с постоянной памятью.
+
+Файлы из несжимаемых данных (худший случай) пишутся во временный каталог и
+упаковываются stream_zip; пик памяти Python (tracemalloc) не должен
+зависеть от объёма архива:
+
+    python -m benchmarks.contract_bundle --mb 300 --files 30
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import List, Tuple
+
+from app.contract_bundle import stream_zip
+
+PEAK_LIMIT = 16 * 1024 * 1024
+
+
+def make_files(directory: str, files: int, per_file_mb: int) -> List[Tuple[str, str]]:
+    """files файлов по per_file_mb МБ случайных байт; пары (имя в архиве, путь)"""
+    block = os.urandom(1024 * 1024)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"ДОГ-{i:04d}.pdf")
+        with open(path, "wb") as f:
+            for _ in range(per_file_mb):
+                f.write(block)
+        paths.append((os.path.basename(path), path))
+    return paths
+
+
+def bundle_peak(paths: List[Tuple[str, str]], compresslevel: int = 1):
+    """(байт архива, пик памяти, самый большой кусок ответа)"""
+    written = largest = 0
+    tracemalloc.start()
+    try:
+        for data in stream_zip(paths, compresslevel=compresslevel):
+            written += len(data)
+            largest = max(largest, len(data))
+        return written, tracemalloc.get_traced_memory()[1], largest
+    finally:
+        tracemalloc.stop()
+
+
+def run(total_mb: int, files: int) -> int:
+    per_file = max(total_mb // files, 1)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = make_files(directory, files, per_file)
+        started = time.perf_counter()
+        written, peak, largest = bundle_peak(paths)
+        elapsed = time.perf_counter() - started
+
+    source_mb = per_file * files
+    print(f"📦 Архив: {files} файлов, {source_mb} МБ -> {written / 1024 / 1024:.0f} МБ за {elapsed:.1f} с "
+          f"({source_mb / elapsed:.0f} МБ/с)")
+    print(f"   пик памяти Python: {peak / 1024 / 1024:.1f} МБ, самый большой кусок ответа: {largest // 1024} КБ")
+    if peak > PEAK_LIMIT:
+        print(f"❌ Пик памяти больше {PEAK_LIMIT // 1024 // 1024} МБ — архив где-то буферизуется")
+        return 1
+    print("✅ Память постоянна")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пик памяти потокового ZIP договоров")
+    parser.add_argument("--mb", type=int, default=300)
+    parser.add_argument("--files", type=int, default=30)
+    args = parser.parse_args()
+    sys.exit(run(args.mb, args.files))
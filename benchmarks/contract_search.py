@@ -0,0 +1,110 @@
+"""Поиск по договорам (app/contract_search.py) на синтетическом корпусе:
+построение индекса, сохранение и загрузка, задержка поиска, переиндексация.
+
+    python -m benchmarks.contract_search --docs 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.contract_search import ContractSearchIndex
+from benchmarks.support import percentile
+
+SUBJECTS = [
+    "разработка веб-портала", "мобильное приложение", "автоматизация отчетности", "SEO-оптимизация",
+    "разработка LMS", "система управления складом", "интеграция с 1С", "техническая поддержка",
+    "аудит информационной безопасности", "миграция базы данных", "чат-бот для клиентов",
+    "интернет-магазин", "CRM-система", "аналитическая платформа", "обучение персонала",
+]
+CLIENTS = ["ООО", "АО", "ИП", "ЧУ ДПО", "ПАО", "ЗАО"]
+NAMES = [
+    "ТехноПром", "СтройИнвест", "МедиаГрупп", "ЛогистикПро", "Образование+", "АгроТорг", "ФинКонсалт",
+    "ТрансСервис", "ЭнергоСбыт", "Вектор", "Альфа", "Гранит", "Северный ветер", "Меридиан",
+]
+CLAUSES = [
+    "Исполнитель обязуется выполнить работы в установленные сроки",
+    "Заказчик обязуется принять и оплатить выполненные работы",
+    "Поэтапная оплата согласно календарному плану",
+    "Предоплата составляет тридцать процентов от суммы договора",
+    "Гарантийный срок на результаты работ составляет двенадцать месяцев",
+    "Стороны несут ответственность в соответствии с законодательством",
+    "Споры разрешаются путем переговоров, а при недостижении согласия в арбитражном суде",
+    "Исполнитель вправе привлекать субподрядчиков по согласованию с заказчиком",
+    "Конфиденциальная информация не подлежит разглашению третьим лицам",
+    "Приемка работ оформляется актом сдачи-приемки",
+    "Договор вступает в силу с момента подписания сторонами",
+    "Техническое задание является неотъемлемой частью договора",
+    "Исключительные права на программный код переходят к заказчику",
+    "Сопровождение системы осуществляется в течение одного года",
+]
+QUERIES = ["гарантийный срок", "СтройИнвест", "арбитражный суд", "мобильного приложения",
+           "субподрядчики заказчика", "интеграция 1С", "конфиденциальность информации",
+           "сопровождение системы", "ДОГ-2024", "акт приемки работ"]
+
+
+def document(i: int, rng: random.Random) -> str:
+    subject = rng.choice(SUBJECTS)
+    client = f"{rng.choice(CLIENTS)} '{rng.choice(NAMES)}'"
+    clauses = rng.sample(CLAUSES, rng.randint(3, 7))
+    return "\n".join([
+        f"ДОГОВОР № ДОГ-{rng.randint(2020, 2026)}-{i:06d}",
+        f"Предмет: {subject.capitalize()}",
+        f"Заказчик: {client}",
+        f"Сумма: {rng.randint(50, 5000) * 1000} руб.",
+        "УСЛОВИЯ ДОГОВОРА:",
+        *[f"{n}. {clause}" for n, clause in enumerate(clauses, start=1)],
+        "Подписи сторон:",
+    ])
+
+
+def run(docs: int) -> int:
+    rng = random.Random(42)
+    corpus = [document(i, rng) for i in range(docs)]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = ContractSearchIndex(path=os.path.join(directory, "index.pickle"))
+
+        started = time.perf_counter()
+        for i, text in enumerate(corpus):
+            index.add(i, text, "v1")
+        build = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.save()
+        save = time.perf_counter() - started
+        file_size = os.path.getsize(index.path)
+
+        loaded = ContractSearchIndex(path=index.path)
+        started = time.perf_counter()
+        loaded.load()
+        load = time.perf_counter() - started
+
+        latencies = []
+        for _ in range(5):
+            for query in QUERIES:
+                started = time.perf_counter()
+                loaded.search(query, limit=20)
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        for i in range(min(1000, docs)):
+            loaded.add(i, corpus[i] + "\nДополнительное соглашение", "v2")
+        update = time.perf_counter() - started
+
+    postings = sum(len(doc_ids) for doc_ids, _ in index.postings.values())
+    print(f"🔎 Корпус: {docs} договоров, терминов: {len(index.postings)}, постингов: {postings}")
+    print(f"   построение: {build:.1f} с ({docs / build:.0f} док/с), сохранение: {save:.2f} с, "
+          f"файл: {file_size / 1024 / 1024:.1f} МБ, загрузка: {load:.2f} с")
+    print(f"   поиск: p50 {percentile(latencies, 0.5) * 1000:.1f} мс, p95 {percentile(latencies, 0.95) * 1000:.1f} мс")
+    print(f"   переиндексация {min(1000, docs)} договоров: {update:.2f} с")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Построение индекса и задержка поиска по договорам")
+    parser.add_argument("--docs", type=int, default=100000)
+    args = parser.parse_args()
+    sys.exit(run(args.docs))
@@ -0,0 +1,79 @@
+"""Выгрузка 1M транзакций в CSV и XLSX с постоянной памятью.
+
+Строки генерируются во временной SQLite и выгружаются тем же путём, что и
+эндпоинт (iter_rows -> stream_csv / stream_xlsx); пик памяти Python
+(tracemalloc) меряется на rows/10 и rows строк и не должен расти:
+
+    python -m benchmarks.exports --rows 1000000
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import models
+from app.routers.exports import build_query, iter_rows, stream_csv
+from app.xlsx_writer import stream_xlsx
+from benchmarks.support import temporary_database
+
+PEAK_LIMIT = 16 * 1024 * 1024
+
+
+def fill_transactions(engine, rows: int, batch: int = 10000):
+    table = models.Transaction.__table__
+    created = datetime(2026, 1, 1)
+    with engine.begin() as conn:
+        for offset in range(0, rows, batch):
+            conn.execute(insert(table), [
+                {"user_id": i % 5000 + 1, "project_id": None, "amount": i % 100000,
+                 "currency": "RUB", "status": ("completed", "pending", "failed")[i % 3],
+                 "created_at": created + timedelta(seconds=i)}
+                for i in range(offset, min(offset + batch, rows))
+            ])
+
+
+def export_peak(format: str, count: int):
+    """(байт выгружено, пик памяти) для первых count транзакций"""
+    query, columns = build_query("transactions", None, None, None)
+    tracemalloc.start()
+    try:
+        rows = iter_rows(query.limit(count))
+        chunks = (stream_xlsx(columns, rows, sheet_name="transactions") if format == "xlsx"
+                  else stream_csv(columns, rows, ";"))
+        written = sum(len(data) for data in chunks)
+        return written, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def run(rows: int) -> int:
+    failed = 0
+    with temporary_database() as engine:
+        started = time.perf_counter()
+        fill_transactions(engine, rows)
+        print(f"🧪 Сгенерировано {rows} транзакций за {time.perf_counter() - started:.1f} с")
+
+        for format in ("csv", "xlsx"):
+            peaks = []
+            for count in (max(rows // 10, 1), rows):
+                started = time.perf_counter()
+                written, peak = export_peak(format, count)
+                peaks.append(peak)
+                print(f"   {format}: {count} строк -> {written / 1024 / 1024:.0f} МБ "
+                      f"за {time.perf_counter() - started:.1f} с, пик памяти {peak / 1024 / 1024:.1f} МБ")
+            if peaks[-1] > PEAK_LIMIT or peaks[-1] > peaks[0] * 2 + 1024 * 1024:
+                print(f"❌ {format}: пик памяти растёт с числом строк")
+                failed += 1
+    if not failed:
+        print("✅ Память постоянна")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Пик памяти выгрузки CSV/XLSX")
+    parser.add_argument("--rows", type=int, default=1000000)
+    args = parser.parse_args()
+    sys.exit(run(args.rows))
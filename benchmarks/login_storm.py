@@ -0,0 +1,97 @@
+"""Задержка чата во время шторма входов: bcrypt в пуле потоков против bcrypt
+прямо в event loop (как было до app.passwords).
+
+Логины и запросы чата делят один event loop, как в одном воркере uvicorn.
+Пользователь создаётся во временной SQLite — рабочая БД не трогается.
+
+    python -m benchmarks.login_storm --logins 40 --concurrency 8
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import sys
+import time
+from typing import List, Tuple
+
+from benchmarks.support import asgi_request, percentile, temporary_database
+
+EMAIL, PASSWORD = "bench-login@example.com", "bench-password-1"
+
+
+async def chat_latencies(app, stop: asyncio.Event) -> List[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asgi_request(app, "GET", "/api/chat/stats/total")
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(0.01)
+    return latencies
+
+
+async def storm(app, logins: int, concurrency: int) -> list:
+    # Вход держит сессию БД на время проверки пароля — параллельность не выше пула соединений
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await asgi_request(app, "POST", "/api/auth/login", {"email": EMAIL, "password": PASSWORD})
+            return response["status"]
+
+    return await asyncio.gather(*(one() for _ in range(logins)))
+
+
+async def scenario(app, logins: int, concurrency: int) -> Tuple[list, list, float]:
+    idle_stop = asyncio.Event()
+    idle_task = asyncio.create_task(chat_latencies(app, idle_stop))
+    await asyncio.sleep(0.5)
+    idle_stop.set()
+    idle = await idle_task
+
+    stop = asyncio.Event()
+    probe = asyncio.create_task(chat_latencies(app, stop))
+    started = time.perf_counter()
+    statuses = await storm(app, logins, concurrency)
+    elapsed = time.perf_counter() - started
+    stop.set()
+    loaded = await probe
+    assert all(status == 200 for status in statuses), sorted(set(statuses))
+    return idle, loaded, elapsed
+
+
+def run(logins: int, concurrency: int) -> int:
+    from app.main import app
+    from app.passwords import BCRYPT_ROUNDS, password_hasher
+    from app.rate_limit import rate_limiter
+
+    async def inline_run(fn, *args):
+        return fn(*args)
+
+    rate_limiter.enabled = False  # шторм с одного адреса иначе упрётся в лимит
+    results = []
+    with temporary_database(), contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(asgi_request(app, "POST", "/api/auth/register",
+                                 {"email": EMAIL, "password": PASSWORD, "name": "Bench"}))
+        results.append(("пул потоков", asyncio.run(scenario(app, logins, concurrency))))
+        pooled_run = password_hasher._run
+        password_hasher._run = inline_run
+        try:
+            results.append(("в event loop", asyncio.run(scenario(app, logins, concurrency))))
+        finally:
+            password_hasher._run = pooled_run
+
+    print(f"bcrypt rounds={BCRYPT_ROUNDS}, воркеров {password_hasher.workers}, параллельно входов {concurrency}")
+    for label, (idle, loaded, elapsed) in results:
+        print(f"{label}: {logins} входов за {elapsed:.1f} с; чат без нагрузки p50 {percentile(idle, 0.5) * 1000:.1f} мс, "
+              f"под штормом p50 {percentile(loaded, 0.5) * 1000:.1f} мс, p95 {percentile(loaded, 0.95) * 1000:.1f} мс, "
+              f"max {max(loaded) * 1000:.0f} мс ({len(loaded)} запросов, среднее {statistics.mean(loaded) * 1000:.1f} мс)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Задержка чата во время шторма входов")
+    parser.add_argument("--logins", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    args = parser.parse_args()
+    sys.exit(run(args.logins, args.concurrency))
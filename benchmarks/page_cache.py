@@ -0,0 +1,57 @@
+"""Запросов в секунду на публичную страницу без кэша и с кэшем
+(app/page_cache.py). ASGI-приложение вызывается напрямую, без сети и
+клиента — меряется только работа сервера; БД — временная SQLite.
+
+    python -m benchmarks.page_cache --requests 2000 --path /
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import sys
+import time
+
+from benchmarks.support import asgi_request, temporary_database
+
+HEADERS = {"Accept-Encoding": "br, gzip"}
+
+
+async def serve(app, path: str, count: int) -> dict:
+    for _ in range(count):
+        response = await asgi_request(app, "GET", path, headers=HEADERS)
+        assert response["status"] == 200, response["status"]
+    return response
+
+
+def run(requests: int, path: str) -> int:
+    from app.main import app
+    from app.page_cache import PAGE_CACHE_ENABLED, page_cache
+
+    results = {}
+    with temporary_database():
+        try:
+            for label, enabled in (("без кэша", False), ("с кэшем", True)):
+                page_cache.enabled = enabled
+                page_cache.invalidate()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    asyncio.run(serve(app, path, 50))
+                    started = time.perf_counter()
+                    response = asyncio.run(serve(app, path, requests))
+                    elapsed = time.perf_counter() - started
+                results[label] = requests / elapsed
+                encoding = response["headers"].get("content-encoding", "identity")
+                print(f"{label}: {results[label]:.0f} запр/с ({elapsed * 1_000_000 / requests:.0f} мкс на запрос), "
+                      f"{encoding}, {response['size']} байт")
+        finally:
+            page_cache.enabled = PAGE_CACHE_ENABLED
+            page_cache.invalidate()
+    print(f"ускорение: x{results['с кэшем'] / results['без кэша']:.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Запросов в секунду на страницу без кэша и с кэшем")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--path", default="/")
+    args = parser.parse_args()
+    sys.exit(run(args.requests, args.path))
@@ -0,0 +1,60 @@
+"""Пропускная способность и задержка платёжного провайдера: count платежей
+(и запрос статуса у живого провайдера) через create_provider().
+
+Провайдер выбирается как в приложении (PAYMENT_PROVIDER и YOOKASSA_*); для
+замера без ЮKassa — локальный фейк, см. app/payment_providers.py:
+
+    python -m benchmarks.payment_provider --count 2000 --concurrency 50
+"""
+import argparse
+import asyncio
+import sys
+import time
+import uuid
+
+from app.payment_providers import ProviderError, create_provider
+from benchmarks.support import percentile
+
+
+async def bench(count: int, concurrency: int) -> int:
+    provider = create_provider()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                created = await provider.create_payment(
+                    10000, "RUB", f"bench {i}", "http://localhost/return",
+                    {"bench": i}, idempotence_key=str(uuid.uuid4())
+                )
+                if not provider.test_mode:
+                    await provider.get_payment(created.id)
+            except ProviderError:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*[one(i) for i in range(count)])
+    finally:
+        await provider.close()
+    elapsed = time.perf_counter() - started
+
+    print(f"💳 {provider.name}: {count} платежей за {elapsed:.2f} с ({count / elapsed:.0f}/с), ошибок: {errors}")
+    if latencies:
+        print(f"   задержка create+get: p50={percentile(latencies, 0.5) * 1000:.1f} мс "
+              f"p95={percentile(latencies, 0.95) * 1000:.1f} мс p99={percentile(latencies, 0.99) * 1000:.1f} мс")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочная проверка платёжного провайдера")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(bench(args.count, args.concurrency)))
@@ -0,0 +1,50 @@
+"""Накладные расходы RateLimiter.check на запрос (бэкенд в памяти процесса).
+
+    python -m benchmarks.rate_limit --requests 100000
+"""
+import argparse
+import asyncio
+import sys
+import time
+
+from fastapi import Request
+
+from app.rate_limit import InMemoryRateLimitBackend, RateLimiter
+
+
+def run(requests: int) -> int:
+    limiter = RateLimiter(InMemoryRateLimitBackend(), {"login": {"ip": (20, 60), "failures": (5, 60)}},
+                          trust_proxy=True)
+    prepared = [
+        Request({"type": "http", "method": "POST", "path": "/api/auth/login", "query_string": b"",
+                 "headers": [(b"x-forwarded-for", f"198.51.{i // 250 % 250}.{i % 250}".encode())],
+                 "client": ("10.1.0.1", 40000)})
+        for i in range(requests)
+    ]
+
+    async def checks(items):
+        for number, request in enumerate(items):
+            email = f"user{number}@example.com"
+            await limiter.check("login", request)
+            await limiter.check_failures("login", request, email)
+
+    async def empty(items):
+        for number, request in enumerate(items):
+            email = f"user{number}@example.com"
+
+    started = time.perf_counter()
+    asyncio.run(checks(prepared))
+    elapsed = time.perf_counter() - started
+    started = time.perf_counter()
+    asyncio.run(empty(prepared))
+    loop_only = time.perf_counter() - started
+    print(f"check + check_failures: {(elapsed - loop_only) / requests * 1_000_000:.2f} мкс на вход "
+          f"({requests} запросов, {limiter.backend.size()} ключей в памяти)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Накладные расходы лимита частоты на запрос")
+    parser.add_argument("--requests", type=int, default=100000)
+    args = parser.parse_args()
+    sys.exit(run(args.requests))
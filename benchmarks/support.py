@@ -0,0 +1,70 @@
+"""Общее для замеров: временная SQLite вместо БД из DATABASE_URL и вызов
+ASGI-приложения напрямую, без сети и клиента.
+
+Замеры запускаются из корня проекта: python -m benchmarks.<имя>
+"""
+import json
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from typing import Optional
+
+from sqlalchemy import create_engine
+
+from app import database, models  # noqa: F401 — модели регистрируются в Base
+
+
+@contextmanager
+def temporary_database():
+    """Временная SQLite на время замера: все сессии приложения (SessionLocal,
+    get_db роутеров) и database.engine смотрят в неё; рабочая БД не трогается"""
+    directory = tempfile.mkdtemp(prefix="bench-db-")
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}",
+                           connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(engine)
+    saved_engine = database.engine
+    database.SessionLocal.configure(bind=engine)
+    database.engine = engine
+    try:
+        yield engine
+    finally:
+        database.SessionLocal.configure(bind=saved_engine)
+        database.engine = saved_engine
+        engine.dispose()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+async def asgi_request(app, method: str, path: str, payload: Optional[dict] = None,
+                       headers: Optional[dict] = None) -> dict:
+    """Один запрос к приложению: статус, заголовки и размер тела ответа"""
+    body = json.dumps(payload).encode() if payload is not None else b""
+    raw_headers = [(b"host", b"localhost")]
+    if payload is not None:
+        raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+    raw_headers += [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()]
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http", "http_version": "1.1", "method": method, "scheme": "http",
+        "path": path, "raw_path": path.encode(), "root_path": "", "query_string": query.encode(),
+        "headers": raw_headers, "client": ("127.0.0.1", 1), "server": ("localhost", 80),
+    }
+    sent = {"size": 0}
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            sent["status"] = message["status"]
+            sent["headers"] = {name.decode(): value.decode() for name, value in message["headers"]}
+        elif message["type"] == "http.response.body":
+            sent["size"] += len(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return sent
+
+
+def percentile(values, q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
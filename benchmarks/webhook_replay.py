@@ -0,0 +1,93 @@
+"""Повтор тысяч дублированных вебхуков: каждый платёж должен перейти в
+succeeded ровно один раз, с одной транзакцией.
+
+Всё в одном процессе: временная SQLite с pending-платежами, вебхуки идут
+в ASGI-приложение напрямую, обработчик inbox (run_worker) крутится в том
+же event loop. Только тестовый режим провайдера: с живым провайдером
+обработчик перечитывал бы статусы у него.
+
+    python -m benchmarks.webhook_replay --payments 500 --copies 10
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import random
+import sys
+import time
+
+from sqlalchemy import func, select
+
+from benchmarks.support import asgi_request, temporary_database
+
+
+def run(payments: int, copies: int, concurrency: int) -> int:
+    from app import database, models, webhook_inbox
+    from app.main import app
+    from app.payment_providers import get_provider
+
+    if not get_provider().test_mode:
+        print("❌ Только в тестовом режиме провайдера (PAYMENT_PROVIDER=test)")
+        return 2
+
+    def counts(db):
+        return (
+            db.scalar(select(func.count(models.Transaction.id))),
+            db.scalar(select(func.count(models.Payment.id)).where(models.Payment.status == "succeeded")),
+            db.scalar(select(func.count(models.WebhookEvent.id)).where(models.WebhookEvent.status == "pending")),
+        )
+
+    async def scenario(refs):
+        worker = asyncio.create_task(webhook_inbox.run_worker())
+        bodies = [{"event": "payment.succeeded", "object": {"id": ref}} for ref in refs for _ in range(copies)]
+        random.shuffle(bodies)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def send(body):
+            async with semaphore:
+                return (await asgi_request(app, "POST", "/api/payments/webhook", body))["status"]
+
+        started = time.perf_counter()
+        statuses = await asyncio.gather(*(send(body) for body in bodies))
+        accepted = time.perf_counter() - started
+
+        deadline = time.monotonic() + 120
+        while time.monotonic() < deadline:
+            with database.SessionLocal() as db:
+                state = counts(db)
+            if not state[2]:
+                break
+            await asyncio.sleep(0.2)
+        applied = time.perf_counter() - started
+        worker.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await worker
+        return statuses, accepted, applied, state
+
+    with temporary_database():
+        with database.SessionLocal() as db:
+            user = models.User(email="bench-payer@example.com", name="Bench", hashed_password="-")
+            db.add(user)
+            db.flush()
+            refs = [f"test-bench-{n}" for n in range(payments)]
+            db.add_all([models.Payment(user_id=user.id, amount=10000, transaction_id=ref, status="pending")
+                        for ref in refs])
+            db.commit()
+        with contextlib.redirect_stdout(io.StringIO()):
+            statuses, accepted, applied, (created, succeeded, pending) = asyncio.run(scenario(refs))
+
+    print(f"📨 {len(statuses)} вебхуков ({copies} копий на платёж) приняты за {accepted:.1f} с "
+          f"({len(statuses) / accepted:.0f}/с), не 200: {sum(status != 200 for status in statuses)}")
+    ok = created == succeeded == payments and not pending
+    print(f"{'✅' if ok else '❌'} Платежей: {payments}, succeeded: {succeeded}, транзакций: {created}, "
+          f"в очереди: {pending}; всё применено за {applied:.1f} с")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Повтор дублированных вебхуков в тестовом режиме")
+    parser.add_argument("--payments", type=int, default=500)
+    parser.add_argument("--copies", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=50)
+    args = parser.parse_args()
+    sys.exit(run(args.payments, args.copies, args.concurrency))
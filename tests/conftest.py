@@ -0,0 +1,52 @@
+import os
+
+os.environ.setdefault("PASSWORD_BCRYPT_ROUNDS", "4")
+
+import pytest
+from sqlalchemy import create_engine
+
+from app import database, models  # noqa: F401 — модели регистрируются в Base
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """Временная SQLite: все сессии приложения и database.engine смотрят в неё"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}", connect_args={"check_same_thread": False})
+    database.Base.metadata.create_all(engine)
+    saved_engine = database.engine
+    database.SessionLocal.configure(bind=engine)
+    database.engine = engine
+    yield engine
+    database.SessionLocal.configure(bind=saved_engine)
+    database.engine = saved_engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = database.SessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def client(engine):
+    """Клиент приложения на временной БД; лимиты частоты — с чистого листа"""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.rate_limit import InMemoryRateLimitBackend, rate_limiter
+
+    rate_limiter.backend = InMemoryRateLimitBackend()
+    return TestClient(app)
+
+
+@pytest.fixture
+def admin_headers(client, db):
+    """Заголовок авторизации администратора"""
+    credentials = {"email": "admin@example.com", "password": "admin-password"}
+    client.post("/api/auth/register", json={**credentials, "name": "Admin"})
+    admin = db.query(models.User).filter_by(email=credentials["email"]).one()
+    admin.is_admin = True
+    db.commit()
+    token = client.post("/api/auth/login", json=credentials).json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+from sqlalchemy import event
+
+from app import models
+from app.routers.admin import get_archive_projects
+
+
+@pytest.fixture
+def statements(engine):
+    executed = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    event.listen(engine, "after_cursor_execute", count)
+    yield executed
+    event.remove(engine, "after_cursor_execute", count)
+
+
+def add_projects(db, count: int, status: str = "completed"):
+    start = db.query(models.User).count()
+    users = [models.User(email=f"client{n}@example.com", name=f"Клиент {n}", hashed_password="-")
+             for n in range(start, start + count)]
+    db.add_all(users)
+    db.flush()
+    db.add_all([models.Project(title=f"Проект {user.id}", user_id=user.id, status=status) for user in users])
+    db.commit()
+
+
+def archive(db, admin, statements, **params):
+    params = {"category": None, "limit": 1000, "offset": 0, **params}
+    db.refresh(admin)  # пользователя загружает get_current_user, его запросы не считаем
+    statements.clear()
+    result = asyncio.run(get_archive_projects(current_user=admin, db=db, **params))
+    return len(statements), result
+
+
+def test_archive_query_count_does_not_grow_with_projects(db, statements):
+    admin = models.User(email="admin@example.com", name="Admin", hashed_password="-", is_admin=True)
+    db.add(admin)
+    db.commit()
+    db.refresh(admin)
+
+    counts = {}
+    for total in (1, 10, 200):
+        add_projects(db, total - db.query(models.Project).count())
+        queries, result = archive(db, admin, statements)
+        assert result["count"] == total
+        assert all(project["user_name"].startswith("Клиент") for project in result["projects"])
+        counts[total] = queries
+
+    # total + страница, без запроса на каждого клиента
+    assert set(counts.values()) == {2}, counts
+
+
+def test_archive_filters_and_pages_in_two_queries(db, statements):
+    admin = models.User(email="admin@example.com", name="Admin", hashed_password="-", is_admin=True)
+    db.add(admin)
+    db.commit()
+    db.refresh(admin)
+    add_projects(db, 30, status="completed")
+    add_projects(db, 20, status="pending")
+
+    queries, result = archive(db, admin, statements, category="pending,cancelled", limit=5, offset=5)
+
+    assert queries == 2
+    assert result["total"] == 20 and result["count"] == 5
+    assert {project["category"] for project in result["projects"]} == {"pending"}
@@ -0,0 +1,53 @@
+import pytest
+
+from app import models
+from app.page_cache import page_cache
+from app.routers.admin import SERVICE_PAGES
+
+
+@pytest.fixture
+def services(db):
+    items = [models.Service(title=f"Услуга {n}", is_active=True) for n in range(3)]
+    db.add_all(items)
+    db.commit()
+    return [service.id for service in items]
+
+
+@pytest.fixture
+def cached_pages(client):
+    page_cache.invalidate()
+    for path in SERVICE_PAGES:
+        assert client.get(path).status_code == 200
+    assert set(page_cache.paths()) >= set(SERVICE_PAGES)
+    yield
+    page_cache.invalidate()
+
+
+def test_bulk_toggle_updates_in_one_transaction_and_drops_cached_pages(client, db, admin_headers, services,
+                                                                         cached_pages):
+    response = client.put("/api/admin/services/active", headers=admin_headers, json={"items": [
+        {"id": services[0], "is_active": False},
+        {"id": services[1], "is_active": True},
+        {"id": 10 ** 6, "is_active": False},
+    ]})
+
+    assert response.status_code == 200
+    assert [item["status"] for item in response.json()["results"]] == ["updated", "unchanged", "error"]
+    db.expire_all()
+    assert db.get(models.Service, services[0]).is_active is False
+    assert not set(page_cache.paths()) & set(SERVICE_PAGES)
+
+
+def test_unchanged_bulk_toggle_keeps_cached_pages(client, admin_headers, services, cached_pages):
+    response = client.put("/api/admin/services/active", headers=admin_headers,
+                          json={"items": [{"id": services[0], "is_active": True}]})
+
+    assert response.status_code == 200
+    assert set(page_cache.paths()) >= set(SERVICE_PAGES)
+
+
+def test_single_service_update_drops_cached_pages(client, admin_headers, services, cached_pages):
+    response = client.put(f"/api/admin/services/{services[0]}", headers=admin_headers, json={"title": "Новая"})
+
+    assert response.status_code == 200
+    assert not set(page_cache.paths()) & set(SERVICE_PAGES)
@@ -0,0 +1,45 @@
+from app import models
+from app.routers.admin import CLIENT_STATISTICS_MAX_IDS
+
+
+def add_clients(db, count: int) -> list:
+    users = [models.User(email=f"client{n}@example.com", name=f"Клиент {n}", hashed_password="-")
+             for n in range(count)]
+    db.add_all(users)
+    db.commit()
+    return [user.id for user in users]
+
+
+def statistics(client, headers, user_ids):
+    return client.get("/api/admin/clients/statistics", params={"user_ids": user_ids}, headers=headers)
+
+
+def test_more_than_max_ids_is_rejected(client, db, admin_headers):
+    client_ids = add_clients(db, 3)
+    missing_ids = [10 ** 6 + n for n in range(CLIENT_STATISTICS_MAX_IDS + 1 - len(client_ids))]
+
+    response = statistics(client, admin_headers, missing_ids + client_ids)
+
+    assert response.status_code == 400
+    assert str(CLIENT_STATISTICS_MAX_IDS + 1) in response.json()["detail"]
+
+
+def test_max_ids_are_answered_in_full(client, db, admin_headers):
+    client_ids = add_clients(db, 3)
+    missing_ids = [10 ** 6 + n for n in range(CLIENT_STATISTICS_MAX_IDS - len(client_ids))]
+
+    response = statistics(client, admin_headers, missing_ids + client_ids)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["user_id"] for item in body["statistics"]] == client_ids
+    assert body["not_found"] == missing_ids
+
+
+def test_duplicate_ids_do_not_count_against_the_limit(client, db, admin_headers):
+    client_ids = add_clients(db, 2)
+
+    response = statistics(client, admin_headers, client_ids * (CLIENT_STATISTICS_MAX_IDS // 2 + 1))
+
+    assert response.status_code == 200
+    assert response.json()["count"] == 2
@@ -0,0 +1,32 @@
+import io
+import zipfile
+
+from app.contract_bundle import CHUNK_SIZE, stream_zip
+from benchmarks.contract_bundle import bundle_peak, make_files
+
+
+def test_zip_memory_does_not_grow_with_archive_size(tmp_path):
+    (tmp_path / "small").mkdir()
+    (tmp_path / "large").mkdir()
+    _, small, _ = bundle_peak(make_files(str(tmp_path / "small"), 2, 1))
+    written, large, largest = bundle_peak(make_files(str(tmp_path / "large"), 4, 4))
+
+    assert written > 16 * 1024 * 1024  # данные несжимаемые — архив не меньше исходников
+    # Восьмикратно больший архив — пик почти тот же: в памяти только текущий кусок
+    assert large < small * 1.5 + 256 * 1024, (small, large)
+    assert largest <= 2 * CHUNK_SIZE
+
+
+def test_zip_keeps_utf8_names_and_skips_missing_files(tmp_path):
+    first, second = tmp_path / "one.txt", tmp_path / "two.pdf"
+    first.write_text("Договор № 1", encoding="utf-8")
+    second.write_bytes(b"%PDF" * 100000)
+
+    data = b"".join(stream_zip([("ДОГ-0001.txt", str(first)), ("пропал.pdf", str(tmp_path / "missing.pdf")),
+                                ("Папка/ДОГ-0002.pdf", str(second))]))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    assert archive.namelist() == ["ДОГ-0001.txt", "Папка/ДОГ-0002.pdf"]
+    assert archive.read("ДОГ-0001.txt").decode("utf-8") == "Договор № 1"
+    assert archive.read("Папка/ДОГ-0002.pdf") == second.read_bytes()
@@ -0,0 +1,50 @@
+import re
+import struct
+import zlib
+
+from app.contract_formats import render_pdf
+from app.pdf_font import load_font
+
+LINES = ["ДОГОВОР № 17 оказания услуг", "", "Заказчик: ООО «Ёлка», ИНН 7701234567",
+         "Исполнитель обязуется выполнить работы по разработке сайта в срок. " * 4]
+
+
+def streams(pdf: bytes) -> dict:
+    """Номер объекта -> распакованный поток"""
+    result = {}
+    for match in re.finditer(rb"(\d+) 0 obj\n<<([^\n]*?)>>\nstream\n", pdf):
+        length = int(re.search(rb"/Length (\d+)", match.group(2)).group(1))
+        result[int(match.group(1))] = zlib.decompress(pdf[match.end():match.end() + length])
+    return result
+
+
+def test_pdf_embeds_font_and_keeps_cyrillic_text():
+    pdf = render_pdf(LINES)
+    assert b"/Helvetica" not in pdf and b"/FontFile2" in pdf and b"/Identity-H" in pdf
+
+    decoded = streams(pdf)
+    cmap_id = int(re.search(rb"/ToUnicode (\d+) 0 R", pdf).group(1))
+    to_unicode = {int(glyph, 16): bytes.fromhex(char.decode()).decode("utf-16-be")
+                  for glyph, char in re.findall(rb"<([0-9A-F]{4})> <([0-9A-F]+)>", decoded[cmap_id])}
+    shown = []
+    for stream in decoded.values():
+        for text in re.findall(rb"<([0-9A-F]*)> '", stream):
+            shown.append("".join(to_unicode[int(text[i:i + 4], 16)] for i in range(0, len(text), 4)))
+    assert shown[:3] == LINES[:3]
+    assert " ".join(shown[3:]) == LINES[3].strip()
+    assert len(shown) > 4  # длинная строка перенесена
+
+    font_id = int(re.search(rb"/FontFile2 (\d+) 0 R", pdf).group(1))
+    subset = decoded[font_id]
+    assert len(subset) < len(load_font().data) // 4
+    assert sum(struct.unpack(f">{len(subset) // 4}L", subset)) & 0xFFFFFFFF == 0xB1B0AFBA
+
+
+def test_wrapped_lines_fit_the_page():
+    font = load_font()
+    pdf = render_pdf(["Ширина " * 200, "Ж" * 500], font_size=11)
+    cmap = {glyph: char for char, glyph in font.cmap.items()}
+    for stream in streams(pdf).values():
+        for text in re.findall(rb"<([0-9A-F]+)> '", stream):
+            line = "".join(chr(cmap[int(text[i:i + 4], 16)]) for i in range(0, len(text), 4))
+            assert font.text_width(line, 11) <= 595 - 2 * 56
@@ -0,0 +1,64 @@
+from app.contract_search import ContractSearchIndex, make_snippet, stem, terms
+
+
+def index_of(tmp_path, documents: dict) -> ContractSearchIndex:
+    index = ContractSearchIndex(path=str(tmp_path / "index.pickle"))
+    for key, text in documents.items():
+        index.add(key, text, "v1")
+    return index
+
+
+def keys(index: ContractSearchIndex, query: str, **kwargs) -> list:
+    return [key for key, _ in index.search(query, **kwargs)[1]]
+
+
+def test_word_forms_share_a_stem_and_stop_words_are_dropped():
+    assert len({stem(word) for word in ("договор", "договора", "договору", "договорами")}) == 1
+    assert terms("Гарантийный срок и всё остальное") == terms("гарантийного срока ВСЕ остальные")
+    assert terms("и в на по") == []
+
+
+def test_bm25_ranks_frequent_rare_and_short_matches_first(tmp_path):
+    filler = "Стороны подписали договор о разработке программного обеспечения. "
+    index = index_of(tmp_path, {
+        1: filler * 5 + "Гарантийный срок двенадцать месяцев.",
+        2: "Гарантийный срок двенадцать месяцев. Гарантия распространяется на все работы в гарантийный срок.",
+        3: filler * 5,
+        4: "Гарантийный срок.",
+        5: filler + "Споры рассматриваются в арбитражном суде.",
+    })
+
+    # Больше вхождений и короче документ — выше; документ без терминов не найден
+    total, results, query_terms = index.search("гарантийного срока")
+    assert query_terms == ["гарантийн", "срок"]
+    assert total == 3
+    assert [key for key, _ in results] == [2, 4, 1]
+    assert results[0][1] > results[1][1] > results[2][1]
+    # Редкий термин весит больше частого: договор с «арбитражным судом» выше прочих
+    assert keys(index, "договор арбитражный суд")[0] == 5
+    assert keys(index, "гарантийного срока", limit=1, offset=1) == [keys(index, "гарантийного срока")[1]]
+
+
+def test_reindexed_and_removed_documents_leave_results(tmp_path):
+    index = index_of(tmp_path, {1: "Интеграция с 1С", 2: "Мобильное приложение", 3: "Интеграция CRM"})
+
+    index.add(1, "Чат-бот для клиентов", "v2")
+    index.remove(3)
+    assert keys(index, "интеграция") == []
+    assert keys(index, "чат-бот") == [1]
+
+    index.compact()
+    index.save()
+    loaded = ContractSearchIndex(path=index.path)
+    assert loaded.load()
+    assert keys(loaded, "мобильного приложения") == [2]
+    assert loaded.version(1) == "v2" and loaded.size == 2
+
+
+def test_snippet_marks_matches_and_escapes_html():
+    text = "Вступление. " * 30 + "Исполнитель <b>обязуется</b> выполнить работы в гарантийный срок."
+    snippet = make_snippet(text, terms("гарантийного срока"))
+
+    assert snippet.startswith("…")
+    assert "<mark>гарантийный</mark> <mark>срок</mark>" in snippet
+    assert "&lt;b&gt;обязуется&lt;/b&gt;" in snippet
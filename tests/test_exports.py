@@ -0,0 +1,45 @@
+import csv
+import io
+import re
+import zipfile
+
+from benchmarks.exports import export_peak, fill_transactions
+from app.xlsx_writer import stream_xlsx
+
+
+def test_export_memory_does_not_grow_with_rows(engine):
+    fill_transactions(engine, 20000)
+
+    for format in ("csv", "xlsx"):
+        _, small = export_peak(format, 2000)
+        written, large = export_peak(format, 20000)
+
+        assert written > 0
+        # Десятикратно больше строк — пик почти тот же (порции CHUNK_SIZE)
+        assert large < small * 1.5 + 256 * 1024, (format, small, large)
+
+
+def test_xlsx_continues_on_next_sheet_past_row_limit():
+    data = b"".join(stream_xlsx(["id", "name"], [(i, f"строка {i}") for i in range(7)],
+                                sheet_name="transactions", max_rows=3))
+
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    workbook = archive.read("xl/workbook.xml").decode()
+    sheets = [archive.read(f"xl/worksheets/sheet{n}.xml").decode() for n in range(1, 5)]
+
+    assert re.findall(r'name="([^"]+)"', workbook) == [
+        "transactions", "transactions (2)", "transactions (3)", "transactions (4)"]
+    assert [sheet.count("<row>") for sheet in sheets] == [3, 3, 3, 2]  # заголовок на каждом листе
+    assert all("строка" not in sheet or ">id<" in sheet for sheet in sheets)
+    assert "sheet4.xml" in archive.read("[Content_Types].xml").decode()
+
+
+def test_csv_export_endpoint_filters_by_status(client, engine, admin_headers):
+    fill_transactions(engine, 30)
+
+    response = client.get("/api/admin/export/transactions", params={"status": "pending"}, headers=admin_headers)
+
+    assert response.status_code == 200
+    rows = list(csv.reader(io.StringIO(response.content.decode("utf-8-sig")), delimiter=";"))
+    assert rows[0][:2] == ["id", "user_id"]
+    assert len(rows) == 11 and {row[5] for row in rows[1:]} == {"pending"}
@@ -0,0 +1,31 @@
+from sqlalchemy import func, select
+
+from app import ledger, models
+
+
+def seed(db):
+    user = models.User(email="ledger@example.com", name="Ledger", hashed_password="-")
+    db.add(user)
+    db.flush()
+    db.add_all([models.Transaction(user_id=user.id, amount=amount, status="completed")
+                for amount in (10000, 2500, -3000)])
+    db.commit()
+    return user.id
+
+
+def test_concurrent_startup_import_does_not_double(db, monkeypatch):
+    user_id = seed(db)
+    # Второй воркер успел прочитать пустой журнал до того, как первый его заполнил
+    stale = ledger.unposted_transactions(db)
+    ledger.ensure_initialized(db)
+
+    monkeypatch.setattr(ledger, "unposted_transactions", lambda session: stale)
+    ledger.reconcile(db, fix=True)
+
+    imports = db.scalar(select(func.count(models.LedgerEntry.id)).where(models.LedgerEntry.kind == "import"))
+    assert imports == 3
+    balances = db.scalars(select(models.UserBalance).where(models.UserBalance.user_id == user_id)).all()
+    assert len(balances) == 1
+    assert ledger.read_balances(db, [user_id])[user_id] == ledger.ledger_totals(db)[user_id]
+    monkeypatch.undo()
+    assert ledger.reconcile(db) == {"balances": {}, "unposted": [], "stale": []}
@@ -0,0 +1,53 @@
+import gzip
+
+import brotli
+import pytest
+
+from app.page_cache import PageCache, page_cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    page_cache.invalidate()
+    yield
+    page_cache.invalidate()
+
+
+def get(client, path: str, **headers):
+    # Тело — как пришло по сети, без распаковки клиентом
+    with client.stream("GET", path, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_page_is_served_compressed_with_etag_and_304(client):
+    plain, html = get(client, "/contacts", **{"Accept-Encoding": "identity"})
+    br, br_body = get(client, "/contacts", **{"Accept-Encoding": "gzip, br"})
+    gz, gz_body = get(client, "/contacts", **{"Accept-Encoding": "gzip;q=1, br;q=0.5"})
+
+    assert plain.status_code == 200 and "content-encoding" not in plain.headers
+    assert br.headers["content-encoding"] == "br" and brotli.decompress(br_body) == html
+    assert gz.headers["content-encoding"] == "gzip" and gzip.decompress(gz_body) == html
+    assert len({plain.headers["etag"], br.headers["etag"], gz.headers["etag"]}) == 3
+    assert br.headers["vary"] == "Accept-Encoding"
+
+    cached, _ = get(client, "/contacts", **{"Accept-Encoding": "br", "If-None-Match": f'"x", W/{br.headers["etag"]}'})
+    assert cached.status_code == 304 and cached.headers["etag"] == br.headers["etag"]
+    stale, _ = get(client, "/contacts", **{"Accept-Encoding": "identity", "If-None-Match": br.headers["etag"]})
+    assert stale.status_code == 200
+
+
+def test_page_renders_once_until_invalidated():
+    renders = []
+    cache = PageCache(enabled=True)
+
+    def render():
+        renders.append(1)
+        return f"<p>{len(renders)}</p>" * 100
+
+    first = cache.get_or_render(("/pricing",), render)
+    assert cache.get_or_render(("/pricing",), render) is first and len(renders) == 1
+
+    cache.get_or_render(("/services",), render)
+    cache.invalidate("/pricing")
+    assert cache.paths() == ["/services"]
+    assert cache.get_or_render(("/pricing",), render).etag != first.etag and len(renders) == 3
@@ -0,0 +1,40 @@
+import asyncio
+
+import pytest
+
+from app.passwords import PasswordHasher, PasswordHasherBusy, _legacy_hash, _verify_sync, is_legacy_hash
+
+
+def test_legacy_hash_is_rehashed_to_bcrypt():
+    legacy = _legacy_hash("secret", "salt")
+
+    ok, new_hash = _verify_sync("secret", legacy, "salt")
+
+    assert ok
+    assert new_hash.startswith("$2") and not is_legacy_hash(new_hash)
+    assert _verify_sync("secret", new_hash, None) == (True, None)
+
+
+def test_wrong_password_is_not_rehashed():
+    assert _verify_sync("wrong", _legacy_hash("secret", "salt"), "salt") == (False, None)
+    assert _verify_sync("secret", "", None) == (False, None)
+
+
+def test_hasher_runs_in_pool_and_counts():
+    hasher = PasswordHasher(workers=2, max_queue=8)
+
+    async def scenario():
+        hashed = await hasher.hash("secret")
+        return await hasher.verify("secret", hashed)
+
+    assert asyncio.run(scenario()) == (True, None)
+    metrics = hasher.metrics()
+    assert metrics["completed"] == 2 and metrics["pending"] == 0
+
+
+def test_hasher_rejects_when_queue_is_full():
+    hasher = PasswordHasher(workers=1, max_queue=0)
+
+    with pytest.raises(PasswordHasherBusy):
+        asyncio.run(hasher.hash("secret"))
+    assert hasher.metrics()["rejected"] == 1
@@ -0,0 +1,35 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import models, payment_providers
+
+
+class LiveProvider(payment_providers.TestModeProvider):
+    name = "live"
+    test_mode = False
+
+
+@pytest.fixture
+def payment_id(client, db, admin_headers):
+    user = db.query(models.User).filter_by(email="admin@example.com").one()
+    payment = models.Payment(user_id=user.id, amount=10000, transaction_id="test-success", status="pending")
+    db.add(payment)
+    db.commit()
+    return payment.id
+
+
+def test_success_shortcut_marks_payment_in_test_mode(client, db, admin_headers, payment_id, monkeypatch):
+    monkeypatch.setattr(payment_providers, "_provider", payment_providers.TestModeProvider())
+    response = client.post(f"/api/payments/test/success/{payment_id}", headers=admin_headers)
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.get(models.Payment, payment_id).status == "succeeded"
+
+
+def test_success_shortcut_is_absent_with_live_provider(client, db, admin_headers, payment_id, monkeypatch):
+    monkeypatch.setattr(payment_providers, "_provider", LiveProvider())
+    response = client.post(f"/api/payments/test/success/{payment_id}", headers=admin_headers)
+    assert response.status_code == 404
+    db.expire_all()
+    assert db.get(models.Payment, payment_id).status == "pending"
+    assert db.scalar(select(func.count(models.LedgerEntry.id))) == 0
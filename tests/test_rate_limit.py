@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException, Request
+
+from app.rate_limit import InMemoryRateLimitBackend, RateLimiter
+
+
+def make_request(client: str, forwarded: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded.encode())] if forwarded else []
+    return Request({"type": "http", "method": "POST", "path": "/api/auth/login", "headers": headers,
+                    "client": (client, 40000), "query_string": b""})
+
+
+def blocked_after(limiter: RateLimiter, requests) -> int:
+    async def run():
+        for number, request in enumerate(requests, 1):
+            try:
+                await limiter.check("login", request)
+            except HTTPException as e:
+                assert e.status_code == 429
+                return number
+        return 0
+
+    return asyncio.run(run())
+
+
+SPOOFED = [f"10.0.0.{i}" for i in range(20)]
+RULES = {"login": {"ip": (5, 60), "failures": (3, 60)}}
+
+
+@pytest.mark.parametrize("options, client, forwarded, expected", [
+    # Без доверия к прокси заголовок игнорируется
+    ({}, "203.0.113.7", "{ip}", 6),
+    # За прокси клиентская запись левее записи прокси
+    ({"trust_proxy": True}, "10.1.0.1", "{ip}, 203.0.113.7", 6),
+    ({"trust_proxy": True, "trusted_proxies": 2}, "10.1.0.1", "{ip}, 203.0.113.7, 10.2.0.1", 6),
+    # Разные настоящие клиенты за прокси не мешают друг другу
+    ({"trust_proxy": True}, "10.1.0.1", "203.0.113.7, {ip}", 0),
+])
+def test_spoofed_forwarded_for_does_not_bypass_ip_limit(options, client, forwarded, expected):
+    limiter = RateLimiter(InMemoryRateLimitBackend(), RULES, **options)
+
+    requests = [make_request(client, forwarded.format(ip=ip)) for ip in SPOOFED]
+
+    assert blocked_after(limiter, requests) == expected
+
+
+def test_failures_are_counted_per_email_and_address():
+    limiter = RateLimiter(InMemoryRateLimitBackend(), RULES)
+    attacker, owner = make_request("198.51.100.1"), make_request("203.0.113.7")
+
+    async def scenario():
+        for _ in range(3):
+            await limiter.check_failures("login", attacker, "User@Example.com")
+            await limiter.record_failure("login", attacker, "user@example.com")
+        with pytest.raises(HTTPException) as blocked:
+            await limiter.check_failures("login", attacker, "user@example.com")
+        assert blocked.value.status_code == 429
+        assert int(blocked.value.headers["Retry-After"]) >= 1
+        # Владелец с другого адреса не заперт
+        await limiter.check_failures("login", owner, "user@example.com")
+        # Успешный вход сбрасывает счётчик
+        await limiter.reset_failures("login", attacker, "user@example.com")
+        await limiter.check_failures("login", attacker, "user@example.com")
+
+    asyncio.run(scenario())
+
+
+def test_successful_logins_do_not_consume_failure_budget(client):
+    credentials = {"email": "owner@example.com", "password": "correct-horse"}
+    assert client.post("/api/auth/register", json={**credentials, "name": "Owner"}).status_code == 200
+
+    for _ in range(8):
+        assert client.post("/api/auth/login", json=credentials).status_code == 200
+
+
+def test_wrong_passwords_lock_only_that_address(client, monkeypatch):
+    from app.rate_limit import rate_limiter
+
+    monkeypatch.setattr(rate_limiter, "trust_proxy", True)
+    credentials = {"email": "owner@example.com", "password": "correct-horse"}
+    client.post("/api/auth/register", json={**credentials, "name": "Owner"})
+    wrong = {**credentials, "password": "guess"}
+
+    statuses = [client.post("/api/auth/login", json=wrong).status_code for _ in range(6)]
+    assert statuses == [401] * 5 + [429]
+    assert client.post("/api/auth/login", json=credentials).status_code == 429
+
+    elsewhere = client.post("/api/auth/login", json=credentials, headers={"X-Forwarded-For": "203.0.113.9"})
+    assert elsewhere.status_code == 200
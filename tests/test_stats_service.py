@@ -0,0 +1,53 @@
+import asyncio
+import threading
+import time
+
+from app.stats_service import TTLCache, get_dashboard_stats
+
+
+def test_cold_cache_is_computed_once_without_blocking_the_loop():
+    cache = TTLCache(ttl=60)
+    calls = []
+
+    def compute():
+        calls.append(threading.current_thread().name)
+        time.sleep(0.2)
+        return {"total": 1}
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        task = asyncio.create_task(ticker())
+        values = await asyncio.gather(*(cache.get_or_compute_async("dashboard", compute) for _ in range(5)))
+        task.cancel()
+        return values, ticks
+
+    values, ticks = asyncio.run(scenario())
+
+    assert values == [{"total": 1}] * 5
+    assert len(calls) == 1 and calls[0] != threading.main_thread().name
+    assert ticks >= 10  # loop продолжал работать, пока считалось значение
+
+
+def test_fresh_value_is_returned_without_recompute():
+    cache = TTLCache(ttl=60)
+    assert cache.get_or_compute("key", lambda: 1) == 1
+    assert asyncio.run(cache.get_or_compute_async("key", lambda: 2)) == 1
+    cache.invalidate("key")
+    assert asyncio.run(cache.get_or_compute_async("key", lambda: 3)) == 3
+
+
+def test_dashboard_stats_on_empty_database(db):
+    from app.stats_service import stats_cache
+
+    stats_cache.invalidate()
+    stats = get_dashboard_stats(db)
+    stats_cache.invalidate()
+
+    assert stats["total_users"] == 0 and stats["revenue_month"] == 0
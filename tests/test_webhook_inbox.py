@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import func, select
+
+from app import database, models, webhook_inbox
+
+
+@pytest.fixture
+def payments(db):
+    user = models.User(email="payer@example.com", name="Payer", hashed_password="-")
+    db.add(user)
+    db.flush()
+    items = [models.Payment(user_id=user.id, amount=10000, transaction_id=f"test-{n}", status="pending")
+             for n in range(3)]
+    db.add_all(items)
+    db.commit()
+    return [payment.transaction_id for payment in items]
+
+
+def drain(read_status=None):
+    """Применить все созданные события так же, как фоновый обработчик"""
+    with database.SessionLocal() as db:
+        ids = webhook_inbox.due_events(db, limit=10000)
+    return [webhook_inbox.process_event(event_id, database.SessionLocal, read_status) for event_id in ids]
+
+
+def transactions(db) -> int:
+    return db.scalar(select(func.count(models.Transaction.id)))
+
+
+def test_duplicate_webhooks_move_each_payment_once(client, db, payments):
+    for _ in range(20):
+        for ref in payments:
+            response = client.post("/api/payments/webhook", json={"event": "payment.succeeded", "object": {"id": ref}})
+            assert response.status_code == 200
+
+    assert db.scalar(select(func.count(models.WebhookEvent.id))) == len(payments)
+    assert drain() == ["done"] * len(payments)
+    db.expire_all()
+    assert transactions(db) == len(payments)
+    assert {payment.status for payment in db.scalars(select(models.Payment))} == {"succeeded"}
+
+
+def test_replayed_event_after_processing_is_not_applied_again(client, db, payments):
+    body = {"event": "payment.succeeded", "object": {"id": payments[0]}}
+    client.post("/api/payments/webhook", json=body)
+    drain()
+
+    response = client.post("/api/payments/webhook", json=body)
+
+    assert response.json()["duplicate"] is True
+    assert drain() == []
+    assert transactions(db) == 1
+
+
+def test_live_mode_applies_provider_status_not_event_type(db, payments):
+    statuses = {payments[0]: "pending", payments[1]: "succeeded", payments[2]: "not_found"}
+    # Поддельное succeeded (у провайдера pending), «отмена» оплаченного и неизвестный платёж
+    for ref, event_type in zip(payments, ("payment.succeeded", "payment.canceled", "payment.succeeded")):
+        webhook_inbox.store_event(db, {"event": event_type, "object": {"id": ref}})
+
+    assert drain(read_status=statuses.__getitem__) == ["done"] * 3
+
+    db.expire_all()
+    by_ref = {payment.transaction_id: payment.status for payment in db.scalars(select(models.Payment))}
+    assert by_ref == {payments[0]: "pending", payments[1]: "succeeded", payments[2]: "pending"}
+    assert transactions(db) == 1
+
+
+def test_provider_errors_are_retried(db, payments):
+    webhook_inbox.store_event(db, {"event": "payment.succeeded", "object": {"id": payments[0]}})
+
+    def unavailable(ref):
+        raise webhook_inbox.ProviderError("503", status_code=503)
+
+    assert drain(read_status=unavailable) == ["pending"]
+    event = db.scalars(select(models.WebhookEvent)).one()
+    assert event.attempts == 1 and "503" in event.last_error
+    assert transactions(db) == 0